@@ -1,9 +1,19 @@
 """Common place for environment variables with sensible defaults for local development."""
 import os
+import tempfile
 
 PRODUCTION = os.environ.get("PRODUCTION", "0") == "1"
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///../data/data.sqlite")
 
 # a key is needed to authorize a module to
 # communicate with the assessment module manager
-ASSESSMENT_MODULE_MANAGER_TO_ATHENA_MODULE_SECRET = os.getenv("SECRET")
\ No newline at end of file
+ASSESSMENT_MODULE_MANAGER_TO_ATHENA_MODULE_SECRET = os.getenv("SECRET")
+
+# cache of the repositories downloaded by the programming modules,
+# point all modules on a host to the same directory to share it
+REPOSITORY_CACHE_DIR = os.environ.get(
+    "REPOSITORY_CACHE_DIR", os.path.join(tempfile.gettempdir(), "athena-repository-cache")
+)
+REPOSITORY_CACHE_MAX_SIZE_MB = int(os.environ.get("REPOSITORY_CACHE_MAX_SIZE_MB", "5000"))
+# seconds after which a URL is downloaded again, as a repository may change under the same URL
+REPOSITORY_CACHE_URL_TTL_SECONDS = int(os.environ.get("REPOSITORY_CACHE_URL_TTL_SECONDS", "3600"))
@@ -1,8 +1,11 @@
-from .code_repository import get_repository_zip, get_repository
+from .code_repository import get_repository_zip, get_repository, get_repository_reader
+from .repository_reader import RepositoryReader
 from .feedback import format_feedback_title
 
 __all__ = [
     "get_repository_zip",
     "get_repository",
+    "get_repository_reader",
+    "RepositoryReader",
     "format_feedback_title",
 ]
@@ -1,15 +1,51 @@
-import hashlib
-import tempfile
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from typing import Optional, cast
 from zipfile import ZipFile
 
-from athena import contextvars
+from athena import contextvars, env
 
 import httpx
 from git.repo import Repo
 
-cache_dir = Path(tempfile.mkdtemp())
+from .repository_cache import RepositoryCache
+from .repository_reader import RepositoryReader
+
+repository_cache = RepositoryCache(
+    Path(env.REPOSITORY_CACHE_DIR),
+    env.REPOSITORY_CACHE_MAX_SIZE_MB * 1024 * 1024,
+    url_ttl_seconds=env.REPOSITORY_CACHE_URL_TTL_SECONDS,
+)
+
+# readers of the most recently read repositories by zip path, each one keeps its zip file open
+MAX_OPEN_REPOSITORY_READERS = 64
+repository_readers: OrderedDict[Path, RepositoryReader] = OrderedDict()
+repository_readers_lock = threading.Lock()
+
+
+def _download(url: str, authorization_secret: Optional[str], path: Path):
+    if authorization_secret is None:
+        if contextvars.repository_authorization_secret_context_var_empty():
+            raise ValueError("Authorization secret for the repository API is not set. Pass authorization_secret to this function or add the X-Repository-Authorization-Secret header to the request from the assessment module manager.")
+        authorization_secret = contextvars.get_repository_authorization_secret_context_var()
+    with httpx.stream("GET", url, headers={ "Authorization": cast(str, authorization_secret) }) as response:
+        response.raise_for_status()
+        with open(path, "wb") as f:
+            for chunk in response.iter_bytes():
+                f.write(chunk)
+
+
+def _extract(zip_path: Path, path: Path):
+    with ZipFile(zip_path) as repo_zip:
+        repo_zip.extractall(path)
+    if not (path / ".git").exists():
+        repo = Repo.init(path, initial_branch='main')
+        # Config username and email to prevent Git errors
+        repo.config_writer().set_value("user", "name", "athena").release()
+        repo.config_writer().set_value("user", "email", "doesnotexist.athena@cit.tum.de").release()
+        repo.git.add(all=True, force=True)
+        repo.git.commit('-m', 'Initial commit')
 
 
 def get_repository_zip(url: str, authorization_secret: Optional[str] = None) -> ZipFile:
@@ -18,22 +54,8 @@ def get_repository_zip(url: str, authorization_secret: Optional[str] = None) ->
     the cache or by downloading it, and return a ZipFile object.
     Optional: Authorization secret for the API. If omitted, it will be auto-determined given the request session.
     """
-    url_hash = hashlib.md5(url.encode("utf-8")).hexdigest()
-    file_name = url_hash + ".zip"
-    cache_file_path = cache_dir / file_name
-
-    if not cache_file_path.exists():
-        if authorization_secret is None:
-            if contextvars.repository_authorization_secret_context_var_empty():
-                raise ValueError("Authorization secret for the repository API is not set. Pass authorization_secret to this function or add the X-Repository-Authorization-Secret header to the request from the assessment module manager.")
-            authorization_secret = contextvars.get_repository_authorization_secret_context_var()
-        with httpx.stream("GET", url, headers={ "Authorization": cast(str, authorization_secret) }) as response:
-            response.raise_for_status()
-            with open(cache_file_path, "wb") as f:
-                for chunk in response.iter_bytes():
-                    f.write(chunk)
-
-    return ZipFile(cache_file_path)
+    zip_path = repository_cache.get_zip(url, lambda path: _download(url, authorization_secret, path))
+    return ZipFile(zip_path)
 
 
 def get_repository(url: str, authorization_secret: Optional[str] = None) -> Repo:
@@ -41,20 +63,30 @@ def get_repository(url: str, authorization_secret: Optional[str] = None) -> Repo
     Retrieve a code repository from the given URL, either from the cache or by
     downloading it, and return a Repo object.
     """
+    repository_path = repository_cache.get_repository(
+        url,
+        lambda path: _download(url, authorization_secret, path),
+        _extract,
+    )
+    return Repo(repository_path)
+
 
-    url_hash = hashlib.md5(url.encode("utf-8")).hexdigest()
-    dir_name = url_hash + ".git"
-    cache_dir_path = cache_dir / dir_name
-
-    if not cache_dir_path.exists():
-        repo_zip = get_repository_zip(url, authorization_secret)
-        repo_zip.extractall(cache_dir_path)
-        if not (cache_dir_path / ".git").exists():
-            repo = Repo.init(cache_dir_path, initial_branch='main')
-            # Config username and email to prevent Git errors
-            repo.config_writer().set_value("user", "name", "athena").release()
-            repo.config_writer().set_value("user", "email", "doesnotexist.athena@cit.tum.de").release()
-            repo.git.add(all=True, force=True)
-            repo.git.commit('-m', 'Initial commit')
-
-    return Repo(cache_dir_path)
\ No newline at end of file
+def get_repository_reader(url: str, authorization_secret: Optional[str] = None) -> RepositoryReader:
+    """
+    Retrieve a reader for the files of a code repository from the given URL, downloading it if it is not cached.
+    The reader is shared by all callers reading the same repository contents, so its zip file is only opened once.
+    The zip is looked up in the repository cache on every call, which marks it as used, so it is not evicted while
+    its reader is in use, and the URL is downloaded again once it expires.
+    """
+    zip_path = repository_cache.get_zip(url, lambda path: _download(url, authorization_secret, path))
+    with repository_readers_lock:
+        reader = repository_readers.get(zip_path)
+        if reader is None:
+            reader = repository_readers[zip_path] = RepositoryReader(zip_path)
+        repository_readers.move_to_end(zip_path)
+        evicted = []
+        while len(repository_readers) > MAX_OPEN_REPOSITORY_READERS:
+            evicted.append(repository_readers.popitem(last=False)[1])
+    for evicted_reader in evicted:
+        evicted_reader.close()
+    return reader
@@ -0,0 +1,265 @@
+"""
+On-disk cache of downloaded repositories. The cache directory can be shared by all programming modules on a host,
+all coordination between processes happens through lock files in the cache directory.
+
+Layout of the cache directory:
+    urls/<url hash>                 hash of the content last downloaded from the URL, its modification time is the
+                                    time of the download
+    zips/<content hash>.zip         downloaded repository, its modification time is the time of the last access
+    repos/<content hash>.git        extracted repository
+    locks/<stripe>.lock             lock files, shared by the URLs and contents whose hash starts the same
+    tmp/                            downloads and extractions in progress, moved into place with an atomic rename
+"""
+import fcntl
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from athena.logger import logger
+
+
+def _hash(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def _stripe(key: str) -> str:
+    """Name of the lock of a hash, the number of lock files is bounded as they can never be removed safely"""
+    return key[:2]
+
+
+def _file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _directory_size(path: Path) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            try:
+                size += os.lstat(os.path.join(root, file)).st_size
+            except FileNotFoundError:
+                pass
+    return size
+
+
+class RepositoryCache:
+    """
+    Content-addressed cache of repository zips and their extracted Git repositories with a size limit.
+
+    Concurrent requests for the same URL, within a process or across processes, share a single download. When the
+    cache grows beyond max_size_bytes, the least recently used repositories are removed, except for those used
+    within the last min_age_seconds, as a caller may still be reading them.
+
+    A repository can change under the same URL, e.g. when an instructor updates the tests of an exercise, so a URL
+    is downloaded again once its last download is older than url_ttl_seconds. A download with the same bytes resolves
+    to the same content hash and reuses the extracted repository.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        max_size_bytes: int,
+        min_age_seconds: float = 600,
+        url_ttl_seconds: float = 3600,
+    ):
+        self.directory = directory
+        self.max_size_bytes = max_size_bytes
+        self.min_age_seconds = min_age_seconds
+        self.url_ttl_seconds = url_ttl_seconds
+        self._locks: dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+        # Sizes of the extracted repositories by content hash, so they are not walked on every eviction
+        self._repository_sizes: dict[str, int] = {}
+        for name in ("urls", "zips", "repos", "locks", "tmp"):
+            (directory / name).mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def _locked(self, name: str, blocking: bool = True) -> Iterator[bool]:
+        """Hold the named lock in this process and across processes, yields whether the lock was acquired"""
+        with self._locks_lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+        if not lock.acquire(blocking):
+            yield False
+            return
+        try:
+            with open(self.directory / "locks" / f"{name}.lock", "a") as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    yield False
+                    return
+                try:
+                    yield True
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            lock.release()
+
+    def _zip_path(self, content_hash: str) -> Path:
+        return self.directory / "zips" / f"{content_hash}.zip"
+
+    def _cached_zip(self, url_key: str) -> Optional[Path]:
+        """
+        Return the zip last downloaded from the URL and mark it as used, or None if it is not cached or was
+        downloaded more than url_ttl_seconds ago
+        """
+        url_path = self.directory / "urls" / url_key
+        try:
+            if time.time() - url_path.stat().st_mtime > self.url_ttl_seconds:
+                return None
+            content_hash = url_path.read_text().strip()
+            zip_path = self._zip_path(content_hash)
+            os.utime(zip_path)
+            return zip_path
+        except FileNotFoundError:
+            return None
+
+    def _write_atomically(self, path: Path, text: str):
+        with tempfile.NamedTemporaryFile("w", dir=self.directory / "tmp", delete=False) as f:
+            f.write(text)
+        os.replace(f.name, path)
+
+    def get_zip(self, url: str, download: Callable[[Path], None]) -> Path:
+        """
+        Return the path of the cached zip of the URL. On a cache miss, download(path) is called to write the zip
+        to a temporary path, which is moved into the cache afterwards.
+        """
+        url_key = _hash(url)
+        zip_path = self._cached_zip(url_key)
+        if zip_path is not None:
+            return zip_path
+
+        with self._locked(_stripe(url_key)):
+            # Another request may have downloaded the zip while this one waited for the lock
+            zip_path = self._cached_zip(url_key)
+            if zip_path is not None:
+                return zip_path
+            fd, temporary_name = tempfile.mkstemp(suffix=".zip", dir=self.directory / "tmp")
+            os.close(fd)
+            temporary_path = Path(temporary_name)
+            try:
+                download(temporary_path)
+                content_hash = _file_hash(temporary_path)
+                zip_path = self._zip_path(content_hash)
+                os.replace(temporary_path, zip_path)
+            finally:
+                temporary_path.unlink(missing_ok=True)
+            self._write_atomically(self.directory / "urls" / url_key, content_hash)
+
+        self.evict()
+        return zip_path
+
+    def get_repository(self, url: str, download: Callable[[Path], None], extract: Callable[[Path, Path], None]) -> Path:
+        """
+        Return the path of the extracted repository of the URL. On a cache miss, extract(zip_path, path) is called
+        to create the repository in a temporary directory, which is moved into the cache afterwards.
+        """
+        zip_path = self.get_zip(url, download)
+        content_hash = zip_path.stem
+        repository_path = self.directory / "repos" / f"{content_hash}.git"
+        if repository_path.exists():
+            return repository_path
+
+        with self._locked(_stripe(content_hash)):
+            if repository_path.exists():
+                return repository_path
+            temporary_path = Path(tempfile.mkdtemp(dir=self.directory / "tmp"))
+            try:
+                extract(zip_path, temporary_path)
+                os.rename(temporary_path, repository_path)
+            except BaseException:
+                shutil.rmtree(temporary_path, ignore_errors=True)
+                raise
+
+        self.evict()
+        return repository_path
+
+    def _remove(self, path: Path):
+        """Move the path out of the cache before deleting it, so it is never seen partially deleted"""
+        if not path.exists():
+            return
+        trash_path = Path(tempfile.mkdtemp(dir=self.directory / "tmp")) / path.name
+        os.rename(path, trash_path)
+        shutil.rmtree(trash_path.parent, ignore_errors=True)
+
+    def evict(self):
+        """Remove the least recently used repositories until the cache is within its size limit"""
+        with self._locked("evict", blocking=False) as acquired:
+            if not acquired:
+                # Another request is evicting already
+                return
+            now = time.time()
+            entries = []
+            total_size = 0
+            for zip_path in (self.directory / "zips").glob("*.zip"):
+                try:
+                    stat = zip_path.stat()
+                except FileNotFoundError:
+                    continue
+                last_used = stat.st_mtime
+                size = stat.st_size
+                repository_path = self.directory / "repos" / f"{zip_path.stem}.git"
+                if repository_path.exists():
+                    if zip_path.stem not in self._repository_sizes:
+                        self._repository_sizes[zip_path.stem] = _directory_size(repository_path)
+                    size += self._repository_sizes[zip_path.stem]
+                total_size += size
+                entries.append((last_used, size, zip_path, repository_path))
+
+            for last_used, size, zip_path, repository_path in sorted(entries):
+                if total_size <= self.max_size_bytes:
+                    break
+                if now - last_used < self.min_age_seconds:
+                    break
+                with self._locked(_stripe(zip_path.stem), blocking=False) as acquired:
+                    # Skip the zip if it is being extracted or was used since the scan
+                    if not acquired or zip_path.stat().st_mtime != last_used:
+                        continue
+                    self._remove(repository_path)
+                    zip_path.unlink(missing_ok=True)
+                    self._repository_sizes.pop(zip_path.stem, None)
+                    total_size -= size
+                    logger.info("Evicted repository %s from the repository cache", zip_path.stem)
+
+            if total_size > self.max_size_bytes:
+                logger.warning(
+                    "Repository cache exceeds its limit with %d bytes of recently used repositories", total_size
+                )
+            self._remove_stale_files(now)
+
+    def _remove_stale_files(self, now: float):
+        """Remove references to evicted zips, and files left behind by processes that were killed"""
+        for url_path in (self.directory / "urls").iterdir():
+            try:
+                if not self._zip_path(url_path.read_text().strip()).exists():
+                    url_path.unlink(missing_ok=True)
+            except FileNotFoundError:
+                pass
+        for repository_path in (self.directory / "repos").iterdir():
+            # A repository whose zip was evicted while it was extracted may still be read by the caller
+            if self._zip_path(repository_path.stem).exists():
+                continue
+            try:
+                if now - repository_path.stat().st_mtime > self.min_age_seconds:
+                    self._remove(repository_path)
+            except FileNotFoundError:
+                pass
+        for temporary_path in (self.directory / "tmp").iterdir():
+            try:
+                if now - temporary_path.stat().st_mtime > 24 * 60 * 60:
+                    if temporary_path.is_dir():
+                        shutil.rmtree(temporary_path, ignore_errors=True)
+                    else:
+                        temporary_path.unlink(missing_ok=True)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,68 @@
+import threading
+from pathlib import Path
+from typing import Iterable, Optional, cast
+from zipfile import ZipFile, ZipInfo
+
+
+class RepositoryReader:
+    """
+    Reads the files of a repository zip, opening the archive and parsing its central directory only once.
+    Decoded files are kept, so reading a file again is a dictionary lookup.
+    The archive is reopened if it is read again after close(), which is called when the reader is evicted.
+    """
+
+    def __init__(self, zip_path: Path):
+        self.zip_path = zip_path
+        self._zip: Optional[ZipFile] = None
+        self._index: Optional[dict[str, ZipInfo]] = None
+        self._code: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _open(self) -> ZipFile:
+        if self._zip is None:
+            self._zip = ZipFile(self.zip_path)
+            if self._index is None:
+                self._index = {info.filename: info for info in self._zip.infolist() if not info.is_dir()}
+        return self._zip
+
+    def file_paths(self) -> list[str]:
+        """Return the paths of all files in the repository."""
+        with self._lock:
+            self._open()
+            return list(cast(dict[str, ZipInfo], self._index))
+
+    def get_code(self, file_path: str) -> str:
+        """
+        Return the content of the file decoded as UTF-8.
+        Raises KeyError if the file is not in the repository and UnicodeDecodeError if it is not UTF-8 encoded.
+        """
+        code = self._code.get(file_path)
+        if code is not None:
+            return code
+        with self._lock:
+            repo_zip = self._open()
+            info = cast(dict[str, ZipInfo], self._index)[file_path]
+            content = repo_zip.read(info)
+        code = content.decode("utf-8")
+        self._code[file_path] = code
+        return code
+
+    def get_code_many(self, file_paths: Iterable[str]) -> dict[str, str]:
+        """
+        Return the contents of the files by path, decoded as UTF-8.
+        Files that are not in the repository or not UTF-8 encoded are left out.
+        """
+        code_by_path = {}
+        for file_path in file_paths:
+            try:
+                code_by_path[file_path] = self.get_code(file_path)
+            except (KeyError, UnicodeDecodeError):
+                continue
+        return code_by_path
+
+    def close(self):
+        """Close the archive, the decoded files are kept."""
+        with self._lock:
+            if self._zip is not None:
+                self._zip.close()
+                self._zip = None
@@ -1,8 +1,9 @@
+from typing import Dict, Iterable, List
 from pydantic import Field
 from zipfile import ZipFile
 from git.repo import Repo
 
-from athena.helpers.programming.code_repository import get_repository_zip, get_repository
+from athena.helpers.programming.code_repository import get_repository_zip, get_repository, get_repository_reader
 from athena.schemas.submission import Submission
 
 
@@ -23,8 +24,18 @@ class ProgrammingSubmission(Submission):
     def get_code(self, file_path: str) -> str:
         """
         Fetches the code from the submission repository.
-        Might be quite an expensive operation! If you need to fetch multiple files, consider using get_zip() instead.
+        The repository zip is opened once and shared by all calls for the same submission.
+        Raises KeyError if the file does not exist and UnicodeDecodeError if it is not UTF-8 encoded.
         """
-        repo_zip = self.get_zip()
-        with repo_zip.open(file_path, "r") as f:
-            return f.read().decode("utf-8")
+        return get_repository_reader(self.repository_uri).get_code(file_path)
+
+    def get_file_paths(self) -> List[str]:
+        """Returns the paths of all files in the submission repository."""
+        return get_repository_reader(self.repository_uri).file_paths()
+
+    def get_code_many(self, file_paths: Iterable[str]) -> Dict[str, str]:
+        """
+        Fetches the code of multiple files from the submission repository by file path.
+        Files that do not exist or are not UTF-8 encoded are left out.
+        """
+        return get_repository_reader(self.repository_uri).get_code_many(file_paths)
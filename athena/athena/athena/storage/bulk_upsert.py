@@ -0,0 +1,81 @@
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from athena.database import Base
+
+
+def _column_values(model: Base) -> Dict[str, Any]:
+    """Returns the values of the columns that are set on the model, leaving out the ID if it is not assigned yet."""
+    state = inspect(model)
+    values = {
+        attribute.key: state.dict[attribute.key]
+        for attribute in state.mapper.column_attrs
+        if attribute.key in state.dict
+    }
+    if values.get("id") is None:
+        values.pop("id", None)
+    return values
+
+
+def bulk_upsert(db: Session, models: List[Base]) -> List[Base]:
+    """Inserts the given models or updates the stored rows with the same IDs, like `db.merge()` for each model.
+
+    On PostgreSQL and SQLite, models of the same class are stored with a few multi-row `INSERT ... ON CONFLICT`
+    statements with `RETURNING`, instead of a `SELECT` and an `INSERT` or `UPDATE` per model. Only models without IDs
+    are inserted one at a time on SQLite, as it cannot return the generated IDs of a multi-row insert in order. Other
+    databases and SQLite versions before 3.35 fall back to merging one model at a time.
+
+    Returns:
+        List[Base]: The stored models in the order of the given models, with their IDs assigned.
+    """
+    dialect = db.get_bind().dialect
+    if dialect.name == "postgresql":
+        insert = postgresql.insert
+    elif dialect.name == "sqlite":
+        insert = sqlite.insert
+    else:
+        insert = None
+    if insert is None or not dialect.insert_returning:
+        stored_models = [db.merge(model) for model in models]
+        db.flush()  # Ensure the IDs are generated now
+        return stored_models
+
+    # Rows by model class and columns, so each group can be inserted with one statement. A row that appears more than
+    # once with the same ID is only stored once with its last values, as an upsert cannot affect a row twice.
+    groups: Dict[Tuple[type, Tuple[str, ...]], Dict[Any, Tuple[List[int], Dict[str, Any]]]] = {}
+    for index, model in enumerate(models):
+        values = _column_values(model)
+        rows = groups.setdefault((type(model), tuple(values)), {})
+        key = values.get("id", ("new", index))
+        indices = rows[key][0] if key in rows else []
+        indices.append(index)
+        rows[key] = (indices, values)
+
+    stored_models: List[Any] = [None] * len(models)
+    for (model_cls, columns), rows in groups.items():
+        statement = insert(model_cls)
+        if "id" in columns:
+            # The returned rows are matched to the given rows by their IDs, so their order does not matter
+            statement = statement.on_conflict_do_update(
+                index_elements=["id"],
+                set_={column: statement.excluded[column] for column in columns if column != "id"}
+            ).returning(model_cls)
+        else:
+            # PostgreSQL still inserts the rows in batches when the order of the generated IDs is requested,
+            # SQLite inserts them one at a time within the same transaction
+            statement = statement.returning(model_cls, sort_by_parameter_order=True)
+        results = db.scalars(
+            statement,
+            [values for _, values in rows.values()],
+            execution_options={"populate_existing": True}
+        ).all()
+        if "id" in columns:
+            results_by_id = {stored_model.id: stored_model for stored_model in results}
+            results = [results_by_id[values["id"]] for _, values in rows.values()]
+        for (indices, _), stored_model in zip(rows.values(), results):
+            for index in indices:
+                stored_models[index] = stored_model
+    return stored_models
@@ -3,6 +3,7 @@ from typing import Iterable, Union, Type, Optional, List
 from athena.contextvars import get_lms_url
 from athena.database import get_db
 from athena.schemas import Feedback
+from athena.storage.bulk_upsert import bulk_upsert
 
 
 def get_stored_feedback(
@@ -91,14 +92,11 @@ def store_feedback_suggestions(feedbacks: List[Feedback], lms_url: Optional[str]
     if lms_url is None:
         lms_url = get_lms_url()
 
-    stored_feedbacks: List[Feedback] = []
+    feedback_models = [feedback.to_model(is_suggestion=True, lms_url=lms_url) for feedback in feedbacks]
     with get_db() as db:
-        for feedback in feedbacks:
-            feedback_model = feedback.to_model(is_suggestion=True)
-            feedback_model.lms_url = lms_url
-            feedback_model = db.merge(feedback_model)
-            db.flush()  # Ensure the ID is generated now
-            stored_feedbacks.append(feedback_model.to_schema())
+        stored_feedbacks: List[Feedback] = [
+            feedback_model.to_schema() for feedback_model in bulk_upsert(db, feedback_models)
+        ]
         db.commit()
     return stored_feedbacks
 
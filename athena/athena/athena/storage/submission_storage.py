@@ -3,6 +3,7 @@ from typing import List, Iterable, Union, Type, Optional
 from athena.contextvars import get_lms_url
 from athena.database import get_db
 from athena.schemas import Submission
+from athena.storage.bulk_upsert import bulk_upsert
 
 
 def count_stored_submissions(
@@ -57,11 +58,14 @@ def store_submissions(submissions: List[Submission], lms_url: Optional[str] = No
     if lms_url is None:
         lms_url = get_lms_url()
 
+    submission_models = []
+    for s in submissions:
+        submission_model = s.to_model()
+        submission_model.lms_url = lms_url
+        submission_models.append(submission_model)
+
     with get_db() as db:
-        for s in submissions:
-            submission_model = s.to_model()
-            submission_model.lms_url = lms_url
-            db.merge(submission_model)
+        bulk_upsert(db, submission_models)
         db.commit()
 
 
@@ -0,0 +1,113 @@
+"""
+Diffs between the working trees of extracted repositories, computed in-process with difflib.
+
+The output follows `git diff` without the index lines: a `diff --git` header per file, new and deleted files against
+/dev/null, unified hunks with three lines of context and a note for binary files, which includes the files above the
+size limit for text files.
+Diffs between the same contents are only computed once.
+"""
+import difflib
+import fnmatch
+import re
+from typing import List, Optional, Tuple
+
+from module_programming_llm.helpers.repository_tree import LRUCache, RepositoryTree
+
+
+# Diffs by the content hashes of both trees and the diff options, e.g. the template to solution diff of an exercise
+_diffs = LRUCache(max_size=1024)
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)")
+# Lines git uses as the context of a hunk by default, e.g. a class declaration
+_FUNCTION_LINE = re.compile(r"^[A-Za-z_$]")
+
+
+def _hunk_context(src_lines: List[str], hunk_header: str) -> str:
+    """Append the last line before the hunk that looks like a declaration to its header, like git does"""
+    match = _HUNK_HEADER.match(hunk_header)
+    if match is None:
+        return hunk_header
+    for line in reversed(src_lines[:max(int(match.group(1)) - 1, 0)]):
+        if _FUNCTION_LINE.match(line):
+            return f"{hunk_header} {line[:80].rstrip()}"
+    return hunk_header
+
+
+def _file_diff(path: str, src_tree: RepositoryTree, dst_tree: RepositoryTree, src_prefix: str, dst_prefix: str) -> str:
+    src_exists = path in src_tree.hashes
+    dst_exists = path in dst_tree.hashes
+    src_name = f"{src_prefix}/{path}" if src_exists else "/dev/null"
+    dst_name = f"{dst_prefix}/{path}" if dst_exists else "/dev/null"
+    header = [f"diff --git {src_prefix}/{path} {dst_prefix}/{path}"]
+    if not src_exists:
+        header.append("new file mode 100644")
+    elif not dst_exists:
+        header.append("deleted file mode 100644")
+
+    src_text = src_tree.texts.get(path) if src_exists else ""
+    dst_text = dst_tree.texts.get(path) if dst_exists else ""
+    if src_text is None or dst_text is None:
+        return "\n".join(header + [f"Binary files {src_name} and {dst_name} differ"])
+
+    src_lines = _split_lines(src_text)
+    lines = difflib.unified_diff(src_lines, _split_lines(dst_text), fromfile=src_name, tofile=dst_name, lineterm="")
+    output = header
+    for index, line in enumerate(lines):
+        if index < 2:  # the --- and +++ lines
+            output.append(line)
+        elif line.startswith("@@"):
+            output.append(_hunk_context(src_lines, line))
+        elif line.endswith("\n"):
+            output.append(line[:-1])
+        else:
+            # the last line of a file without a newline at its end
+            output.extend([line, "\\ No newline at end of file"])
+    return "\n".join(output)
+
+
+def _split_lines(text: str) -> List[str]:
+    """Split the text into lines with their newlines like git, which only ends lines at \\n"""
+    lines = [line + "\n" for line in text.split("\n")]
+    lines[-1] = lines[-1][:-1]
+    return lines if lines[-1] else lines[:-1]
+
+
+def _matches(path: str, file_path: Optional[str]) -> bool:
+    if file_path is None:
+        return True
+    if "*" in file_path:
+        return fnmatch.fnmatchcase(path, file_path)
+    return path == file_path or path.startswith(file_path.rstrip("/") + "/")
+
+
+def _changed_paths(src_tree: RepositoryTree, dst_tree: RepositoryTree, file_path: Optional[str]) -> Tuple[str, ...]:
+    return tuple(
+        path
+        for path in sorted(src_tree.hashes.keys() | dst_tree.hashes.keys())
+        if _matches(path, file_path) and src_tree.hashes.get(path) != dst_tree.hashes.get(path)
+    )
+
+
+# pylint: disable=too-many-positional-arguments
+def diff_trees(src_tree: RepositoryTree,
+               dst_tree: RepositoryTree,
+               src_prefix: str = "a",
+               dst_prefix: str = "b",
+               file_path: Optional[str] = None,
+               name_only: bool = False) -> str:
+    """Diff two trees like `git diff`, the result is cached by the content hashes of the trees and the options."""
+    key = (src_tree.content_hash, dst_tree.content_hash, src_prefix, dst_prefix, file_path, name_only)
+    diff = _diffs.get(key)
+    if diff is not None:
+        return diff
+
+    changed_paths = _changed_paths(src_tree, dst_tree, file_path)
+    if name_only:
+        diff = "\n".join(changed_paths)
+    else:
+        diff = "\n".join(
+            _file_diff(path, src_tree, dst_tree, src_prefix, dst_prefix)
+            for path in changed_paths
+        )
+    _diffs.put(key, diff)
+    return diff
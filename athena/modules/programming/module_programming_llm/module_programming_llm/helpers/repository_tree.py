@@ -0,0 +1,141 @@
+"""
+Files of the working trees of extracted repositories, read directly from disk instead of through Git.
+
+The repositories are expected not to change once extracted, which holds for the repositories from the repository
+cache of Athena, so their files are only read once. Everything derived from the files is cached by the hash of their
+contents, so the template and solution repositories of an exercise are only loaded once for all of its submissions.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from git.repo import Repo
+
+
+# Repositories with more files are read by a thread pool, reading a file mostly waits for the disk
+PARALLEL_READ_MIN_FILES = 64
+PARALLEL_READ_WORKERS = 8
+# Larger files are not loaded as text, e.g. generated sources or data files that do not fit into a prompt anyway
+MAX_TEXT_FILE_SIZE_BYTES = 1024 * 1024
+
+
+def _read_file(path: str) -> Tuple[bytes, Optional[str]]:
+    """Return the hash of the contents of a file within the size limit and its text, None if it is binary"""
+    with open(path, "rb") as f:
+        content = f.read()
+    return hashlib.sha256(content).digest(), decode_text(content)
+
+
+def _oversized_file_hash(size: int) -> bytes:
+    """
+    Files above the size limit are never read, e.g. jars or data files, so they are only known by their size.
+    Their contents never reach a prompt, the size is enough to notice most changes in a diff.
+    """
+    return hashlib.sha256(f"oversized file of {size} bytes".encode("utf-8")).digest()
+
+
+class RepositoryTree:
+    """
+    The files of the working tree of a repository, without the .git directory, and a hash of their contents.
+    Only the text files are kept in memory, the other files are known by the hashes of their contents.
+    """
+
+    def __init__(self, root: str):
+        # Hashes of the contents of all files by path
+        self.hashes: Dict[str, bytes] = {}
+        # Contents of the text files within the size limit by path
+        self.texts: Dict[str, str] = {}
+
+        paths: List[str] = []
+        for directory, directory_names, file_names in os.walk(root):
+            if ".git" in directory_names:
+                directory_names.remove(".git")
+            for file_name in file_names:
+                path = os.path.join(directory, file_name)
+                if os.path.islink(path) or not os.path.isfile(path):
+                    continue
+                size = os.stat(path).st_size
+                if size > MAX_TEXT_FILE_SIZE_BYTES:
+                    self.hashes[self._relative_path(path, root)] = _oversized_file_hash(size)
+                else:
+                    paths.append(path)
+
+        if len(paths) >= PARALLEL_READ_MIN_FILES:
+            with ThreadPoolExecutor(max_workers=PARALLEL_READ_WORKERS) as executor:
+                results = list(executor.map(_read_file, paths))
+        else:
+            results = [_read_file(path) for path in paths]
+        for path, (file_hash, text) in zip(paths, results):
+            relative_path = self._relative_path(path, root)
+            self.hashes[relative_path] = file_hash
+            if text is not None:
+                self.texts[relative_path] = text
+
+        content_hash = hashlib.sha256()
+        for path in sorted(self.hashes):
+            content_hash.update(path.encode("utf-8") + b"\0")
+            content_hash.update(self.hashes[path])
+        self.content_hash = content_hash.hexdigest()
+
+    @staticmethod
+    def _relative_path(path: str, root: str) -> str:
+        return os.path.relpath(path, root).replace(os.sep, "/")
+
+
+class LRUCache:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
+# Trees by working tree directory, the template and solution trees of an exercise stay loaded across submissions
+_trees = LRUCache(max_size=64)
+# Text files by the content hash of the tree, repositories with the same contents share them
+_text_files = LRUCache(max_size=64)
+
+
+def get_tree(repo: Repo) -> RepositoryTree:
+    root = os.path.realpath(str(repo.working_tree_dir))
+    tree = _trees.get(root)
+    if tree is None:
+        tree = RepositoryTree(root)
+        text_files = _text_files.get(tree.content_hash)
+        if text_files is not None:
+            tree.texts = text_files
+        else:
+            _text_files.put(tree.content_hash, tree.texts)
+        _trees.put(root, tree)
+    return tree
+
+
+def decode_text(content: Optional[bytes]) -> Optional[str]:
+    """Decode the content as UTF-8, None if it is binary"""
+    if content is None or b"\0" in content:
+        return None
+    try:
+        return content.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+def get_text_files(tree: RepositoryTree) -> Dict[str, str]:
+    """Return the text files of the tree by path, leaving out binary files and files above the size limit."""
+    return tree.texts
@@ -1,19 +1,25 @@
 import os
 
-from contextlib import contextmanager
 from collections.abc import Iterator
 from typing import List, Dict, Optional, Callable, Tuple
 
-from git import Remote
 from git.repo import Repo
-from langchain.document_loaders import GitLoader
 
 from athena import GradingCriterion
+from module_programming_llm.helpers.diff import diff_trees
+from module_programming_llm.helpers.repository_tree import get_text_files, get_tree
 
 def load_files_from_repo(repo: Repo, file_filter: Optional[Callable[[str], bool]] = None) -> Dict[str, str]:
+    """Load the text files of the working tree by path relative to the repository.
+    The file filter is called with the absolute path of each file.
+    """
+    text_files = get_text_files(get_tree(repo))
+    if file_filter is None:
+        return dict(text_files)
     return {
-        doc.metadata['file_path']: doc.page_content
-        for doc in GitLoader(repo_path=str(repo.working_tree_dir), file_filter=file_filter).load()
+        file_path: content
+        for file_path, content in text_files.items()
+        if file_filter(os.path.join(str(repo.working_tree_dir), file_path))
     }
 
 
@@ -85,35 +91,17 @@ def get_programming_language_file_extension(programming_language: str) -> str |
     return file_extensions.get(programming_language.upper())
 
 
-@contextmanager
-def temporary_remote(remote_name: str, repo: Repo, remote_url: str) -> Iterator[Optional[Remote]]:
-    """Context manager for temporarily adding a remote to a Git repository.
-    
-    Args:
-        remote_name (str): The name of the remote
-        repo (Repo): The repository to add the remote to
-        remote_url (str): The URL of the remote
-    """
-    try:
-        remote = repo.remote(remote_name)
-        yield remote
-    except ValueError:
-        remote = repo.create_remote(remote_name, remote_url)
-        remote.fetch()
-        yield remote
-        repo.delete_remote(remote)
-
-
 # pylint: disable=too-many-positional-arguments
-def get_diff(src_repo: Repo, 
-             dst_repo: Repo, 
+def get_diff(src_repo: Repo,
+             dst_repo: Repo,
              src_prefix: str = "a",
              dst_prefix: str = "b",
              file_path: Optional[str] = None,
-             name_only: bool = False,
-             branch: str = "main", 
-             remote_name: str = "diff_target") -> str:
-    """Get the diff between two branches of two Git repositories.
+             name_only: bool = False) -> str:
+    """Get the diff between the working trees of two Git repositories.
+
+    The diff is computed in-process on the extracted files instead of fetching one repository into the other, and
+    cached by the contents of both repositories, so e.g. the template to solution diff is computed once per exercise.
 
     Args:
         src_repo (Repo): Repository to diff from
@@ -122,20 +110,16 @@ def get_diff(src_repo: Repo,
         dst_prefix (str, optional): Prefix for the destination files. Defaults to "b".
         file_path (Optional[str], optional): Path to the file(s), supports glob patterns. Defaults to None.
         name_only (bool, optional): Only show names of changed files. Defaults to False.
-        branch (str, optional): Branch to diff. Defaults to "main".
-        remote_name (str, optional): Name of the remote to use. Defaults to "diff_target".
 
     Returns:
-        str: The diff between the two branches
+        str: The diff between the two repositories
     """
+    src_tree = get_tree(src_repo)
 
     # Check if we are diffing a specific file
     if file_path is not None and "*" not in file_path:
-        specific_file_path = os.path.join(str(src_repo.working_tree_dir), file_path)
-        if not os.path.exists(specific_file_path):
+        if not os.path.exists(os.path.join(str(src_repo.working_tree_dir), file_path)):
             # Change error from 'No such file or directory' to something more meaningful (non-standard diff output)
             return f"- {src_prefix}/{file_path} does not exist.\n+ {dst_prefix}/{file_path} has been added."
 
-    with temporary_remote(remote_name, src_repo, str(dst_repo.working_tree_dir)):
-        diff = src_repo.git.diff(branch, f"{remote_name}/{branch}", f"--src-prefix={src_prefix}/", f"--dst-prefix={dst_prefix}/", file_path, name_only=name_only)
-    return diff
\ No newline at end of file
+    return diff_trees(src_tree, get_tree(dst_repo), src_prefix, dst_prefix, file_path, name_only)
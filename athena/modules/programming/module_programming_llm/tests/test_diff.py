@@ -0,0 +1,73 @@
+"""Compares the in-process diff of two working trees with the output of `git diff --no-index`."""
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import unittest
+from typing import Dict
+
+from module_programming_llm.helpers.diff import diff_trees
+from module_programming_llm.helpers.repository_tree import RepositoryTree
+
+
+def _write_tree(root: str, files: Dict[str, bytes]):
+    for path, content in files.items():
+        file_path = os.path.join(root, path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "wb") as f:
+            f.write(content)
+
+
+@unittest.skipIf(shutil.which("git") is None, "git is not installed")
+class DiffTreesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def assert_matches_git(self, src_files: Dict[str, bytes], dst_files: Dict[str, bytes]):
+        src_root = os.path.join(self.directory, "src")
+        dst_root = os.path.join(self.directory, "dst")
+        _write_tree(src_root, src_files)
+        _write_tree(dst_root, dst_files)
+
+        git_diff = subprocess.run(
+            ["git", "diff", "--no-index", "--src-prefix=a/", "--dst-prefix=b/", "src", "dst"],
+            cwd=self.directory, capture_output=True, check=False,
+        ).stdout.decode("utf-8")
+        # git names the files by the compared directories and adds index lines, which the in-process diff leaves out
+        git_diff = re.sub(r"\b([ab])/(src|dst)/", r"\1/", git_diff)
+        # lines only end at \n, like in the diff itself
+        expected = "\n".join(line for line in git_diff.split("\n")[:-1] if not line.startswith("index "))
+
+        diff = diff_trees(RepositoryTree(src_root), RepositoryTree(dst_root))
+        self.assertEqual(expected, diff)
+
+    def test_changed_added_and_deleted_files(self):
+        body = b"".join(b"line %d\n" % i for i in range(20))
+        self.assert_matches_git(
+            {"src/A.java": b"class A {\n" + body + b"}\n", "src/Gone.java": b"x\n", "README.md": b"hi\n"},
+            {
+                "src/A.java": b"class A {\n" + body.replace(b"line 5", b"LINE 5").replace(b"line 15", b"LINE 15")
+                + b"}\n",
+                "src/New.java": b"class New {}\n",
+                "README.md": b"hi\n",
+            },
+        )
+
+    def test_missing_newline_at_end_of_file(self):
+        self.assert_matches_git(
+            {"added.txt": b"a\nb", "removed.txt": b"a\nb\n", "both.txt": b"a\nb\nc"},
+            {"added.txt": b"a\nb\n", "removed.txt": b"a\nb", "both.txt": b"a\nB\nc"},
+        )
+
+    def test_lines_only_end_at_newlines(self):
+        self.assert_matches_git(
+            {"crlf.txt": b"a\r\nb\r\n", "separators.txt": "a\x0cb\x1cc d\ne\nf\n".encode("utf-8")},
+            {"crlf.txt": b"a\nb\n", "separators.txt": "a\x0cb\x1cc d\ne\nF\n".encode("utf-8")},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -61,15 +61,19 @@ def create_comparisons_with_suggestions(
     logger.debug("Grouping %d feedbacks by file path", len(feedbacks))
     feedbacks_by_file_path = group_feedbacks_by_file_path(feedbacks)
     for submission in submissions:
+        # read all files with feedback from the submission at once
+        code_by_file_path = submission.get_code_many(feedbacks_by_file_path)
+        # the paths of the files in the zip are only needed to tell missing files from files with other encodings
+        existing_file_paths = set()
+        if len(code_by_file_path) < len(feedbacks_by_file_path):
+            existing_file_paths = set(submission.get_file_paths())
         for file_path, file_feedbacks in feedbacks_by_file_path.items():
-            # read file from submission
-            try:
-                code = submission.get_code(file_path)
-            except KeyError:  # KeyError is for when the file is not in the zip
-                logger.debug("File %s not found in submission %d.", file_path, submission.id)
-                continue
-            except UnicodeDecodeError:
-                logger.warning("File %s in submission %d is not UTF-8 encoded.", file_path, submission.id)
+            code = code_by_file_path.get(file_path)
+            if code is None:
+                if file_path in existing_file_paths:
+                    logger.warning("File %s in submission %d is not UTF-8 encoded.", file_path, submission.id)
+                else:
+                    logger.debug("File %s not found in submission %d.", file_path, submission.id)
                 continue
             # get all methods in the file of the submission
             submission_methods = extract_methods(code)
@@ -43,3 +43,26 @@ class PipelineNotFoundException(HTTPException):
                 "errorMessage": "Pipeline not found",
             },
         )
+
+
+class PipelineQueueFullException(HTTPException):
+    def __init__(self, retry_after: int = 10):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail={
+                "type": "too_many_requests",
+                "errorMessage": "Too many pipeline requests, please try again later",
+            },
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+class PipelineSchedulerUnavailableException(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={
+                "type": "service_unavailable",
+                "errorMessage": "Pipelines are not accepted while the server shuts down",
+            },
+        )
@@ -0,0 +1,83 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+import weakref
+from typing import Any, Callable, Coroutine, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the event loop shared by the synchronous pipelines, which runs in a background thread for the lifetime
+    of the process. Async clients created on it stay usable, so their connections are reused across requests.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_loop.run_forever, name="iris-event-loop", daemon=True
+            ).start()
+        return _loop
+
+
+def run_coroutine(coroutine: Coroutine[Any, Any, T]) -> T:
+    """
+    Run the coroutine on the shared event loop and wait for its result, like asyncio.run without creating a new
+    event loop per call. The coroutine runs in a copy of the context of the caller, so it keeps the current span.
+    """
+    loop = get_event_loop()
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+    if running_loop is loop:
+        coroutine.close()
+        raise RuntimeError("run_coroutine cannot be called from the shared event loop")
+
+    result: concurrent.futures.Future = concurrent.futures.Future()
+
+    def start():
+        task = loop.create_task(coroutine)
+
+        def done(finished: asyncio.Task):
+            if finished.cancelled():
+                result.cancel()
+            elif finished.exception() is not None:
+                result.set_exception(finished.exception())
+            else:
+                result.set_result(finished.result())
+
+        task.add_done_callback(done)
+
+    # The task copies the context that start runs in
+    loop.call_soon_threadsafe(start, context=contextvars.copy_context())
+    return result.result()
+
+
+class LoopLocal(Generic[T]):
+    """
+    A value per event loop, e.g. an async HTTP client, which can only be used on the event loop it was created on.
+    The value of a loop is dropped once the loop is garbage collected.
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._values: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, T] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            value = self._values.get(loop)
+            if value is None:
+                value = self._factory()
+                self._values[loop] = value
+            return value
@@ -95,6 +95,8 @@ def convert_langchain_message_to_iris_message(
     type_to_role = {
         "human": IrisMessageRole.USER,
         "ai": IrisMessageRole.ASSISTANT,
+        # Streamed responses, e.g. the tool calls in the scratchpad of an agent
+        "AIMessageChunk": IrisMessageRole.ASSISTANT,
         "system": IrisMessageRole.SYSTEM,
         "tool": IrisMessageRole.TOOL,
     }
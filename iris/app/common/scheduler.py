@@ -0,0 +1,258 @@
+import itertools
+import logging
+import queue
+import threading
+import time
+from enum import IntEnum
+from typing import Callable, Optional
+
+from app.common.custom_exceptions import (
+    PipelineQueueFullException,
+    PipelineSchedulerUnavailableException,
+)
+from app.common.singleton import Singleton
+from app.config import settings, WorkerPoolSettings
+from app.telemetry import pipeline_context, span
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Priority of a scheduled job, jobs with a lower value are started first"""
+
+    INTERACTIVE = 0
+    DEFAULT = 1
+    BACKGROUND = 2
+
+
+class _Job:
+    def __init__(self, fn: Callable, args: tuple, kwargs: dict):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.enqueued_at = time.monotonic()
+        # Set once the submitter is done with the job, so a queue position update is never sent after the job
+        # already started
+        self.submitted = threading.Event()
+
+
+class WorkerPool:
+    """
+    A fixed number of worker threads processing jobs from a bounded priority queue.
+    Jobs with the same priority are processed in submission order.
+    """
+
+    def __init__(self, name: str, workers: int, queue_size: int):
+        self.name = name
+        self.workers = workers
+        self.queue_size = queue_size
+        self._queue = queue.PriorityQueue(maxsize=queue_size)
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._active = 0
+        self._submitted = 0
+        self._rejected = 0
+        self._completed = 0
+        self._failed = 0
+        self._total_wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._stopped = threading.Event()
+        self._threads = [
+            threading.Thread(
+                target=self._work, name=f"{name}-worker-{index}", daemon=True
+            )
+            for index in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(
+        self,
+        fn: Callable,
+        *args,
+        priority: Priority = Priority.DEFAULT,
+        on_queued: Optional[Callable[[int], None]] = None,
+        **kwargs,
+    ) -> int:
+        """
+        Queue the job and return its position in the queue, or 0 if a worker is free to start it right away.
+        If the job has to wait, on_queued is called with the position before the job can start. It runs on the
+        thread of the submitter, so it must not block, e.g. it should only queue a status update for sending.
+        Raises PipelineQueueFullException if the queue is full.
+        """
+        job = _Job(fn, args, kwargs)
+        sequence = next(self._sequence)
+        try:
+            self._queue.put_nowait((priority, sequence, job))
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            logger.warning(f"Rejected job, the queue of the {self.name} pool is full")
+            raise PipelineQueueFullException() from None
+
+        with self._lock:
+            self._submitted += 1
+            idle_workers = self.workers - self._active
+        with self._queue.mutex:
+            ahead = sum(
+                1 for item in self._queue.queue if item[:2] < (priority, sequence)
+            )
+        position = max(ahead + 1 - idle_workers, 0)
+        try:
+            if position > 0 and on_queued is not None:
+                on_queued(position)
+        except Exception as e:
+            logger.error(f"Error sending the queue position: {e}")
+        finally:
+            job.submitted.set()
+        return position
+
+    def stop(self):
+        """Let the workers finish the queued jobs and stop afterwards"""
+        self._stopped.set()
+
+    def join(self, deadline: Optional[float] = None):
+        """
+        Wait for the stopped workers to finish, at most until the deadline, a time.monotonic() timestamp.
+        The workers are daemon threads, so the jobs still running at the deadline end with the process.
+        """
+        for thread in self._threads:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            thread.join(timeout)
+            if thread.is_alive():
+                logger.warning(
+                    f"The {self.name} pool did not finish its jobs before the shutdown timeout"
+                )
+                return
+
+    def stats(self) -> dict:
+        with self._lock:
+            started = self._completed + self._failed + self._active
+            return {
+                "workers": self.workers,
+                "active": self._active,
+                "queued": self._queue.qsize(),
+                "queue_size": self.queue_size,
+                "submitted": self._submitted,
+                "rejected": self._rejected,
+                "completed": self._completed,
+                "failed": self._failed,
+                "average_wait_seconds": (
+                    self._total_wait_time / started if started else 0.0
+                ),
+                "max_wait_seconds": self._max_wait_time,
+            }
+
+    def _work(self):
+        while True:
+            try:
+                _, _, job = self._queue.get(timeout=1)
+            except queue.Empty:
+                if self._stopped.is_set():
+                    return
+                continue
+            job.submitted.wait()
+            wait_time = time.monotonic() - job.enqueued_at
+            with self._lock:
+                self._active += 1
+                self._total_wait_time += wait_time
+                self._max_wait_time = max(self._max_wait_time, wait_time)
+            failed = False
+            try:
+                job.fn(*job.args, **job.kwargs)
+            except Exception as e:
+                failed = True
+                logger.exception(f"Unhandled error in the {self.name} pool: {e}")
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    if failed:
+                        self._failed += 1
+                    else:
+                        self._completed += 1
+
+
+class PipelineScheduler(metaclass=Singleton):
+    """
+    Runs pipelines in bounded worker pools instead of starting a thread per request.
+    The pools and their sizes are configured in the scheduler section of the application settings.
+    """
+
+    def __init__(self, pools: Optional[dict[str, WorkerPoolSettings]] = None):
+        pools = pools or settings.scheduler.pools
+        if "default" not in pools:
+            raise ValueError("The scheduler pools must include a 'default' pool")
+        self._pools = {
+            name: WorkerPool(name, pool.workers, pool.queue_size)
+            for name, pool in pools.items()
+        }
+        self._shutting_down = False
+
+    def submit(
+        self,
+        pool: str,
+        fn: Callable,
+        *args,
+        priority: Priority = Priority.DEFAULT,
+        on_queued: Optional[Callable[[int], None]] = None,
+        **kwargs,
+    ) -> int:
+        """
+        Queue the job in the given pool, falling back to the default pool if it is not configured.
+        Raises PipelineSchedulerUnavailableException while shutting down and PipelineQueueFullException if the
+        queue is full.
+        """
+        if self._shutting_down:
+            raise PipelineSchedulerUnavailableException()
+        worker_pool = self._pools.get(pool, self._pools["default"])
+        return worker_pool.submit(
+            fn, *args, priority=priority, on_queued=on_queued, **kwargs
+        )
+
+    def shutdown(self, timeout: Optional[float] = None):
+        """
+        Reject new jobs and wait for the workers to finish the queued jobs, at most timeout seconds for all pools.
+        """
+        self._shutting_down = True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for worker_pool in self._pools.values():
+            worker_pool.stop()
+        for worker_pool in self._pools.values():
+            worker_pool.join(deadline)
+
+    def stats(self) -> dict[str, dict]:
+        return {name: pool.stats() for name, pool in self._pools.items()}
+
+
+def pipeline_name(worker: Callable) -> str:
+    """Name of the pipeline in the metrics, e.g. exercise_chat for run_exercise_chat_pipeline_worker"""
+    name = worker.__name__.removeprefix("run_").removesuffix("_worker")
+    return name.removesuffix("_pipeline")
+
+
+def submit_pipeline(
+    pool: str,
+    worker: Callable,
+    callback,
+    *args,
+    priority: Priority,
+    variant: str = "default",
+):
+    """
+    Queue the pipeline worker in the given pool, passing the status callback as its last argument.
+    The callback is created before queueing, so the client is told its queue position while it waits.
+    The run is traced and its spans and stages are labeled with the pipeline and the variant.
+    """
+    name = pipeline_name(worker)
+
+    def on_queued(position: int):
+        # Only queues the update with the StatusUpdateSender, so the response to the request is not delayed
+        callback.in_progress(f"Waiting in queue (position {position})...")
+
+    def run(*worker_args):
+        with pipeline_context(name, variant), span("pipeline", name):
+            worker(*worker_args)
+
+    return PipelineScheduler().submit(
+        pool, run, *args, callback, priority=priority, on_queued=on_queued
+    )
@@ -1,6 +1,8 @@
 import os
 from pathlib import Path
-from pydantic import BaseModel
+from typing import Literal
+
+from pydantic import BaseModel, field_validator
 import yaml
 
 
@@ -14,10 +16,86 @@ class WeaviateSettings(BaseModel):
     grpc_port: int
 
 
+class WorkerPoolSettings(BaseModel):
+    workers: int
+    queue_size: int
+
+
+class SchedulerSettings(BaseModel):
+    pools: dict[str, WorkerPoolSettings] = {
+        "chat": WorkerPoolSettings(workers=16, queue_size=200),
+        "ingestion": WorkerPoolSettings(workers=5, queue_size=500),
+        "default": WorkerPoolSettings(workers=8, queue_size=100),
+    }
+    # Seconds to wait on shutdown for the workers to finish the running and queued jobs
+    shutdown_timeout: float = 300
+
+    @field_validator("pools")
+    @classmethod
+    def require_default_pool(cls, pools: dict[str, WorkerPoolSettings]):
+        """Jobs for pools that are not configured run in the default pool, so it has to exist"""
+        if "default" not in pools:
+            raise ValueError("The scheduler pools must include a 'default' pool")
+        return pools
+
+
+class RetrievalSettings(BaseModel):
+    # "fusion" fuses the results of both searches by their ranks and only asks the LLM reranker if they disagree,
+    # "rerank" always lets the LLM reranker select from all results
+    mode: Literal["fusion", "rerank"] = "fusion"
+    # Constant of the reciprocal rank fusion, higher values give lower ranked results more weight
+    rrf_k: int = 60
+    # Number of fused results that are returned
+    top_k: int = 5
+    # Minimum share of the top_k results both searches have in common to skip the LLM reranker
+    min_agreement: float = 0.4
+    # Backend of the reranker pipeline: "llm" asks a chat model to select the paragraphs, "embedding" ranks them
+    # by the cosine similarity of their embeddings to the query and "cross_encoder" scores them with a local
+    # cross-encoder, which requires the sentence-transformers package
+    reranker: Literal["llm", "embedding", "cross_encoder"] = "llm"
+    cross_encoder_model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+class RequestLoggingSettings(BaseModel):
+    enabled: bool = True
+    # Number of bytes of the request and response bodies that are logged
+    max_body_bytes: int = 2048
+    # Share of the requests whose bodies are logged, the size is logged for every request
+    sample_rate: float = 1.0
+    # Path prefixes whose bodies are never logged, e.g. the webhooks that receive whole lecture PDFs
+    excluded_paths: list[str] = ["/api/v1/webhooks"]
+
+
+class MetricsSettings(BaseModel):
+    # Record span and stage durations and expose them on /metrics
+    enabled: bool = True
+    # Upper bounds of the histogram buckets in seconds
+    buckets: list[float] = [
+        0.005,
+        0.01,
+        0.025,
+        0.05,
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+        5.0,
+        10.0,
+        30.0,
+        60.0,
+        120.0,
+    ]
+
+
 class Settings(BaseModel):
     api_keys: list[APIKeyConfig]
     env_vars: dict[str, str]
     weaviate: WeaviateSettings
+    scheduler: SchedulerSettings = SchedulerSettings()
+    retrieval: RetrievalSettings = RetrievalSettings()
+    request_logging: RequestLoggingSettings = RequestLoggingSettings()
+    metrics: MetricsSettings = MetricsSettings()
 
     @classmethod
     def get_settings(cls):
@@ -1,8 +1,12 @@
 from typing import Optional, List
 
+from pydantic import Field
+
 from app.domain.status.status_update_dto import StatusUpdateDTO
 
 
 class CourseChatStatusUpdateDTO(StatusUpdateDTO):
     result: Optional[str] = None
     suggestions: List[str] = []
+    # The response generated so far, while it is streamed
+    partial_result: Optional[str] = Field(alias="partialResult", default=None)
@@ -1,3 +1,7 @@
+from typing import Optional
+
+from pydantic import Field
+
 from app.domain.status.status_update_dto import StatusUpdateDTO
 
 
@@ -10,3 +14,5 @@ class LectureChatStatusUpdateDTO(StatusUpdateDTO):
 
     result: str
     """The result message or status of the lecture chat pipeline operation."""
+    partial_result: Optional[str] = Field(alias="partialResult", default=None)
+    """The response generated so far, while it is streamed."""
@@ -0,0 +1,111 @@
+import logging
+import threading
+import time
+import uuid
+from typing import Optional
+
+from weaviate.classes.data import DataObject
+from weaviate.collections import Collection
+
+from app.common.singleton import Singleton
+from app.telemetry import span
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionWriteError(Exception):
+    """Raised when objects could not be written to Weaviate after all retries"""
+
+    def __init__(self, collection_name: str, errors: dict[int, str]):
+        self.collection_name = collection_name
+        self.errors = errors
+        sample = "; ".join(list(dict.fromkeys(errors.values()))[:3])
+        super().__init__(
+            f"Failed to write {len(errors)} objects to {collection_name}: {sample}"
+        )
+
+
+class IngestionWriter(metaclass=Singleton):
+    """
+    Writes ingested objects with precomputed vectors to Weaviate. Any number of ingestion pipelines can write
+    concurrently, the objects are sent in fixed size batches through the batch endpoint of the collection, and
+    only the number of batch requests in flight at the same time is limited.
+    Every object gets its uuid before the first attempt, so retrying a batch that failed in flight does not
+    create duplicates. Objects that Weaviate rejects are retried on their own with an exponential backoff.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 100,
+        max_concurrent_requests: int = 4,
+        max_retries: int = 3,
+        retry_delay_seconds: float = 1.0,
+    ):
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_delay_seconds = retry_delay_seconds
+        self._requests = threading.BoundedSemaphore(max_concurrent_requests)
+
+    def write(
+        self,
+        collection: Collection,
+        objects: list[dict],
+        vectors: list[list[float]],
+        uuids: Optional[list[uuid.UUID]] = None,
+    ) -> list[uuid.UUID]:
+        """
+        Write the objects with their vectors and return their uuids.
+        Objects are replaced if uuids of stored objects are given, which updates many objects in a few requests.
+        Raises an IngestionWriteError with the error of every object that still failed after the retries.
+        """
+        if uuids is None:
+            uuids = [uuid.uuid4() for _ in objects]
+        data_objects = [
+            DataObject(properties=properties, vector=vector, uuid=object_uuid)
+            for properties, vector, object_uuid in zip(
+                objects, vectors, uuids, strict=True
+            )
+        ]
+        errors = {}
+        for start in range(0, len(data_objects), self.batch_size):
+            end = start + self.batch_size
+            batch_errors = self._write_batch(collection, data_objects[start:end])
+            errors.update({start + index: e for index, e in batch_errors.items()})
+        if errors:
+            raise IngestionWriteError(collection.name, errors)
+        return [data_object.uuid for data_object in data_objects]
+
+    def _write_batch(
+        self, collection: Collection, data_objects: list[DataObject]
+    ) -> dict[int, str]:
+        """Write one batch and return the errors of the objects that failed on the last attempt by index"""
+        pending = dict(enumerate(data_objects))
+        errors = {}
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self.retry_delay_seconds * 2 ** (attempt - 1))
+            indexes = list(pending)
+            try:
+                with self._requests, span("weaviate", f"{collection.name}.insert_many"):
+                    result = collection.data.insert_many(
+                        [pending[index] for index in indexes]
+                    )
+            except Exception as e:
+                logger.warning(
+                    f"Batch of {len(indexes)} objects to {collection.name} failed "
+                    f"(attempt {attempt + 1}): {e}"
+                )
+                errors = {index: str(e) for index in indexes}
+                continue
+            errors = {
+                indexes[position]: error.message
+                for position, error in result.errors.items()
+            }
+            if not errors:
+                return {}
+            logger.warning(
+                f"{len(errors)} of {len(indexes)} objects to {collection.name} failed "
+                f"(attempt {attempt + 1})"
+            )
+            pending = {index: pending[index] for index in errors}
+        return errors
@@ -0,0 +1,157 @@
+import hashlib
+from collections import Counter
+from typing import Optional
+
+import fitz
+
+# Zoom factors the pages are rendered with for the vision model
+LOW_RESOLUTION_ZOOM = 2
+HIGH_RESOLUTION_ZOOM = 5
+
+
+class ImageDigests:
+    """
+    Digests of the raw streams of the images of a document by their xref, so an image that is placed on many
+    pages, like a logo, is only read and hashed once.
+    """
+
+    def __init__(self, doc: fitz.Document):
+        self.doc = doc
+        self._digests: dict[int, bytes] = {}
+
+    def get(self, xref: int) -> bytes:
+        digest = self._digests.get(xref)
+        if digest is None:
+            digest = hashlib.sha256(self.doc.xref_stream_raw(xref) or b"").digest()
+            self._digests[xref] = digest
+        return digest
+
+
+class PageImage:
+    """
+    An image placed on a page. Its digest identifies the image within the document: the xref of the image, which
+    is shared by all placements of the same image, or a digest of the pixels of an inline image without one.
+    """
+
+    def __init__(self, digest: bytes, area_ratio: float):
+        self.digest = digest
+        self.area_ratio = area_ratio
+
+
+class PageClassification:
+    """
+    Whether a page has to be interpreted by the vision model and at which zoom it is rendered.
+    Pages with the same interpretation_key look the same, so their interpretation can be shared.
+    """
+
+    def __init__(self, zoom: Optional[int], interpretation_key: Optional[str] = None):
+        self.zoom = zoom
+        self.interpretation_key = interpretation_key
+
+    @property
+    def needs_interpretation(self) -> bool:
+        return self.zoom is not None
+
+
+def page_images(page: fitz.Page) -> list[PageImage]:
+    """
+    Return the images of the page with the share of the page area they cover.
+    The pixels are only hashed on pages with inline images, as the other images are identified by their xref.
+    """
+    page_rect = page.rect
+    page_area = abs(page_rect) or 1.0
+    infos = page.get_image_info(xrefs=True)
+    if any(not info.get("xref") for info in infos):
+        infos = page.get_image_info(hashes=True, xrefs=True)
+    images = []
+    for info in infos:
+        visible = fitz.Rect(info["bbox"]) & page_rect
+        if info.get("xref"):
+            digest = f"xref:{info['xref']}".encode("utf-8")
+        else:
+            digest = info.get("digest") or b""
+        images.append(PageImage(digest, abs(visible) / page_area))
+    return images
+
+
+class PageClassifier:
+    """
+    Decides from cheap signals which pages of a deck are worth a vision call and at which resolution.
+    Images that are tiny are decorative and ignored, as are images repeated on many pages that are either small,
+    like university logos and footers, or cover the whole page, like slide backgrounds. A large diagram repeated
+    on a few consecutive slides is still content. Pages without content images are not interpreted.
+    Pages with small images or a lot of text are rendered at a low zoom, as the text is extracted separately and
+    the image only has to be recognizable. Only pages dominated by large images are rendered at full resolution.
+    """
+
+    def __init__(
+        self,
+        min_image_area_ratio: float = 0.03,
+        repeated_image_min_pages: int = 3,
+        repeated_image_page_ratio: float = 0.25,
+        large_image_area_ratio: float = 0.25,
+        background_area_ratio: float = 0.9,
+        dense_text_characters: int = 800,
+    ):
+        self.min_image_area_ratio = min_image_area_ratio
+        self.repeated_image_min_pages = repeated_image_min_pages
+        self.repeated_image_page_ratio = repeated_image_page_ratio
+        self.large_image_area_ratio = large_image_area_ratio
+        self.background_area_ratio = background_area_ratio
+        self.dense_text_characters = dense_text_characters
+
+    def classify_deck(
+        self, doc: fitz.Document, page_texts: dict[int, str]
+    ) -> dict[int, PageClassification]:
+        """
+        Classify the pages whose text is given. The images of all pages are inspected, so an image counts as
+        repeated no matter which pages of the deck are ingested.
+        """
+        images_by_page = [page_images(doc.load_page(n)) for n in range(doc.page_count)]
+        occurrences = Counter(
+            digest
+            for images in images_by_page
+            for digest in {image.digest for image in images}
+        )
+        repeated_min = max(
+            self.repeated_image_min_pages,
+            self.repeated_image_page_ratio * doc.page_count,
+        )
+        repeated = {d for d, count in occurrences.items() if count >= repeated_min}
+        return {
+            page_num: self.classify_page(images_by_page[page_num], page_text, repeated)
+            for page_num, page_text in page_texts.items()
+        }
+
+    def is_decorative(self, image: PageImage, repeated: set[bytes]) -> bool:
+        if image.area_ratio < self.min_image_area_ratio:
+            return True
+        return image.digest in repeated and (
+            image.area_ratio < self.large_image_area_ratio
+            or image.area_ratio >= self.background_area_ratio
+        )
+
+    def classify_page(
+        self, images: list[PageImage], page_text: str, repeated: set[bytes]
+    ) -> PageClassification:
+        content_images = [
+            image for image in images if not self.is_decorative(image, repeated)
+        ]
+        if not content_images:
+            return PageClassification(None)
+
+        image_area_ratio = min(1.0, sum(image.area_ratio for image in content_images))
+        text_characters = len("".join(page_text.split()))
+        if (
+            image_area_ratio < self.large_image_area_ratio
+            or text_characters >= self.dense_text_characters
+        ):
+            zoom = LOW_RESOLUTION_ZOOM
+        else:
+            zoom = HIGH_RESOLUTION_ZOOM
+
+        digest = hashlib.sha256(str(zoom).encode("utf-8"))
+        for image_digest in sorted(image.digest for image in content_images):
+            digest.update(image_digest)
+        digest.update(" ".join(page_text.split()).encode("utf-8"))
+        return PageClassification(zoom, digest.hexdigest())
@@ -61,20 +61,13 @@ def calculate_capability_scores(
         # The normalization here is based on the position of the score in the sorted list to balance out
         # the different ranges of the capabilities
         sorted_scores = sorted(set(scores))
+        positions = {score: index + 1 for index, score in enumerate(sorted_scores)}
         weight_modifier = capability_weights[requirement]
         normalized_scores = [
-            ((sorted_scores.index(score) + 1) / len(sorted_scores)) * weight_modifier
+            (positions[score] / len(sorted_scores)) * weight_modifier
             for score in scores
         ]
         all_scores.append(normalized_scores)
 
-    final_scores = []
-
     # Sum up the scores for each capability to get the final score for each list of capabilities
-    for i in range(len(all_scores[0])):
-        score = 0
-        for j in range(len(all_scores)):
-            score += all_scores[j][i]
-        final_scores.append(score)
-
-    return final_scores
+    return [sum(capability_scores) for capability_scores in zip(*all_scores)]
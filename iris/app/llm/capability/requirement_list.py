@@ -45,3 +45,7 @@ class RequirementList:
         self.self_hosted = self_hosted
         self.image_recognition = image_recognition
         self.json_mode = json_mode
+
+    def cache_key(self) -> tuple:
+        """A hashable representation of the requirements, used to cache the model ranking"""
+        return tuple(self.__dict__.items())
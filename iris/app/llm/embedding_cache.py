@@ -0,0 +1,117 @@
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Optional
+
+from ..common import Singleton
+from ..llm.external.model import EmbeddingModel
+
+
+class EmbeddingCache(metaclass=Singleton):
+    """
+    Process-wide LRU cache for embeddings, keyed by the model id and a hash of the embedded text.
+    Vectors are stored as float32 arrays to keep the memory footprint small.
+    """
+
+    max_entries: int
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, array] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(model_id: str, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model_id}:{digest}"
+
+    def get_many(self, model_id: str, texts: list[str]) -> list[Optional[list[float]]]:
+        """Return the cached embedding for each text, or None if it is not cached"""
+        keys = [self._key(model_id, text) for text in texts]
+        result = []
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is None:
+                    result.append(None)
+                    continue
+                self._entries.move_to_end(key)
+                result.append(vector.tolist())
+        return result
+
+    def put_many(
+        self, model_id: str, texts: list[str], embeddings: list[list[float]]
+    ) -> None:
+        """Store the embeddings of the given texts, evicting the least recently used entries"""
+        entries = [
+            (self._key(model_id, text), array("f", embedding))
+            for text, embedding in zip(texts, embeddings)
+        ]
+        with self._lock:
+            for key, vector in entries:
+                self._entries[key] = vector
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def embed_batch_cached(llm: EmbeddingModel, texts: list[str]) -> list[list[float]]:
+    """
+    Embed the texts with the given model, only sending texts to the model that are not already cached.
+    Duplicate texts are embedded once.
+    """
+    cache = EmbeddingCache()
+    embeddings = cache.get_many(llm.id, texts)
+    missing = _find_missing_texts(texts, embeddings)
+    if not missing:
+        return embeddings
+    return _fill_missing_embeddings(
+        cache, llm, texts, embeddings, missing, llm.embed_batch(missing)
+    )
+
+
+async def aembed_batch_cached(
+    llm: EmbeddingModel, texts: list[str]
+) -> list[list[float]]:
+    """
+    Async variant of embed_batch_cached
+    """
+    cache = EmbeddingCache()
+    embeddings = cache.get_many(llm.id, texts)
+    missing = _find_missing_texts(texts, embeddings)
+    if not missing:
+        return embeddings
+    return _fill_missing_embeddings(
+        cache, llm, texts, embeddings, missing, await llm.aembed_batch(missing)
+    )
+
+
+def _find_missing_texts(
+    texts: list[str], embeddings: list[Optional[list[float]]]
+) -> list[str]:
+    return list(
+        dict.fromkeys(
+            text for text, embedding in zip(texts, embeddings) if embedding is None
+        )
+    )
+
+
+def _fill_missing_embeddings(
+    cache: EmbeddingCache,
+    llm: EmbeddingModel,
+    texts: list[str],
+    embeddings: list[Optional[list[float]]],
+    missing: list[str],
+    new_embeddings: list[list[float]],
+) -> list[list[float]]:
+    cache.put_many(llm.id, missing, new_embeddings)
+    by_text = dict(zip(missing, new_embeddings))
+    return [
+        embedding if embedding is not None else by_text[text]
+        for text, embedding in zip(texts, embeddings)
+    ]
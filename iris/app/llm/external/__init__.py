@@ -11,6 +11,7 @@ from ...llm.external.openai_embeddings import (
     AzureOpenAIEmbeddingModel,
 )
 from ...llm.external.ollama import OllamaModel
+from ...llm.external.fake import FakeModel
 
 AnyLLM = Union[
     DirectOpenAICompletionModel,
@@ -20,4 +21,5 @@ AnyLLM = Union[
     DirectOpenAIEmbeddingModel,
     AzureOpenAIEmbeddingModel,
     OllamaModel,
+    FakeModel,
 ]
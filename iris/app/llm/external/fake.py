@@ -0,0 +1,150 @@
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Literal, Any, Optional, Sequence, Union, Dict, Type, Callable
+
+import numpy as np
+from langchain_core.tools import BaseTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import BaseModel
+
+from ...common.pyris_message import PyrisMessage, PyrisAIMessage, IrisMessageRole
+from ...common.token_usage_dto import TokenUsageDTO
+from ...domain.data.image_message_content_dto import ImageMessageContentDTO
+from ...domain.data.text_message_content_dto import TextMessageContentDTO
+from ...domain.data.tool_call_dto import ToolCallDTO
+from ...llm import CompletionArguments
+from ...llm.external.model import ChatModel, CompletionModel, EmbeddingModel
+
+# Number of calls of the fake models by model id and method, e.g. ("fake-chat", "chat")
+_call_counts: Counter = Counter()
+_call_counts_lock = threading.Lock()
+
+
+def fake_model_call_counts() -> dict[tuple[str, str], int]:
+    """Return the number of calls of the fake models since the last reset"""
+    with _call_counts_lock:
+        return dict(_call_counts)
+
+
+def reset_fake_model_call_counts():
+    with _call_counts_lock:
+        _call_counts.clear()
+
+
+def messages_text(messages: list[PyrisMessage]) -> str:
+    """Join the text contents of the messages"""
+    return "\n".join(
+        content.text_content
+        for message in messages
+        for content in message.contents
+        if isinstance(content, TextMessageContentDTO) and content.text_content
+    )
+
+
+class FakeModel(
+    CompletionModel,
+    ChatModel,
+    EmbeddingModel,
+):
+    """
+    Deterministic stand-in for a language model, for benchmarks and local development without an LLM provider.
+    Every call sleeps for latency_seconds and is counted per model id and method. Completions and chat calls
+    answer with the first of the responses whose key occurs in the prompt, e.g. a field of the output format a
+    pipeline asks for, and with the default response otherwise. If tools are bound and no tool was called yet,
+    the tools named in tool_calls are called first. Embeddings are derived from the hash of the
+    text, so equal texts get equal vectors.
+    """
+
+    type: Literal["fake"]
+    latency_seconds: float = 0.0
+    response: str = "This is a response of the fake model."
+    responses: dict[str, str] = {}
+    tool_calls: list[str] = []
+    embedding_dimensions: int = 256
+
+    def _record_call(self, method: str):
+        with _call_counts_lock:
+            _call_counts[(self.id, method)] += 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+
+    def complete(
+        self,
+        prompt: str,
+        arguments: CompletionArguments,
+        image: Optional[ImageMessageContentDTO] = None,
+    ) -> str:
+        self._record_call("complete")
+        return self._select_response(prompt)
+
+    def chat(
+        self,
+        messages: list[PyrisMessage],
+        arguments: CompletionArguments,
+        tools: Optional[
+            Sequence[Union[Dict[str, Any], Type[BaseModel], Callable, BaseTool]]
+        ],
+    ) -> PyrisMessage:
+        self._record_call("chat")
+        prompt = messages_text(messages)
+        # Rough token counts, one token per word
+        token_usage = TokenUsageDTO(
+            numInputTokens=len(prompt.split()),
+            numOutputTokens=len(self.response.split()),
+            model=self.id,
+        )
+        tool_calls = self._select_tool_calls(messages, tools)
+        if tool_calls:
+            return PyrisAIMessage(
+                tool_calls=tool_calls,
+                contents=[TextMessageContentDTO(textContent="")],
+                sentAt=datetime.now(),
+                token_usage=token_usage,
+            )
+        return PyrisMessage(
+            sender=IrisMessageRole.ASSISTANT,
+            contents=[TextMessageContentDTO(textContent=self._select_response(prompt))],
+            sentAt=datetime.now(),
+            token_usage=token_usage,
+        )
+
+    def _select_response(self, prompt: str) -> str:
+        for key, response in self.responses.items():
+            if key in prompt:
+                return response
+        return self.response
+
+    def _select_tool_calls(
+        self, messages: list[PyrisMessage], tools
+    ) -> list[ToolCallDTO]:
+        """Call the configured tools that are bound, unless a tool was called before"""
+        if not tools or any(m.sender == IrisMessageRole.TOOL for m in messages):
+            return []
+        bound = {convert_to_openai_tool(tool)["function"]["name"] for tool in tools}
+        return [
+            ToolCallDTO(
+                id=f"call_{index}",
+                function={"name": name, "arguments": json.dumps({})},
+            )
+            for index, name in enumerate(self.tool_calls)
+            if name in bound
+        ]
+
+    def embed(self, text: str) -> list[float]:
+        return self.embed_batch([text])[0]
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        self._record_call("embed")
+        return [self._embedding(text) for text in texts]
+
+    def _embedding(self, text: str) -> list[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+        vector = np.random.default_rng(seed).standard_normal(self.embedding_dimensions)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def __str__(self):
+        return f"Fake('{self.id}')"
@@ -1,5 +1,6 @@
+import asyncio
 from abc import ABCMeta, abstractmethod
-from typing import Sequence, Union, Dict, Any, Type, Callable
+from typing import Sequence, Union, Dict, Any, Type, Callable, Iterator
 
 from black import Optional
 from langchain_core.tools import BaseTool
@@ -56,6 +57,34 @@ class ChatModel(LanguageModel, metaclass=ABCMeta):
             f"The LLM {self.__str__()} does not support chat completion"
         )
 
+    async def achat(
+        self,
+        messages: list[PyrisMessage],
+        arguments: CompletionArguments,
+        tools: Optional[
+            Sequence[Union[Dict[str, Any], Type[BaseModel], Callable, BaseTool]]
+        ],
+    ) -> PyrisMessage:
+        """Create a completion from the chat messages without blocking the event loop.
+        Models with an async client should override this, the default runs chat in a worker thread.
+        """
+        return await asyncio.to_thread(self.chat, messages, arguments, tools)
+
+    def stream_chat(
+        self,
+        messages: list[PyrisMessage],
+        arguments: CompletionArguments,
+        tools: Optional[
+            Sequence[Union[Dict[str, Any], Type[BaseModel], Callable, BaseTool]]
+        ],
+    ) -> Iterator[PyrisMessage]:
+        """Create a completion from the chat messages and yield it in parts while it is generated.
+        Each message holds the next part of the text. The token usage and the complete tool calls follow in separate
+        messages at the end.
+        Models that support streaming should override this, the default yields the complete response at once.
+        """
+        yield self.chat(messages, arguments, tools)
+
 
 class EmbeddingModel(LanguageModel, metaclass=ABCMeta):
     """Abstract class for the llm embedding wrappers"""
@@ -71,6 +100,21 @@ class EmbeddingModel(LanguageModel, metaclass=ABCMeta):
             f"The LLM {self.__str__()} does not support embeddings"
         )
 
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        """Create embeddings for multiple texts, in the same order as the input.
+        Models that support sending several inputs per request should override this."""
+        return [self.embed(text) for text in texts]
+
+    async def aembed(self, text: str) -> list[float]:
+        """Create an embedding from the text without blocking the event loop.
+        Models with an async client should override this, the default runs embed in a worker thread.
+        """
+        return await asyncio.to_thread(self.embed, text)
+
+    async def aembed_batch(self, texts: list[str]) -> list[list[float]]:
+        """Create embeddings for multiple texts without blocking the event loop"""
+        return await asyncio.to_thread(self.embed_batch, texts)
+
 
 class ImageGenerationModel(LanguageModel, metaclass=ABCMeta):
     """Abstract class for the llm image generation wrappers"""
@@ -1,12 +1,23 @@
 import base64
 from datetime import datetime
-from typing import Literal, Any, Optional, Sequence, Union, Dict, Type, Callable
+from typing import (
+    Literal,
+    Any,
+    Optional,
+    Sequence,
+    Union,
+    Dict,
+    Type,
+    Callable,
+    Iterator,
+)
 
 from langchain_core.tools import BaseTool
 from pydantic import Field, BaseModel
 
-from ollama import Client, Message
+from ollama import AsyncClient, Client, Message
 
+from ...common.event_loop import LoopLocal
 from ...common.message_converters import map_role_to_str, map_str_to_role
 from ...common.pyris_message import PyrisMessage
 from ...common.token_usage_dto import TokenUsageDTO
@@ -91,10 +102,13 @@ class OllamaModel(
     host: str
     options: dict[str, Any] = Field(default={})
     _client: Client
+    _async_clients: LoopLocal[AsyncClient]
 
     def model_post_init(self, __context: Any) -> None:
         self._client = Client(host=self.host)  # TODO: Add authentication (httpx auth?)
         self._client._client.base_url = self.host
+        # One async client per event loop, so its connections are reused by all requests on the loop
+        self._async_clients = LoopLocal(self._create_async_client)
 
     def complete(
         self,
@@ -132,11 +146,80 @@ class OllamaModel(
             response.get("model", self.model),
         )
 
+    def stream_chat(
+        self,
+        messages: list[PyrisMessage],
+        arguments: CompletionArguments,
+        tools: Optional[
+            Sequence[Union[Dict[str, Any], Type[BaseModel], Callable, BaseTool]]
+        ],
+    ) -> Iterator[PyrisMessage]:
+        response = self._client.chat(
+            model=self.model,
+            messages=convert_to_ollama_messages(messages),
+            format="json" if arguments.response_format == "JSON" else "",
+            options=self.options,
+            stream=True,
+        )
+        for chunk in response:
+            # Only the last chunk holds the token counts
+            yield convert_to_iris_message(
+                chunk.get("message"),
+                chunk.get("prompt_eval_count", 0),
+                chunk.get("eval_count", 0),
+                chunk.get("model", self.model),
+            )
+
+    async def achat(
+        self,
+        messages: list[PyrisMessage],
+        arguments: CompletionArguments,
+        tools: Optional[
+            Sequence[Union[Dict[str, Any], Type[BaseModel], Callable, BaseTool]]
+        ],
+    ) -> PyrisMessage:
+        response = await self._async_clients.get().chat(
+            model=self.model,
+            messages=convert_to_ollama_messages(messages),
+            format="json" if arguments.response_format == "JSON" else "",
+            options=self.options,
+        )
+        return convert_to_iris_message(
+            response.get("message"),
+            response.get("prompt_eval_count", 0),
+            response.get("eval_count", 0),
+            response.get("model", self.model),
+        )
+
     def embed(self, text: str) -> list[float]:
         response = self._client.embeddings(
             model=self.model, prompt=text, options=self.options
         )
-        return list(response)
+        return list(response["embedding"])
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        response = self._client.embed(
+            model=self.model, input=texts, options=self.options
+        )
+        return [list(embedding) for embedding in response["embeddings"]]
+
+    async def aembed(self, text: str) -> list[float]:
+        return (await self.aembed_batch([text]))[0]
+
+    async def aembed_batch(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        response = await self._async_clients.get().embed(
+            model=self.model, input=texts, options=self.options
+        )
+        return [list(embedding) for embedding in response["embeddings"]]
+
+    def _create_async_client(self) -> AsyncClient:
+        client = AsyncClient(host=self.host)
+        client._client.base_url = self.host
+        return client
 
     def __str__(self):
         return f"Ollama('{self.model}')"
@@ -1,27 +1,45 @@
 import json
 import logging
 import time
+from abc import abstractmethod
 from datetime import datetime
-from typing import Literal, Any, Sequence, Union, Dict, Type, Callable, Optional
+from typing import (
+    Literal,
+    Any,
+    Sequence,
+    Union,
+    Dict,
+    Type,
+    Callable,
+    Optional,
+    Iterator,
+)
 
 from langchain_core.tools import BaseTool
 from langchain_core.utils.function_calling import convert_to_openai_tool
 from openai import (
+    AsyncOpenAI,
     OpenAI,
     APIError,
     APITimeoutError,
     RateLimitError,
     ContentFilterFinishReasonError,
 )
-from openai.lib.azure import AzureOpenAI
+from openai.lib.azure import AsyncAzureOpenAI, AzureOpenAI
 from openai.types import CompletionUsage
-from openai.types.chat import ChatCompletionMessage, ChatCompletionMessageParam
+from openai.types.chat import (
+    ChatCompletion,
+    ChatCompletionChunk,
+    ChatCompletionMessage,
+    ChatCompletionMessageParam,
+)
 from openai.types.shared_params import ResponseFormatJSONObject
 from pydantic import BaseModel
 
 from app.domain.data.text_message_content_dto import TextMessageContentDTO
+from ...common.event_loop import LoopLocal
 from ...common.message_converters import map_role_to_str, map_str_to_role
-from ...common.pyris_message import PyrisMessage, PyrisAIMessage
+from ...common.pyris_message import PyrisMessage, PyrisAIMessage, IrisMessageRole
 from ...common.token_usage_dto import TokenUsageDTO
 from ...domain.data.image_message_content_dto import ImageMessageContentDTO
 from ...domain.data.json_message_content_dto import JsonMessageContentDTO
@@ -29,6 +47,15 @@ from ...domain.data.tool_call_dto import ToolCallDTO
 from ...domain.data.tool_message_content_dto import ToolMessageContentDTO
 from ...llm import CompletionArguments
 from ...llm.external.model import ChatModel
+from ...llm.external.retry import (
+    RETRIES,
+    acall_with_retries,
+    call_with_retries,
+    retry_wait_time,
+)
+
+# Errors after which a request is sent again
+RETRIED_ERRORS = (APIError, APITimeoutError, RateLimitError)
 
 
 def convert_content_to_openai_format(content):
@@ -200,6 +227,21 @@ def convert_to_iris_message(
 class OpenAIChatModel(ChatModel):
     model: str
     api_key: str
+    _async_clients: LoopLocal[AsyncOpenAI]
+
+    def model_post_init(self, __context: Any) -> None:
+        # One async client per event loop, so its connections are reused by all requests on the loop
+        self._async_clients = LoopLocal(self.get_async_client)
+
+    @abstractmethod
+    def get_client(self) -> OpenAI:
+        """Create the client for the synchronous requests"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_async_client(self) -> AsyncOpenAI:
+        """Create a client for the requests on the running event loop"""
+        raise NotImplementedError
 
     def chat(
         self,
@@ -209,73 +251,176 @@ class OpenAIChatModel(ChatModel):
             Sequence[Union[Dict[str, Any], Type[BaseModel], Callable, BaseTool]]
         ],
     ) -> PyrisMessage:
-        # noinspection PyTypeChecker
-        retries = 5
-        backoff_factor = 2
-        initial_delay = 1
         client = self.get_client()
-        # Maximum wait time: 1 + 2 + 4 + 8 + 16 = 31 seconds
+        params = self._create_params(messages, arguments, tools)
+        return call_with_retries(
+            lambda: self._convert_response(client.chat.completions.create(**params)),
+            RETRIED_ERRORS,
+            "OpenAI",
+        )
 
+    async def achat(
+        self,
+        messages: list[PyrisMessage],
+        arguments: CompletionArguments,
+        tools: Optional[
+            Sequence[Union[Dict[str, Any], Type[BaseModel], Callable, BaseTool]]
+        ],
+    ) -> PyrisMessage:
+        client = self._async_clients.get()
+        params = self._create_params(messages, arguments, tools)
+
+        async def create() -> PyrisMessage:
+            return self._convert_response(
+                await client.chat.completions.create(**params)
+            )
+
+        return await acall_with_retries(create, RETRIED_ERRORS, "OpenAI")
+
+    def stream_chat(
+        self,
+        messages: list[PyrisMessage],
+        arguments: CompletionArguments,
+        tools: Optional[
+            Sequence[Union[Dict[str, Any], Type[BaseModel], Callable, BaseTool]]
+        ],
+    ) -> Iterator[PyrisMessage]:
+        client = self.get_client()
+        params = self._create_params(messages, arguments, tools)
+        params["stream"] = True
+        # The token usage is sent in an additional chunk at the end of the stream
+        params["stream_options"] = {"include_usage": True}
+
+        for attempt in range(RETRIES):
+            streamed = False
+            # Tool calls arrive in fragments and are only usable once they are complete
+            tool_calls: dict[int, dict[str, str]] = {}
+            try:
+                for chunk in client.chat.completions.create(**params):
+                    self._collect_tool_calls(chunk, tool_calls)
+                    message = self._convert_chunk(chunk)
+                    if message is not None:
+                        streamed = True
+                        yield message
+                if tool_calls:
+                    yield PyrisAIMessage(
+                        tool_calls=[
+                            ToolCallDTO(
+                                id=tool_call["id"],
+                                function={
+                                    "name": tool_call["name"],
+                                    "arguments": tool_call["arguments"] or "{}",
+                                },
+                            )
+                            for _, tool_call in sorted(tool_calls.items())
+                        ],
+                        contents=[TextMessageContentDTO(textContent="")],
+                        sentAt=datetime.now(),
+                    )
+                return
+            except RETRIED_ERRORS:
+                # A retry would send the already streamed text a second time
+                if streamed:
+                    raise
+                time.sleep(retry_wait_time(attempt, "OpenAI"))
+        raise Exception(f"Failed to get response from OpenAI after {RETRIES} retries")
+
+    def _create_params(
+        self,
+        messages: list[PyrisMessage],
+        arguments: CompletionArguments,
+        tools: Optional[
+            Sequence[Union[Dict[str, Any], Type[BaseModel], Callable, BaseTool]]
+        ],
+    ) -> dict[str, Any]:
+        """Create the parameters of the chat completion request"""
         for message in messages:
             if message.sender == "SYSTEM":
                 print("SYSTEM MESSAGE: " + message.contents[0].text_content)
                 break
 
-        messages = convert_to_open_ai_messages(messages)
-
-        for attempt in range(retries):
-            try:
-                params = {
-                    "model": self.model,
-                    "messages": messages,
-                    "temperature": arguments.temperature,
-                    "max_tokens": arguments.max_tokens,
-                }
-
-                if arguments.response_format == "JSON":
-                    params["response_format"] = ResponseFormatJSONObject(
-                        type="json_object"
-                    )
+        params = {
+            "model": self.model,
+            "messages": convert_to_open_ai_messages(messages),
+            "temperature": arguments.temperature,
+            "max_tokens": arguments.max_tokens,
+        }
 
-                if tools:
-                    params["tools"] = [convert_to_openai_tool(tool) for tool in tools]
-                    logging.info(f"Using tools: {tools}")
-
-                response = client.chat.completions.create(**params)
-                choice = response.choices[0]
-                usage = response.usage
-                model = response.model
-                if choice.finish_reason == "content_filter":
-                    # I figured that an openai error would be automatically raised if the content filter activated,
-                    # but it seems that that is not the case.
-                    # We don't want to retry because the same message will likely be rejected again.
-                    # Raise an exception to trigger the global error handler and report a fatal error to the client.
-                    raise ContentFilterFinishReasonError()
-
-                if (
-                    choice.message is None
-                    or choice.message.content is None
-                    or len(choice.message.content) == 0
-                ):
-                    logging.error("Model returned an empty message")
-                    logging.error("Finish reason: " + choice.finish_reason)
-                    if (
-                        choice.message is not None
-                        and choice.message.refusal is not None
-                    ):
-                        logging.error("Refusal: " + choice.message.refusal)
-
-                return convert_to_iris_message(choice.message, usage, model)
-            except (
-                APIError,
-                APITimeoutError,
-                RateLimitError,
-            ):
-                wait_time = initial_delay * (backoff_factor**attempt)
-                logging.exception(f"OpenAI error on attempt {attempt + 1}:")
-                logging.info(f"Retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
-        raise Exception(f"Failed to get response from OpenAI after {retries} retries")
+        if arguments.response_format == "JSON":
+            params["response_format"] = ResponseFormatJSONObject(type="json_object")
+
+        if tools:
+            params["tools"] = [convert_to_openai_tool(tool) for tool in tools]
+            logging.info(f"Using tools: {tools}")
+        return params
+
+    @staticmethod
+    def _convert_response(response: ChatCompletion) -> PyrisMessage:
+        """Convert the chat completion response to a PyrisMessage"""
+        choice = response.choices[0]
+        usage = response.usage
+        model = response.model
+        if choice.finish_reason == "content_filter":
+            # I figured that an openai error would be automatically raised if the content filter activated,
+            # but it seems that that is not the case.
+            # We don't want to retry because the same message will likely be rejected again.
+            # Raise an exception to trigger the global error handler and report a fatal error to the client.
+            raise ContentFilterFinishReasonError()
+
+        if (
+            choice.message is None
+            or choice.message.content is None
+            or len(choice.message.content) == 0
+        ):
+            logging.error("Model returned an empty message")
+            logging.error("Finish reason: " + choice.finish_reason)
+            if choice.message is not None and choice.message.refusal is not None:
+                logging.error("Refusal: " + choice.message.refusal)
+
+        return convert_to_iris_message(choice.message, usage, model)
+
+    @staticmethod
+    def _collect_tool_calls(
+        chunk: ChatCompletionChunk, tool_calls: dict[int, dict[str, str]]
+    ):
+        """Add the tool call fragments of a chunk of a streamed response to the tool calls by index"""
+        if not chunk.choices or not chunk.choices[0].delta.tool_calls:
+            return
+        for fragment in chunk.choices[0].delta.tool_calls:
+            tool_call = tool_calls.setdefault(
+                fragment.index, {"id": "", "name": "", "arguments": ""}
+            )
+            if fragment.id:
+                tool_call["id"] = fragment.id
+            if fragment.function is not None:
+                tool_call["name"] += fragment.function.name or ""
+                tool_call["arguments"] += fragment.function.arguments or ""
+
+    @staticmethod
+    def _convert_chunk(chunk: ChatCompletionChunk) -> Optional[PyrisMessage]:
+        """Convert a chunk of a streamed response to a PyrisMessage, or None if it holds neither text nor usage"""
+        if chunk.usage is not None:
+            return PyrisMessage(
+                sender=IrisMessageRole.ASSISTANT,
+                contents=[TextMessageContentDTO(textContent="")],
+                sentAt=datetime.now(),
+                token_usage=create_token_usage(chunk.usage, chunk.model),
+            )
+        if not chunk.choices:
+            return None
+
+        choice = chunk.choices[0]
+        if choice.finish_reason == "content_filter":
+            # Same as for complete responses, the content filter does not raise an error by itself
+            raise ContentFilterFinishReasonError()
+        if not choice.delta.content:
+            return None
+        return PyrisMessage(
+            sender=IrisMessageRole.ASSISTANT,
+            contents=[TextMessageContentDTO(textContent=choice.delta.content)],
+            sentAt=datetime.now(),
+            token_usage=TokenUsageDTO(model=chunk.model),
+        )
 
 
 class DirectOpenAIChatModel(OpenAIChatModel):
@@ -284,6 +429,9 @@ class DirectOpenAIChatModel(OpenAIChatModel):
     def get_client(self) -> OpenAI:
         return OpenAI(api_key=self.api_key)
 
+    def get_async_client(self) -> AsyncOpenAI:
+        return AsyncOpenAI(api_key=self.api_key)
+
     def __str__(self):
         return f"OpenAIChat('{self.model}')"
 
@@ -302,5 +450,13 @@ class AzureOpenAIChatModel(OpenAIChatModel):
             api_key=self.api_key,
         )
 
+    def get_async_client(self) -> AsyncOpenAI:
+        return AsyncAzureOpenAI(
+            azure_endpoint=self.endpoint,
+            azure_deployment=self.azure_deployment,
+            api_version=self.api_version,
+            api_key=self.api_key,
+        )
+
     def __str__(self):
         return f"AzureChat('{self.model}')"
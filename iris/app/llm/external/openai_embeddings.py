@@ -1,55 +1,128 @@
-import logging
+import asyncio
+from abc import abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from typing import Literal, Any
 from openai import (
+    AsyncOpenAI,
     OpenAI,
     APIError,
     APITimeoutError,
     RateLimitError,
     InternalServerError,
 )
-from openai.lib.azure import AzureOpenAI
+from openai.lib.azure import AsyncAzureOpenAI, AzureOpenAI
+from openai.types import CreateEmbeddingResponse
 
+from ...common.event_loop import LoopLocal
 from ...llm.external.model import EmbeddingModel
-import time
+from ...llm.external.retry import acall_with_retries, call_with_retries
+
+# Errors after which a request is sent again
+RETRIED_ERRORS = (APIError, APITimeoutError, RateLimitError, InternalServerError)
 
 
 class OpenAIEmbeddingModel(EmbeddingModel):
     model: str
     api_key: str
+    # Number of inputs sent with a single embeddings request
+    batch_size: int = 256
+    # Maximum number of embeddings requests that are in flight at the same time
+    max_concurrent_requests: int = 4
     _client: OpenAI
+    _async_clients: LoopLocal[AsyncOpenAI]
+
+    def model_post_init(self, __context: Any) -> None:
+        self._client = self.get_client()
+        # One async client per event loop, so its connections are reused by all requests on the loop
+        self._async_clients = LoopLocal(self.get_async_client)
+
+    @abstractmethod
+    def get_client(self) -> OpenAI:
+        """Create the client for the synchronous requests"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_async_client(self) -> AsyncOpenAI:
+        """Create a client for the requests on the running event loop"""
+        raise NotImplementedError
 
     def embed(self, text: str) -> list[float]:
-        retries = 5
-        backoff_factor = 2
-        initial_delay = 1
-        # Maximum wait time: 1 + 2 + 4 + 8 + 16 = 31 seconds
-
-        for attempt in range(retries):
-            try:
-                response = self._client.embeddings.create(
-                    model=self.model,
-                    input=text,
-                    encoding_format="float",
+        return self._create_embeddings(text)[0]
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        batches = self._split_into_batches(texts)
+        if len(batches) == 1:
+            return self._create_embeddings(batches[0])
+
+        workers = min(self.max_concurrent_requests, len(batches))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(self._create_embeddings, batches)
+            return [embedding for batch in results for embedding in batch]
+
+    async def aembed(self, text: str) -> list[float]:
+        return (await self.aembed_batch([text]))[0]
+
+    async def aembed_batch(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        client = self._async_clients.get()
+        semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+
+        async def create_embeddings(batch: list[str]) -> list[list[float]]:
+            async with semaphore:
+                return await self._acreate_embeddings(client, batch)
+
+        results = await asyncio.gather(
+            *(create_embeddings(batch) for batch in self._split_into_batches(texts))
+        )
+        return [embedding for batch in results for embedding in batch]
+
+    def _split_into_batches(self, texts: list[str]) -> list[list[str]]:
+        batches = []
+        for start in range(0, len(texts), self.batch_size):
+            end = start + self.batch_size
+            batches.append(texts[start:end])
+        return batches
+
+    def _create_embeddings(self, inputs: str | list[str]) -> list[list[float]]:
+        return call_with_retries(
+            lambda: self._sorted_embeddings(
+                self._client.embeddings.create(
+                    model=self.model, input=inputs, encoding_format="float"
                 )
-                return response.data[0].embedding
-            except (
-                APIError,
-                APITimeoutError,
-                RateLimitError,
-                InternalServerError,
-            ):
-                wait_time = initial_delay * (backoff_factor**attempt)
-                logging.exception(f"OpenAI error on attempt {attempt + 1}")
-                logging.info(f"Retrying in {wait_time} seconds...")
-                time.sleep(wait_time)
-        raise Exception(f"Failed to get embedding from OpenAI after {retries} retries.")
+            ),
+            RETRIED_ERRORS,
+            "OpenAI",
+        )
+
+    async def _acreate_embeddings(
+        self, client: AsyncOpenAI, inputs: str | list[str]
+    ) -> list[list[float]]:
+        async def create() -> list[list[float]]:
+            return self._sorted_embeddings(
+                await client.embeddings.create(
+                    model=self.model, input=inputs, encoding_format="float"
+                )
+            )
+
+        return await acall_with_retries(create, RETRIED_ERRORS, "OpenAI")
+
+    @staticmethod
+    def _sorted_embeddings(response: CreateEmbeddingResponse) -> list[list[float]]:
+        # The API does not guarantee that the embeddings are returned in input order
+        return [data.embedding for data in sorted(response.data, key=lambda d: d.index)]
 
 
 class DirectOpenAIEmbeddingModel(OpenAIEmbeddingModel):
     type: Literal["openai_embedding"]
 
-    def model_post_init(self, __context: Any) -> None:
-        self._client = OpenAI(api_key=self.api_key)
+    def get_client(self) -> OpenAI:
+        return OpenAI(api_key=self.api_key)
+
+    def get_async_client(self) -> AsyncOpenAI:
+        return AsyncOpenAI(api_key=self.api_key)
 
     def __str__(self):
         return f"OpenAIEmbedding('{self.model}')"
@@ -61,8 +134,16 @@ class AzureOpenAIEmbeddingModel(OpenAIEmbeddingModel):
     azure_deployment: str
     api_version: str
 
-    def model_post_init(self, __context: Any) -> None:
-        self._client = AzureOpenAI(
+    def get_client(self) -> OpenAI:
+        return AzureOpenAI(
+            azure_endpoint=self.endpoint,
+            azure_deployment=self.azure_deployment,
+            api_version=self.api_version,
+            api_key=self.api_key,
+        )
+
+    def get_async_client(self) -> AsyncOpenAI:
+        return AsyncAzureOpenAI(
             azure_endpoint=self.endpoint,
             azure_deployment=self.azure_deployment,
             api_version=self.api_version,
@@ -0,0 +1,45 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+# Maximum wait time: 1 + 2 + 4 + 8 + 16 = 31 seconds
+RETRIES = 5
+BACKOFF_FACTOR = 2
+INITIAL_DELAY = 1
+
+
+def retry_wait_time(attempt: int, provider: str) -> float:
+    """Log the failed attempt and return the time to wait before the next one"""
+    wait_time = INITIAL_DELAY * (BACKOFF_FACTOR**attempt)
+    logging.exception(f"{provider} error on attempt {attempt + 1}:")
+    logging.info(f"Retrying in {wait_time} seconds...")
+    return wait_time
+
+
+def call_with_retries(
+    call: Callable[[], T], errors: tuple[type[BaseException], ...], provider: str
+) -> T:
+    """Call the function until it does not raise one of the errors, waiting longer after each attempt"""
+    for attempt in range(RETRIES):
+        try:
+            return call()
+        except errors:
+            time.sleep(retry_wait_time(attempt, provider))
+    raise Exception(f"Failed to get response from {provider} after {RETRIES} retries")
+
+
+async def acall_with_retries(
+    call: Callable[[], Awaitable[T]],
+    errors: tuple[type[BaseException], ...],
+    provider: str,
+) -> T:
+    """Like call_with_retries, but awaits the call and the wait without blocking the event loop"""
+    for attempt in range(RETRIES):
+        try:
+            return await call()
+        except errors:
+            await asyncio.sleep(retry_wait_time(attempt, provider))
+    raise Exception(f"Failed to get response from {provider} after {RETRIES} retries")
@@ -3,3 +3,6 @@ from ...llm.langchain.iris_langchain_completion_model import (
 )
 from ...llm.langchain.iris_langchain_chat_model import IrisLangchainChatModel
 from ...llm.langchain.iris_langchain_embedding_model import IrisLangchainEmbeddingModel
+from ...llm.langchain.partial_result_callback_handler import (
+    PartialResultCallbackHandler,
+)
@@ -1,14 +1,28 @@
+import copy
 import logging
 from logging import Logger
-from typing import List, Optional, Any, Sequence, Union, Dict, Type, Callable
+from typing import (
+    List,
+    Optional,
+    Any,
+    Sequence,
+    Union,
+    Dict,
+    Type,
+    Callable,
+    Iterator,
+)
 
-from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
 from langchain_core.language_models import LanguageModelInput
 from langchain_core.language_models.chat_models import (
     BaseChatModel,
 )
-from langchain_core.messages import BaseMessage
-from langchain_core.outputs import ChatResult
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
 from langchain_core.outputs.chat_generation import ChatGeneration
 from langchain_core.runnables import Runnable
 from langchain_core.tools import BaseTool
@@ -83,8 +97,66 @@ class IrisLangchainChatModel(BaseChatModel):
         iris_message = self.request_handler.chat(
             iris_messages, self.completion_args, self.tools
         )
+        return self._create_chat_result(iris_message)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        iris_messages = [convert_langchain_message_to_iris_message(m) for m in messages]
+        # Other coroutines may use this model concurrently, so the shared arguments are not modified
+        completion_args = copy.copy(self.completion_args)
+        completion_args.stop = stop
+        iris_message = await self.request_handler.achat(
+            iris_messages, completion_args, self.tools
+        )
+        return self._create_chat_result(iris_message)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        iris_messages = [convert_langchain_message_to_iris_message(m) for m in messages]
+        # Like _agenerate, the shared arguments are not modified
+        completion_args = copy.copy(self.completion_args)
+        completion_args.stop = stop
+        # The token usage is only known once the last chunk arrived
+        self.tokens = TokenUsageDTO()
+        for iris_message in self.request_handler.stream_chat(
+            iris_messages, completion_args, self.tools
+        ):
+            usage = iris_message.token_usage
+            if usage.num_input_tokens or usage.num_output_tokens:
+                self._set_tokens(iris_message)
+            if getattr(iris_message, "tool_calls", None):
+                # The tool calls arrive complete after the text of the response
+                message = convert_iris_message_to_langchain_message(iris_message)
+                yield ChatGenerationChunk(
+                    message=AIMessageChunk(content="", tool_calls=message.tool_calls)
+                )
+                continue
+            text = (
+                iris_message.contents[0].text_content if iris_message.contents else ""
+            )
+            if not text:
+                continue
+            if run_manager:
+                run_manager.on_llm_new_token(text)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+
+    def _create_chat_result(self, iris_message) -> ChatResult:
         base_message = convert_iris_message_to_langchain_message(iris_message)
         chat_generation = ChatGeneration(message=base_message)
+        self._set_tokens(iris_message)
+        return ChatResult(generations=[chat_generation])
+
+    def _set_tokens(self, iris_message):
         self.tokens = TokenUsageDTO(
             model=iris_message.token_usage.model_info,
             numInputTokens=iris_message.token_usage.num_input_tokens,
@@ -93,7 +165,6 @@ class IrisLangchainChatModel(BaseChatModel):
             costPerMillionOutputToken=iris_message.token_usage.cost_per_output_token,
             pipeline=PipelineEnum.NOT_SET,
         )
-        return ChatResult(generations=[chat_generation])
 
     @property
     def _llm_type(self) -> str:
@@ -12,7 +12,13 @@ class IrisLangchainEmbeddingModel(Embeddings):
         super().__init__(request_handler=request_handler, **kwargs)
 
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        return [self.embed_query(text) for text in texts]
+        return self.request_handler.embed_batch(texts)
 
     def embed_query(self, text: str) -> List[float]:
         return self.request_handler.embed(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.request_handler.aembed_batch(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.request_handler.aembed(text)
@@ -0,0 +1,24 @@
+from typing import Any, Callable
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+class PartialResultCallbackHandler(BaseCallbackHandler):
+    """
+    Pass the text generated so far by the current model run to a function, e.g. to send the final answer of an
+    agent while it is generated. The text starts over with every model run of the agent, the runs that only call
+    tools generate no text.
+    """
+
+    def __init__(self, on_text: Callable[[str], None]):
+        self.on_text = on_text
+        self.text = ""
+
+    def on_chat_model_start(self, serialized: Any, messages: Any, **kwargs: Any):
+        self.text = ""
+
+    def on_llm_new_token(self, token: str, **kwargs: Any):
+        if not token:
+            return
+        self.text += token
+        self.on_text(self.text)
@@ -1,4 +1,5 @@
 import os
+import threading
 from typing import Annotated
 
 from pydantic import BaseModel, Discriminator
@@ -24,6 +25,9 @@ class LlmManager(metaclass=Singleton):
 
     def __init__(self):
         self.entries = []
+        # Rankings by requirements, cost inversion and model type, only valid for the loaded entries
+        self._rankings: dict[tuple, tuple[LanguageModel, ...]] = {}
+        self._rankings_lock = threading.Lock()
         self.load_llms()
 
     def get_llm_by_id(self, llm_id):
@@ -40,19 +44,50 @@ class LlmManager(metaclass=Singleton):
         with open(path, "r") as file:
             loaded_llms = yaml.safe_load(file)
 
-        self.entries = LlmList.model_validate({"llms": loaded_llms}).llms
+        entries = LlmList.model_validate({"llms": loaded_llms}).llms
+        with self._rankings_lock:
+            self.entries = entries
+            self._rankings = {}
 
     def get_llms_sorted_by_capabilities_score(
-        self, requirements: RequirementList, invert_cost: bool = False
-    ):
+        self,
+        requirements: RequirementList,
+        invert_cost: bool = False,
+        type_filter: type | None = None,
+    ) -> tuple[LanguageModel, ...]:
+        """
+        Get the llms sorted by their capability to requirement scores, optionally only those of the given type.
+        The ranking is computed once per requirements and kept until the llms are loaded again.
+        """
+        key = (requirements.cache_key(), invert_cost, type_filter)
+        ranking = self._rankings.get(key)
+        if ranking is not None:
+            return ranking
+
+        with self._rankings_lock:
+            ranking = self._rankings.get(key)
+            if ranking is None:
+                ranking = self._rank_llms(requirements, invert_cost, type_filter)
+                self._rankings[key] = ranking
+            return ranking
+
+    def _rank_llms(
+        self,
+        requirements: RequirementList,
+        invert_cost: bool,
+        type_filter: type | None,
+    ) -> tuple[LanguageModel, ...]:
         valid_llms = [
             llm
             for llm in self.entries
             if capabilities_fulfill_requirements(llm.capabilities, requirements)
         ]
-        """Get the llms sorted by their capability to requirement scores"""
         scores = calculate_capability_scores(
             [llm.capabilities for llm in valid_llms], requirements, invert_cost
         )
         sorted_llms = sorted(zip(scores, valid_llms), key=lambda pair: -pair[0])
-        return [llm for _, llm in sorted_llms]
+        return tuple(
+            llm
+            for _, llm in sorted_llms
+            if type_filter is None or isinstance(llm, type_filter)
+        )
@@ -1,4 +1,4 @@
-from typing import Optional, Sequence, Union, Dict, Any, Type, Callable
+from typing import Optional, Sequence, Union, Dict, Any, Type, Callable, Iterator
 
 from langchain_core.tools import BaseTool
 from pydantic import ConfigDict
@@ -9,7 +9,9 @@ from app.domain.data.image_message_content_dto import ImageMessageContentDTO
 from app.llm import LanguageModel
 from app.llm.request_handler import RequestHandler
 from app.llm.completion_arguments import CompletionArguments
+from app.llm.embedding_cache import embed_batch_cached, aembed_batch_cached
 from app.llm.llm_manager import LlmManager
+from app.telemetry import span, span_iterator
 
 
 class BasicRequestHandler(RequestHandler):
@@ -29,7 +31,8 @@ class BasicRequestHandler(RequestHandler):
         image: Optional[ImageMessageContentDTO] = None,
     ) -> str:
         llm = self.llm_manager.get_llm_by_id(self.model_id)
-        return llm.complete(prompt, arguments, image)
+        with span("llm", "complete", model=llm.id):
+            return llm.complete(prompt, arguments, image)
 
     def chat(
         self,
@@ -40,11 +43,56 @@ class BasicRequestHandler(RequestHandler):
         ],
     ) -> PyrisMessage:
         llm = self.llm_manager.get_llm_by_id(self.model_id)
-        return llm.chat(messages, arguments, tools)
+        with span("llm", "chat", model=llm.id):
+            return llm.chat(messages, arguments, tools)
+
+    async def achat(
+        self,
+        messages: list[PyrisMessage],
+        arguments: CompletionArguments,
+        tools: Optional[
+            Sequence[Union[Dict[str, Any], Type[BaseModel], Callable, BaseTool]]
+        ],
+    ) -> PyrisMessage:
+        llm = self.llm_manager.get_llm_by_id(self.model_id)
+        with span("llm", "achat", model=llm.id):
+            return await llm.achat(messages, arguments, tools)
+
+    def stream_chat(
+        self,
+        messages: list[PyrisMessage],
+        arguments: CompletionArguments,
+        tools: Optional[
+            Sequence[Union[Dict[str, Any], Type[BaseModel], Callable, BaseTool]]
+        ],
+    ) -> Iterator[PyrisMessage]:
+        llm = self.llm_manager.get_llm_by_id(self.model_id)
+        yield from span_iterator(
+            "llm",
+            "stream_chat",
+            llm.stream_chat(messages, arguments, tools),
+            model=llm.id,
+        )
 
     def embed(self, text: str) -> list[float]:
         llm = self.llm_manager.get_llm_by_id(self.model_id)
-        return llm.embed(text)
+        with span("llm", "embed", model=llm.id):
+            return embed_batch_cached(llm, [text])[0]
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        llm = self.llm_manager.get_llm_by_id(self.model_id)
+        with span("llm", "embed_batch", model=llm.id):
+            return embed_batch_cached(llm, texts)
+
+    async def aembed(self, text: str) -> list[float]:
+        llm = self.llm_manager.get_llm_by_id(self.model_id)
+        with span("llm", "aembed", model=llm.id):
+            return (await aembed_batch_cached(llm, [text]))[0]
+
+    async def aembed_batch(self, texts: list[str]) -> list[list[float]]:
+        llm = self.llm_manager.get_llm_by_id(self.model_id)
+        with span("llm", "aembed_batch", model=llm.id):
+            return await aembed_batch_cached(llm, texts)
 
     def bind_tools(
         self,
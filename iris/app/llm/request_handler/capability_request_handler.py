@@ -1,5 +1,6 @@
+import logging
 from enum import Enum
-from typing import Sequence, Union, Dict, Any, Type, Callable, Optional
+from typing import Sequence, Union, Dict, Any, Type, Callable, Optional, Iterator
 
 from langchain_core.tools import BaseTool
 from pydantic import ConfigDict
@@ -15,7 +16,11 @@ from app.llm.external.model import (
 )
 from app.llm.request_handler import RequestHandler
 from app.llm.completion_arguments import CompletionArguments
+from app.llm.embedding_cache import embed_batch_cached, aembed_batch_cached
 from app.llm.llm_manager import LlmManager
+from app.telemetry import span, span_iterator
+
+logger = logging.getLogger(__name__)
 
 
 class CapabilityRequestHandlerSelectionMode(Enum):
@@ -47,7 +52,8 @@ class CapabilityRequestHandler(RequestHandler):
 
     def complete(self, prompt: str, arguments: CompletionArguments) -> str:
         llm = self._select_model(CompletionModel)
-        return llm.complete(prompt, arguments)
+        with span("llm", "complete", model=llm.id):
+            return llm.complete(prompt, arguments)
 
     def chat(
         self,
@@ -58,30 +64,82 @@ class CapabilityRequestHandler(RequestHandler):
         ],
     ) -> PyrisMessage:
         llm = self._select_model(ChatModel)
-        message = llm.chat(messages, arguments, tools)
+        with span("llm", "chat", model=llm.id):
+            message = llm.chat(messages, arguments, tools)
+        message.token_usage.cost_per_input_token = llm.capabilities.input_cost.value
+        message.token_usage.cost_per_output_token = llm.capabilities.output_cost.value
+        return message
+
+    async def achat(
+        self,
+        messages: list[PyrisMessage],
+        arguments: CompletionArguments,
+        tools: Optional[
+            Sequence[Union[Dict[str, Any], Type[BaseModel], Callable, BaseTool]]
+        ],
+    ) -> PyrisMessage:
+        llm = self._select_model(ChatModel)
+        with span("llm", "achat", model=llm.id):
+            message = await llm.achat(messages, arguments, tools)
         message.token_usage.cost_per_input_token = llm.capabilities.input_cost.value
         message.token_usage.cost_per_output_token = llm.capabilities.output_cost.value
         return message
 
+    def stream_chat(
+        self,
+        messages: list[PyrisMessage],
+        arguments: CompletionArguments,
+        tools: Optional[
+            Sequence[Union[Dict[str, Any], Type[BaseModel], Callable, BaseTool]]
+        ],
+    ) -> Iterator[PyrisMessage]:
+        llm = self._select_model(ChatModel)
+        for message in span_iterator(
+            "llm",
+            "stream_chat",
+            llm.stream_chat(messages, arguments, tools),
+            model=llm.id,
+        ):
+            message.token_usage.cost_per_input_token = llm.capabilities.input_cost.value
+            message.token_usage.cost_per_output_token = (
+                llm.capabilities.output_cost.value
+            )
+            yield message
+
     def embed(self, text: str) -> list[float]:
         llm = self._select_model(EmbeddingModel)
-        return llm.embed(text)
+        with span("llm", "embed", model=llm.id):
+            return embed_batch_cached(llm, [text])[0]
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        llm = self._select_model(EmbeddingModel)
+        with span("llm", "embed_batch", model=llm.id):
+            return embed_batch_cached(llm, texts)
+
+    async def aembed(self, text: str) -> list[float]:
+        llm = self._select_model(EmbeddingModel)
+        with span("llm", "aembed", model=llm.id):
+            return (await aembed_batch_cached(llm, [text]))[0]
+
+    async def aembed_batch(self, texts: list[str]) -> list[list[float]]:
+        llm = self._select_model(EmbeddingModel)
+        with span("llm", "aembed_batch", model=llm.id):
+            return await aembed_batch_cached(llm, texts)
 
     def _select_model(self, type_filter: type) -> LanguageModel:
         """Select the best/worst model based on the requirements and the selection mode"""
         llms = self.llm_manager.get_llms_sorted_by_capabilities_score(
             self.requirements,
             self.selection_mode == CapabilityRequestHandlerSelectionMode.WORST,
+            type_filter,
         )
-        llms = [llm for llm in llms if isinstance(llm, type_filter)]
 
         if self.selection_mode == CapabilityRequestHandlerSelectionMode.BEST:
             llm = llms[0]
         else:
             llm = llms[-1]
 
-        # Print the selected model for the logs
-        print(f"Selected {llm.description}")
+        logger.debug(f"Selected {llm.description}")
         return llm
 
     def bind_tools(
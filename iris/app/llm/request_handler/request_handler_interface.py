@@ -1,5 +1,5 @@
 from abc import ABCMeta, abstractmethod
-from typing import Optional, Sequence, Union, Dict, Any, Type, Callable
+from typing import Optional, Sequence, Union, Dict, Any, Type, Callable, Iterator
 from langchain_core.tools import BaseTool
 from pydantic import BaseModel
 
@@ -45,11 +45,50 @@ class RequestHandler(BaseModel, metaclass=ABCMeta):
         """Create a completion from the chat messages"""
         raise NotImplementedError
 
+    @abstractmethod
+    async def achat(
+        self,
+        messages: list[any],
+        arguments: CompletionArguments,
+        tools: Optional[
+            Sequence[Union[Dict[str, Any], Type[BaseModel], Callable, BaseTool]]
+        ],
+    ) -> PyrisMessage:
+        """Create a completion from the chat messages without blocking the event loop"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def stream_chat(
+        self,
+        messages: list[any],
+        arguments: CompletionArguments,
+        tools: Optional[
+            Sequence[Union[Dict[str, Any], Type[BaseModel], Callable, BaseTool]]
+        ],
+    ) -> Iterator[PyrisMessage]:
+        """Create a completion from the chat messages and yield it in parts while it is generated"""
+        raise NotImplementedError
+
     @abstractmethod
     def embed(self, text: str) -> list[float]:
         """Create an embedding from the text"""
         raise NotImplementedError
 
+    @abstractmethod
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        """Create embeddings for multiple texts, in the same order as the input"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def aembed(self, text: str) -> list[float]:
+        """Create an embedding from the text without blocking the event loop"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def aembed_batch(self, texts: list[str]) -> list[list[float]]:
+        """Create embeddings for multiple texts without blocking the event loop"""
+        raise NotImplementedError
+
     @abstractmethod
     def bind_tools(
         self,
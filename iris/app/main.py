@@ -1,10 +1,15 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi.responses import ORJSONResponse
-from starlette.background import BackgroundTask
-from starlette.responses import Response
 
+from app.common.scheduler import PipelineScheduler
 from app.config import settings
+from app.vector_database.database import VectorDatabase
 import app.sentry as sentry
+from app.web.logging_middleware import RequestLoggingMiddleware
 from app.web.routers.health import router as health_router
+from app.web.routers.metrics import router as metrics_router
 from app.web.routers.pipelines import router as pipelines_router
 from app.web.routers.webhooks import router as webhooks_router
 from app.web.routers.ingestion_status import router as ingestion_status_router
@@ -18,7 +23,24 @@ settings.set_env_vars()
 
 sentry.init()
 
-app = FastAPI(default_response_class=ORJSONResponse)
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # Verify and migrate the schemas once on startup instead of on the first request
+    try:
+        VectorDatabase()
+    except Exception as e:
+        logging.error(f"Could not initialize the vector database on startup: {e}")
+    # Start the worker pools
+    PipelineScheduler()
+    yield
+    # Stop accepting pipelines and wait for the running and queued ones to finish
+    await asyncio.to_thread(
+        PipelineScheduler().shutdown, settings.scheduler.shutdown_timeout
+    )
+
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
 
 
 def custom_openapi():
@@ -49,31 +71,17 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     )
 
 
-def log_info(req_body, res_body):
-    logging.info(req_body)
-    logging.info(res_body)
-
-
-@app.middleware("http")
-async def some_middleware(request: Request, call_next):
-    req_body = await request.body()
-    response = await call_next(request)
-
-    res_body = b""
-    async for chunk in response.body_iterator:
-        res_body += chunk
-
-    task = BackgroundTask(log_info, req_body, res_body)
-    return Response(
-        content=res_body,
-        status_code=response.status_code,
-        headers=dict(response.headers),
-        media_type=response.media_type,
-        background=task,
+if settings.request_logging.enabled:
+    app.add_middleware(
+        RequestLoggingMiddleware,
+        max_body_bytes=settings.request_logging.max_body_bytes,
+        sample_rate=settings.request_logging.sample_rate,
+        excluded_paths=settings.request_logging.excluded_paths,
     )
 
-
 app.include_router(health_router)
+if settings.metrics.enabled:
+    app.include_router(metrics_router)
 app.include_router(pipelines_router)
 app.include_router(webhooks_router)
 app.include_router(ingestion_status_router)
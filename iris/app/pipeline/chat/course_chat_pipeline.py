@@ -14,7 +14,6 @@ from langchain_core.prompts import (
 )
 from langchain_core.runnables import Runnable
 from langsmith import traceable
-from weaviate.collections.classes.filters import Filter
 
 from .interaction_suggestion_pipeline import (
     InteractionSuggestionPipeline,
@@ -45,13 +44,14 @@ from app.common.PipelineEnum import PipelineEnum
 from ...retrieval.faq_retrieval import FaqRetrieval
 from ...retrieval.faq_retrieval_utils import should_allow_faq_tool, format_faqs
 from ...retrieval.lecture_retrieval import LectureRetrieval
+from ...vector_database.course_metadata_cache import CourseMetadataCache
 from ...vector_database.database import VectorDatabase
 from ...vector_database.lecture_schema import LectureSchema
 from ...web.status.status_update import (
     CourseChatStatusCallback,
 )
 from ...llm import CompletionArguments
-from ...llm.langchain import IrisLangchainChatModel
+from ...llm.langchain import IrisLangchainChatModel, PartialResultCallbackHandler
 
 from ..pipeline import Pipeline
 
@@ -442,13 +442,22 @@ class CourseChatPipeline(Pipeline):
 
             out = None
             self.callback.in_progress()
-            for step in agent_executor.iter(params):
-                print("STEP:", step)
-                self._append_tokens(
-                    self.llm_big.tokens, PipelineEnum.IRIS_CHAT_COURSE_MESSAGE
-                )
-                if step.get("output", None):
-                    out = step["output"]
+            # The final answer is sent while it is generated, the citations are added once it is complete
+            partial_result_handler = PartialResultCallbackHandler(
+                self.callback.send_partial_result
+            )
+            try:
+                for step in agent_executor.iter(
+                    params, callbacks=[partial_result_handler]
+                ):
+                    print("STEP:", step)
+                    self._append_tokens(
+                        self.llm_big.tokens, PipelineEnum.IRIS_CHAT_COURSE_MESSAGE
+                    )
+                    if step.get("output", None):
+                        out = step["output"]
+            finally:
+                self.callback.clear_partial_result()
 
             if self.retrieved_paragraphs:
                 self.callback.in_progress("Augmenting response ...")
@@ -505,15 +514,7 @@ class CourseChatPipeline(Pipeline):
         :return: True if there are indexed lectures for the course, False otherwise
         """
         if course_id:
-            # Fetch the first object that matches the course ID with the language property
-            result = self.db.lectures.query.fetch_objects(
-                filters=Filter.by_property(LectureSchema.COURSE_ID.value).equal(
-                    course_id
-                ),
-                limit=1,
-                return_properties=[LectureSchema.COURSE_NAME.value],
-            )
-            return len(result.objects) > 0
+            return CourseMetadataCache().get(self.db.lectures, course_id).has_objects
         return False
 
 
@@ -2,7 +2,7 @@ import logging
 import traceback
 from datetime import datetime
 from operator import attrgetter
-from typing import List
+from typing import Iterator, List
 
 import pytz
 from langchain.agents import create_tool_calling_agent, AgentExecutor
@@ -30,6 +30,7 @@ from ..shared.citation_pipeline import CitationPipeline, InformationType
 from ..shared.reranker_pipeline import RerankerPipeline
 from ..shared.utils import generate_structured_tools_from_functions
 from ...common.PipelineEnum import PipelineEnum
+from ...common.token_usage_dto import TokenUsageDTO
 from ...common.message_converters import convert_iris_message_to_langchain_human_message
 from ...common.pyris_message import PyrisMessage, IrisMessageRole
 from ...domain import ExerciseChatPipelineExecutionDTO
@@ -42,9 +43,9 @@ from ...llm.langchain import IrisLangchainChatModel
 from ...retrieval.faq_retrieval import FaqRetrieval
 from ...retrieval.faq_retrieval_utils import should_allow_faq_tool, format_faqs
 from ...retrieval.lecture_retrieval import LectureRetrieval
+from ...vector_database.course_metadata_cache import CourseMetadataCache
 from ...vector_database.database import VectorDatabase
 from ...vector_database.lecture_schema import LectureSchema
-from weaviate.collections.classes.filters import Filter
 from ...web.status.status_update import ExerciseChatStatusCallback
 
 logger = logging.getLogger()
@@ -67,6 +68,25 @@ def add_exercise_context_to_prompt(
     """
 
 
+def stream_rewritten_response(chunks: Iterator[str]) -> Iterator[str]:
+    """
+    Yields the response of the guide if it rewrites the response of the agent. The response is held back while it
+    may still be the approval !ok!, and the stream is stopped once it is.
+    :param chunks: The chunks of the response of the guide
+    """
+    head = ""
+    for chunk in chunks:
+        if head is None:
+            yield chunk
+            continue
+        head += chunk
+        if head.lstrip().startswith("!ok!"):
+            return
+        if not "!ok!".startswith(head.lstrip()):
+            yield head
+            head = None
+
+
 def convert_chat_history_to_str(chat_history: List[PyrisMessage]) -> str:
     """
     Converts the chat history to a string
@@ -93,26 +113,53 @@ def convert_chat_history_to_str(chat_history: List[PyrisMessage]) -> str:
     )
 
 
-class ExerciseChatAgentPipeline(Pipeline):
-    """Exercise chat agent pipeline that answers exercises related questions from students."""
+class ExerciseChatRequestContext:
+    """
+    State of a single exercise chat request.
+    It is kept apart from the pipeline, so pipeline instances can be reused across requests.
+    """
 
-    llm_big: IrisLangchainChatModel
-    llm_small: IrisLangchainChatModel
-    pipeline: Runnable
+    dto: ExerciseChatPipelineExecutionDTO
     callback: ExerciseChatStatusCallback
-    suggestion_pipeline: InteractionSuggestionPipeline
-    code_feedback_pipeline: CodeFeedbackPipeline
-    prompt: ChatPromptTemplate
     variant: str
     event: str | None
-    retrieved_faqs: List[dict] = None
+    tokens: List[TokenUsageDTO]
+    retrieved_paragraphs: List[dict]
+    retrieved_faqs: List[dict]
 
     def __init__(
         self,
+        dto: ExerciseChatPipelineExecutionDTO,
         callback: ExerciseChatStatusCallback,
         variant: str = "default",
         event: str | None = None,
     ):
+        self.dto = dto
+        self.callback = callback
+        self.variant = variant
+        self.event = event
+        self.tokens = []
+        self.retrieved_paragraphs = []
+        self.retrieved_faqs = []
+
+    def append_tokens(self, tokens: TokenUsageDTO, pipeline: PipelineEnum) -> None:
+        tokens.pipeline = pipeline
+        self.tokens.append(tokens)
+
+
+class ExerciseChatAgentPipeline(Pipeline):
+    """
+    Exercise chat agent pipeline that answers exercises related questions from students.
+    The pipeline holds no request state, so an instance can be reused for further requests once a request is done.
+    """
+
+    llm_big: IrisLangchainChatModel
+    llm_small: IrisLangchainChatModel
+    pipeline: Runnable
+    suggestion_pipeline: InteractionSuggestionPipeline
+    code_feedback_pipeline: CodeFeedbackPipeline
+
+    def __init__(self):
         super().__init__(implementation_id="exercise_chat_pipeline")
         # Set the langchain chat model
         completion_args = CompletionArguments(temperature=0.5, max_tokens=2000)
@@ -132,10 +179,6 @@ class ExerciseChatAgentPipeline(Pipeline):
             ),
             completion_args=completion_args,
         )
-        self.variant = variant
-        self.event = event
-        self.callback = callback
-
         # Create the pipelines
         self.db = VectorDatabase()
         self.suggestion_pipeline = InteractionSuggestionPipeline(variant="exercise")
@@ -145,7 +188,6 @@ class ExerciseChatAgentPipeline(Pipeline):
         self.code_feedback_pipeline = CodeFeedbackPipeline()
         self.pipeline = self.llm_big | JsonOutputParser()
         self.citation_pipeline = CitationPipeline()
-        self.tokens = []
 
     def __repr__(self):
         return f"{self.__class__.__name__}(llm_big={self.llm_big}, llm_small={self.llm_small})"
@@ -154,12 +196,22 @@ class ExerciseChatAgentPipeline(Pipeline):
         return f"{self.__class__.__name__}(llm_big={self.llm_big}, llm_small={self.llm_small})"
 
     @traceable(name="Exercise Chat Agent Pipeline")
-    def __call__(self, dto: ExerciseChatPipelineExecutionDTO):
+    def __call__(
+        self,
+        dto: ExerciseChatPipelineExecutionDTO,
+        callback: ExerciseChatStatusCallback,
+        variant: str = "default",
+        event: str | None = None,
+    ):
         """
         Runs the pipeline
         :param dto:  execution data transfer object
-        :param kwargs: The keyword arguments
+        :param callback: The status callback of the request
+        :param variant: The variant of the pipeline
+        :param event: The event that triggered the request, if any
         """
+        ctx = ExerciseChatRequestContext(dto, callback, variant, event)
+        self._reset_sub_pipelines()
 
         def get_submission_details() -> dict:
             """
@@ -176,7 +228,7 @@ class ExerciseChatAgentPipeline(Pipeline):
 
 
             """
-            self.callback.in_progress("Reading submission details...")
+            ctx.callback.in_progress("Reading submission details...")
             if not dto.submission:
                 return {
                     field: f"No {field.replace('_', ' ')} is provided"
@@ -214,7 +266,7 @@ class ExerciseChatAgentPipeline(Pipeline):
             - due_date_over: Boolean indicating if the deadline has passed
 
             """
-            self.callback.in_progress("Reading exercise details...")
+            ctx.callback.in_progress("Reading exercise details...")
             current_time = datetime.now(tz=pytz.UTC)
             return {
                 "start_date": (
@@ -248,7 +300,7 @@ class ExerciseChatAgentPipeline(Pipeline):
 
 
             """
-            self.callback.in_progress("Analyzing build logs ...")
+            ctx.callback.in_progress("Analyzing build logs ...")
             if not dto.submission:
                 return "No build logs available."
             build_failed = dto.submission.build_failed
@@ -278,7 +330,7 @@ class ExerciseChatAgentPipeline(Pipeline):
 
 
             """
-            self.callback.in_progress("Analyzing feedbacks ...")
+            ctx.callback.in_progress("Analyzing feedbacks ...")
             if not dto.submission:
                 return "No feedbacks available."
             feedbacks = dto.submission.latest_result.feedbacks
@@ -319,7 +371,7 @@ class ExerciseChatAgentPipeline(Pipeline):
 
 
             """
-            self.callback.in_progress("Checking repository content ...")
+            ctx.callback.in_progress("Checking repository content ...")
             if not dto.submission:
                 return "No repository content available."
             repository = dto.submission.repository
@@ -356,7 +408,7 @@ class ExerciseChatAgentPipeline(Pipeline):
 
 
             """
-            self.callback.in_progress(f"Looking into file {file_path} ...")
+            ctx.callback.in_progress(f"Looking into file {file_path} ...")
             if not dto.submission:
                 return (
                     "No repository content available. File content cannot be retrieved."
@@ -376,8 +428,8 @@ class ExerciseChatAgentPipeline(Pipeline):
             a question about the lecture content or slides.
             Only use this once.
             """
-            self.callback.in_progress("Retrieving lecture content ...")
-            self.retrieved_paragraphs = self.lecture_retriever(
+            ctx.callback.in_progress("Retrieving lecture content ...")
+            ctx.retrieved_paragraphs = self.lecture_retriever(
                 chat_history=chat_history,
                 student_query=query.contents[0].text_content,
                 result_limit=5,
@@ -387,7 +439,7 @@ class ExerciseChatAgentPipeline(Pipeline):
             )
 
             result = ""
-            for paragraph in self.retrieved_paragraphs:
+            for paragraph in ctx.retrieved_paragraphs:
                 lct = "Lecture: {}, Unit: {}, Page: {}\nContent:\n---{}---\n\n".format(
                     paragraph.get(LectureSchema.LECTURE_NAME.value),
                     paragraph.get(LectureSchema.LECTURE_UNIT_NAME.value),
@@ -409,8 +461,8 @@ class ExerciseChatAgentPipeline(Pipeline):
             Respond to the query concisely and solely using the answer from the relevant FAQs.
             This tool should only be used once per query.
             """
-            self.callback.in_progress("Retrieving faq content ...")
-            self.retrieved_faqs = self.faq_retriever(
+            ctx.callback.in_progress("Retrieving faq content ...")
+            ctx.retrieved_faqs = self.faq_retriever(
                 chat_history=chat_history,
                 student_query=query.contents[0].text_content,
                 result_limit=10,
@@ -419,7 +471,7 @@ class ExerciseChatAgentPipeline(Pipeline):
                 base_url=dto.settings.artemis_base_url,
             )
 
-            result = format_faqs(self.retrieved_faqs)
+            result = format_faqs(ctx.retrieved_faqs)
             return result
 
         iris_initial_system_prompt = tell_iris_initial_system_prompt
@@ -449,9 +501,9 @@ class ExerciseChatAgentPipeline(Pipeline):
             # Determine the agent prompt based on the event.
             # An event parameter might indicates that a
             # specific event is triggered, such as a build failure or stalled progress.
-            if self.event == "build_failed":
+            if ctx.event == "build_failed":
                 agent_prompt = tell_build_failed_system_prompt
-            elif self.event == "progress_stalled":
+            elif ctx.event == "progress_stalled":
                 agent_prompt = tell_progress_stalled_system_prompt
             else:
                 agent_prompt = (
@@ -466,10 +518,10 @@ class ExerciseChatAgentPipeline(Pipeline):
 
             params = {}
 
-            if len(chat_history) > 0 and query is not None and self.event is None:
+            if len(chat_history) > 0 and query is not None and ctx.event is None:
                 # Add the conversation to the prompt
                 chat_history_messages = convert_chat_history_to_str(chat_history)
-                self.prompt = ChatPromptTemplate.from_messages(
+                prompt = ChatPromptTemplate.from_messages(
                     [
                         SystemMessage(
                             initial_prompt_with_date
@@ -490,8 +542,8 @@ class ExerciseChatAgentPipeline(Pipeline):
                     ]
                 )
             else:
-                if query is not None and self.event is None:
-                    self.prompt = ChatPromptTemplate.from_messages(
+                if query is not None and ctx.event is None:
+                    prompt = ChatPromptTemplate.from_messages(
                         [
                             SystemMessage(
                                 initial_prompt_with_date
@@ -513,7 +565,7 @@ class ExerciseChatAgentPipeline(Pipeline):
                         ]
                     )
                 else:
-                    self.prompt = ChatPromptTemplate.from_messages(
+                    prompt = ChatPromptTemplate.from_messages(
                         [
                             SystemMessage(
                                 initial_prompt_with_date
@@ -546,38 +598,42 @@ class ExerciseChatAgentPipeline(Pipeline):
 
             tools = generate_structured_tools_from_functions(tool_list)
             agent = create_tool_calling_agent(
-                llm=self.llm_big, tools=tools, prompt=self.prompt
+                llm=self.llm_big, tools=tools, prompt=prompt
             )
             agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=False)
-            self.callback.in_progress("Thinking ...")
+            ctx.callback.in_progress("Thinking ...")
             out = None
             for step in agent_executor.iter(params):
-                self._append_tokens(
+                ctx.append_tokens(
                     self.llm_big.tokens, PipelineEnum.IRIS_CHAT_EXERCISE_AGENT_MESSAGE
                 )
                 if step.get("output", None):
                     out = step["output"]
 
             try:
-                self.callback.in_progress("Refining response ...")
-                self.prompt = ChatPromptTemplate.from_messages(
+                ctx.callback.in_progress("Refining response ...")
+                prompt = ChatPromptTemplate.from_messages(
                     [
                         SystemMessagePromptTemplate.from_template(guide_system_prompt),
                         HumanMessage(out),
                     ]
                 )
 
-                guide_response = (
-                    self.prompt | self.llm_small | StrOutputParser()
-                ).invoke(
-                    {
-                        "problem": problem_statement,
-                    }
+                # The response of the agent is only sent once the guide approved it, a rewritten response is
+                # sent while it is generated
+                guide_response = ctx.callback.stream_result(
+                    stream_rewritten_response(
+                        (prompt | self.llm_small | StrOutputParser()).stream(
+                            {
+                                "problem": problem_statement,
+                            }
+                        )
+                    )
                 )
-                self._append_tokens(
+                ctx.append_tokens(
                     self.llm_big.tokens, PipelineEnum.IRIS_CHAT_EXERCISE_AGENT_MESSAGE
                 )
-                if "!ok!" in guide_response:
+                if not guide_response or "!ok!" in guide_response:
                     print("Response is ok and not rewritten!!!")
                 else:
                     print("ORIGINAL RESPONSE: " + out)
@@ -585,17 +641,17 @@ class ExerciseChatAgentPipeline(Pipeline):
                     print("NEW RESPONSE: " + out)
                     print("Response is rewritten.")
 
-                if self.retrieved_faqs:
-                    self.callback.in_progress("Augmenting response ...")
+                if ctx.retrieved_faqs:
+                    ctx.callback.in_progress("Augmenting response ...")
                     out = self.citation_pipeline(
-                        self.retrieved_faqs,
+                        ctx.retrieved_faqs,
                         out,
                         InformationType.FAQS,
                         base_url=dto.settings.artemis_base_url,
                     )
 
-                self.callback.done(
-                    "Response created", final_result=out, tokens=self.tokens
+                ctx.callback.done(
+                    "Response created", final_result=out, tokens=ctx.tokens
                 )
             except Exception as e:
                 logger.error(
@@ -603,7 +659,7 @@ class ExerciseChatAgentPipeline(Pipeline):
                     exc_info=e,
                 )
                 traceback.print_exc()
-                self.callback.error("Error in refining response")
+                ctx.callback.error("Error in refining response")
             try:
                 if out:
                     suggestion_dto = InteractionSuggestionPipelineExecutionDTO()
@@ -614,12 +670,12 @@ class ExerciseChatAgentPipeline(Pipeline):
                         tokens = [self.suggestion_pipeline.tokens]
                     else:
                         tokens = []
-                    self.callback.done(
+                    ctx.callback.done(
                         final_result=None, suggestions=suggestions, tokens=tokens
                     )
                 else:
                     # This should never happen but whatever
-                    self.callback.skip(
+                    ctx.callback.skip(
                         "Skipping suggestion generation as no output was generated."
                     )
             except Exception as e:
@@ -628,16 +684,26 @@ class ExerciseChatAgentPipeline(Pipeline):
                     exc_info=e,
                 )
                 traceback.print_exc()
-                self.callback.error("Generating interaction suggestions failed.")
+                ctx.callback.error("Generating interaction suggestions failed.")
         except Exception as e:
             logger.error(
                 "An error occurred while running the course chat pipeline", exc_info=e
             )
             traceback.print_exc()
-            self.callback.error(
+            ctx.callback.error(
                 "An error occurred while running the course chat pipeline."
             )
 
+    def _reset_sub_pipelines(self):
+        """
+        Reset the token usage the shared sub pipelines recorded for the previous request
+        """
+        self.lecture_retriever.tokens = []
+        self.faq_retriever.tokens = []
+        self.reranker_pipeline.tokens = []
+        self.citation_pipeline.tokens = []
+        self.suggestion_pipeline.tokens = None
+
     def should_allow_lecture_tool(self, course_id: int) -> bool:
         """
         Checks if there are indexed lectures for the given course
@@ -646,13 +712,5 @@ class ExerciseChatAgentPipeline(Pipeline):
         :return: True if there are indexed lectures for the course, False otherwise
         """
         if course_id:
-            # Fetch the first object that matches the course ID with the language property
-            result = self.db.lectures.query.fetch_objects(
-                filters=Filter.by_property(LectureSchema.COURSE_ID.value).equal(
-                    course_id
-                ),
-                limit=1,
-                return_properties=[LectureSchema.COURSE_NAME.value],
-            )
-            return len(result.objects) > 0
+            return CourseMetadataCache().get(self.db.lectures, course_id).has_objects
         return False
@@ -40,6 +40,7 @@ from ...llm import CompletionArguments
 from app.common.PipelineEnum import PipelineEnum
 from ...llm.langchain import IrisLangchainChatModel
 from ...retrieval.lecture_retrieval import LectureRetrieval
+from ...telemetry import span, with_current_context
 from ...vector_database.database import VectorDatabase
 from ...vector_database.lecture_schema import LectureSchema
 from ...web.status.status_update import ExerciseChatStatusCallback
@@ -199,7 +200,7 @@ class ExerciseChatPipeline(Pipeline):
             # Run the file selector pipeline
             if submission:
                 future_feedback = executor.submit(
-                    self.code_feedback_pipeline,
+                    with_current_context(self.code_feedback_pipeline),
                     chat_history=history,
                     question=query,
                     repository=repository,
@@ -216,7 +217,7 @@ class ExerciseChatPipeline(Pipeline):
 
             if should_execute_lecture_pipeline:
                 future_lecture = executor.submit(
-                    self.retriever.basic_lecture_retrieval,
+                    with_current_context(self.retriever.basic_lecture_retrieval),
                     chat_history=history,
                     student_query=query.contents[0].text_content,
                     result_limit=3,
@@ -422,12 +423,13 @@ class ExerciseChatPipeline(Pipeline):
         """
         if course_id:
             # Fetch the first object that matches the course ID with the language property
-            result = self.db.lectures.query.fetch_objects(
-                filters=Filter.by_property(LectureSchema.COURSE_ID.value).equal(
-                    course_id
-                ),
-                limit=1,
-                return_properties=[LectureSchema.COURSE_NAME.value],
-            )
+            with span("weaviate", f"{self.db.lectures.name}.fetch_objects"):
+                result = self.db.lectures.query.fetch_objects(
+                    filters=Filter.by_property(LectureSchema.COURSE_ID.value).equal(
+                        course_id
+                    ),
+                    limit=1,
+                    return_properties=[LectureSchema.COURSE_NAME.value],
+                )
             return len(result.objects) > 0
         return False
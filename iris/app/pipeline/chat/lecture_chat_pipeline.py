@@ -128,7 +128,9 @@ class LectureChatPipeline(Pipeline):
         prompt_val = self.prompt.format_messages()
         self.prompt = ChatPromptTemplate.from_messages(prompt_val)
         try:
-            response = (self.prompt | self.pipeline).invoke({})
+            response = self.callback.stream_result(
+                (self.prompt | self.pipeline).stream({})
+            )
             self._append_tokens(self.llm.tokens, PipelineEnum.IRIS_CHAT_LECTURE_MESSAGE)
             response_with_citation = self.citation_pipeline(
                 retrieved_lecture_chunks, response
@@ -89,22 +89,19 @@ class ChatGPTWrapperPipeline(Pipeline):
             and len(msg.contents[0].text_content) > 0
         ]
 
-        response = self.request_handler.chat(
+        chunks = self.request_handler.stream_chat(
             prompts, CompletionArguments(temperature=0.5, max_tokens=2000), tools=None
         )
+        response = self.callback.stream_result(
+            chunk.contents[0].text_content or "" for chunk in chunks if chunk.contents
+        )
 
         logger.info(f"ChatGPTWrapperPipeline response: {response}")
 
-        if (
-            response.contents is None
-            or len(response.contents) == 0
-            or response.contents[0].text_content is None
-            or len(response.contents[0].text_content) == 0
-        ):
+        if len(response) == 0:
             self.callback.error("ChatGPT did not reply. Try resending.")
             # Print lots of debug info for this case
-            logger.error(f"ChatGPTWrapperPipeline response: {response}")
             logger.error(f"ChatGPTWrapperPipeline request: {prompts}")
             return
 
-        self.callback.done(final_result=response.contents[0].text_content)
+        self.callback.done(final_result=response)
@@ -4,7 +4,6 @@ from langchain_core.output_parsers import StrOutputParser
 from weaviate import WeaviateClient
 from weaviate.classes.query import Filter
 from . import Pipeline
-from .lecture_ingestion_pipeline import batch_update_lock
 from ..domain.data.faq_dto import FaqDTO
 
 from app.domain.ingestion.ingestion_pipeline_execution_dto import (
@@ -13,6 +12,7 @@ from app.domain.ingestion.ingestion_pipeline_execution_dto import (
 from ..llm.langchain import IrisLangchainChatModel
 from ..vector_database.faq_schema import FaqSchema, init_faq_schema
 from ..ingestion.abstract_ingestion import AbstractIngestion
+from ..ingestion.ingestion_writer import IngestionWriter
 from ..llm import (
     BasicRequestHandler,
     CompletionArguments,
@@ -21,9 +21,6 @@ from ..llm import (
 )
 from ..web.status.faq_ingestion_status_callback import FaqIngestionStatus
 
-# we use the same lock as the lecture ingestion pipeline
-batch_update_lock = batch_update_lock
-
 
 class FaqIngestionPipeline(AbstractIngestion, Pipeline):
 
@@ -79,28 +76,14 @@ class FaqIngestionPipeline(AbstractIngestion, Pipeline):
 
     def batch_update(self, faq: FaqDTO):
         """
-        Batch update the faq into the database
-        This method is thread-safe and can only be executed by one thread at a time.
-        Weaviate limitation.
+        Batch update the faq into the database.
+        The faq is embedded before it is written through the shared ingestion writer, so other ingestions are
+        not blocked by the embedding request.
         """
-        global batch_update_lock
-        with batch_update_lock:
-            with self.collection.batch.rate_limit(requests_per_minute=600) as batch:
-                try:
-                    embed_chunk = self.llm_embedding.embed(
-                        f"{faq.question_title} : {faq.question_answer}"
-                    )
-                    faq_dict = faq.model_dump()
-
-                    batch.add_object(properties=faq_dict, vector=embed_chunk)
-
-                except Exception as e:
-                    logger.error(f"Error updating faq: {e}")
-                    self.callback.error(
-                        f"Failed to ingest faqs into the database: {e}",
-                        exception=e,
-                        tokens=self.tokens,
-                    )
+        embed_chunk = self.llm_embedding.embed(
+            f"{faq.question_title} : {faq.question_answer}"
+        )
+        IngestionWriter().write(self.collection, [faq.model_dump()], [embed_chunk])
 
     def delete_old_faqs(self, faqs: list[FaqDTO]):
         """
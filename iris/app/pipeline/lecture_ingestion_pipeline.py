@@ -1,8 +1,12 @@
 import base64
+import binascii
+import hashlib
 import os
-import tempfile
 import threading
+import uuid
 from asyncio.log import logger
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Optional
 
 import fitz
@@ -24,6 +28,13 @@ from app.common.PipelineEnum import PipelineEnum
 from ..llm.langchain import IrisLangchainChatModel
 from ..vector_database.lecture_schema import init_lecture_schema, LectureSchema
 from ..ingestion.abstract_ingestion import AbstractIngestion
+from ..ingestion.ingestion_writer import IngestionWriter, IngestionWriteError
+from ..ingestion.page_classifier import (
+    HIGH_RESOLUTION_ZOOM,
+    ImageDigests,
+    PageClassifier,
+)
+from ..telemetry import span, with_current_context
 from ..llm import (
     BasicRequestHandler,
     CompletionArguments,
@@ -34,39 +45,118 @@ from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from ..web.status import ingestion_status_callback
 
-batch_update_lock = threading.Lock()
+
+def decode_pdf(pdf_file_base64: str, chunk_size: int = 4 * 1024 * 1024) -> bytearray:
+    """
+    Decode the base64 encoded pdf slice by slice into a single buffer.
+    Decoding the whole string at once creates an ASCII copy of the encoded pdf in addition to the decoded pdf.
+    """
+    if any(whitespace in pdf_file_base64 for whitespace in ("\n", "\r", " ")):
+        # Line breaks shift the 4 character groups, so the slices could not be decoded separately
+        return bytearray(base64.b64decode(pdf_file_base64))
+
+    chunk_size -= chunk_size % 4
+    buffer = bytearray((len(pdf_file_base64) + 3) // 4 * 3)
+    size = 0
+    with memoryview(buffer) as view:
+        for start in range(0, len(pdf_file_base64), chunk_size):
+            end = start + chunk_size
+            decoded = binascii.a2b_base64(pdf_file_base64[start:end])
+            decoded_end = size + len(decoded)
+            view[size:decoded_end] = decoded
+            size = decoded_end
+    del buffer[size:]
+    return buffer
 
 
-def cleanup_temporary_file(file_path):
+def render_page_as_base64_image(
+    page: fitz.Page, zoom: int = HIGH_RESOLUTION_ZOOM
+) -> str:
     """
-    Cleanup the temporary file
+    Render the page as a base64 encoded JPEG image
     """
-    try:
-        os.remove(file_path)
-    except OSError as e:
-        logger.error(f"Failed to remove temporary file {file_path}: {e}")
+    # more pixels thus more details and better quality
+    matrix = fitz.Matrix(zoom, zoom)
+    pix = page.get_pixmap(matrix=matrix)
+    img_bytes = pix.tobytes("jpg")
+    return base64.b64encode(img_bytes).decode("utf-8")
 
 
-def save_pdf(pdf_file_base64):
+@lru_cache(maxsize=1)
+def load_merge_prompt() -> str:
     """
-    Save the pdf file to a temporary file
+    Load the prompt used to merge the page content with the image interpretation
     """
-    binary_data = base64.b64decode(pdf_file_base64)
-    fd, temp_pdf_file_path = tempfile.mkstemp(suffix=".pdf")
-    os.close(fd)
-    with open(temp_pdf_file_path, "wb") as temp_pdf_file:
-        try:
-            temp_pdf_file.write(binary_data)
-        except Exception as e:
-            logger.error(
-                f"Failed to write to temporary PDF file {temp_pdf_file_path}: {e}"
-            )
-            raise
-    return temp_pdf_file_path
+    dirname = os.path.dirname(__file__)
+    prompt_file_path = os.path.join(
+        dirname, ".", "prompts", "content_image_interpretation_merge_prompt.txt"
+    )
+    with open(prompt_file_path, "r") as file:
+        logger.info("Loading ingestion prompt...")
+        return file.read()
+
+
+def compute_page_fingerprint(page: fitz.Page, image_digests: ImageDigests) -> str:
+    """
+    Compute a fingerprint of the text and the embedded images of the page.
+    Pages whose fingerprint did not change since the last ingestion do not have to be ingested again.
+    """
+    digest = hashlib.sha256(page.get_text().encode("utf-8"))
+    for image in page.get_images(full=False):
+        digest.update(image_digests.get(image[0]))
+    return digest.hexdigest()
+
+
+def find_changed_pages(
+    page_fingerprints: list[str], ingested_pages: dict[int, list]
+) -> set[int]:
+    """
+    Return the indices of the pages that are not ingested yet or whose fingerprint changed.
+    Chunks ingested before fingerprints were stored have no fingerprint and are treated as changed.
+    """
+    return {
+        page_num
+        for page_num, fingerprint in enumerate(page_fingerprints)
+        if not ingested_pages.get(page_num + 1)
+        or any(
+            chunk.properties.get(LectureSchema.PAGE_FINGERPRINT.value) != fingerprint
+            for chunk in ingested_pages[page_num + 1]
+        )
+    }
+
+
+def find_course_language(ingested_pages: dict[int, list]) -> Optional[str]:
+    """
+    Return the course language stored with the ingested chunks, if any
+    """
+    for chunks in ingested_pages.values():
+        for chunk in chunks:
+            course_language = chunk.properties.get(LectureSchema.COURSE_LANGUAGE.value)
+            if course_language:
+                return course_language
+    return None
+
+
+def lecture_unit_metadata(lecture_unit_dto: LectureUnitDTO) -> dict:
+    """
+    Return the lecture unit properties that can change without the slides being changed
+    """
+    return {
+        LectureSchema.LECTURE_NAME.value: lecture_unit_dto.lecture_name,
+        LectureSchema.LECTURE_UNIT_NAME.value: lecture_unit_dto.lecture_unit_name,
+        LectureSchema.LECTURE_UNIT_LINK.value: lecture_unit_dto.lecture_unit_link,
+        LectureSchema.COURSE_NAME.value: lecture_unit_dto.course_name,
+        LectureSchema.COURSE_DESCRIPTION.value: lecture_unit_dto.course_description,
+    }
 
 
 def create_page_data(
-    page_num, page_splits, lecture_unit_dto, course_language, base_url
+    page_num,
+    page_splits,
+    lecture_unit_dto,
+    course_language,
+    base_url,
+    page_fingerprint=None,
 ):
     """
     Create and return a list of dictionnaries to be ingested in the Vector Database.
@@ -74,16 +164,13 @@ def create_page_data(
     return [
         {
             LectureSchema.LECTURE_ID.value: lecture_unit_dto.lecture_id,
-            LectureSchema.LECTURE_NAME.value: lecture_unit_dto.lecture_name,
             LectureSchema.LECTURE_UNIT_ID.value: lecture_unit_dto.lecture_unit_id,
-            LectureSchema.LECTURE_UNIT_NAME.value: lecture_unit_dto.lecture_unit_name,
-            LectureSchema.LECTURE_UNIT_LINK.value: lecture_unit_dto.lecture_unit_link,
             LectureSchema.COURSE_ID.value: lecture_unit_dto.course_id,
-            LectureSchema.COURSE_NAME.value: lecture_unit_dto.course_name,
-            LectureSchema.COURSE_DESCRIPTION.value: lecture_unit_dto.course_description,
+            **lecture_unit_metadata(lecture_unit_dto),
             LectureSchema.BASE_URL.value: base_url,
             LectureSchema.COURSE_LANGUAGE.value: course_language,
             LectureSchema.PAGE_NUMBER.value: page_num + 1,
+            LectureSchema.PAGE_FINGERPRINT.value: page_fingerprint,
             LectureSchema.PAGE_TEXT_CONTENT.value: page_split.page_content,
         }
         for page_split in page_splits
@@ -97,8 +184,11 @@ class LectureIngestionPipeline(AbstractIngestion, Pipeline):
         client: WeaviateClient,
         dto: Optional[IngestionPipelineExecutionDto],
         callback: ingestion_status_callback,
+        max_page_workers: int = 8,
     ):
         super().__init__()
+        self.max_page_workers = max_page_workers
+        self.page_classifier = PageClassifier()
         self.collection = init_lecture_schema(client)
         self.dto = dto
         self.llm_vision = BasicRequestHandler("azure-gpt-4-omni")
@@ -121,25 +211,43 @@ class LectureIngestionPipeline(AbstractIngestion, Pipeline):
 
     def __call__(self) -> bool:
         try:
+            lecture_unit = self.dto.lecture_unit
+            base_url = self.dto.settings.artemis_base_url
             self.callback.in_progress("Deleting old slides from database...")
-            self.delete_lecture_unit(
-                self.dto.lecture_unit.course_id,
-                self.dto.lecture_unit.lecture_id,
-                self.dto.lecture_unit.lecture_unit_id,
-                self.dto.settings.artemis_base_url,
-            )
-            self.callback.done("Old slides removed")
-            self.callback.in_progress("Chunking and interpreting lecture...")
-            chunks = []
-            pdf_path = save_pdf(self.dto.lecture_unit.pdf_file_base64)
-            chunks.extend(
-                self.chunk_data(
-                    lecture_pdf=pdf_path,
-                    lecture_unit_dto=self.dto.lecture_unit,
-                    base_url=self.dto.settings.artemis_base_url,
+            pdf_data = decode_pdf(lecture_unit.pdf_file_base64)
+            # The encoded pdf is not needed anymore and takes more memory than the decoded one
+            lecture_unit.pdf_file_base64 = ""
+            doc = fitz.open(stream=pdf_data, filetype="pdf")
+            try:
+                image_digests = ImageDigests(doc)
+                page_fingerprints = [
+                    compute_page_fingerprint(doc.load_page(page_num), image_digests)
+                    for page_num in range(doc.page_count)
+                ]
+                ingested_pages = self.get_ingested_pages(lecture_unit, base_url)
+                changed_pages = find_changed_pages(page_fingerprints, ingested_pages)
+                self.remove_outdated_pages(
+                    ingested_pages, changed_pages, doc.page_count, lecture_unit
                 )
-            )
-            cleanup_temporary_file(pdf_path)
+                self.callback.done("Old slides removed")
+                self.callback.in_progress("Chunking and interpreting lecture...")
+                logger.info(
+                    f"Ingesting {len(changed_pages)} of {doc.page_count} pages of lecture unit "
+                    f"{lecture_unit.lecture_unit_id}"
+                )
+                chunks = []
+                if changed_pages:
+                    chunks = self.chunk_data(
+                        lecture_pdf=doc,
+                        lecture_unit_dto=lecture_unit,
+                        base_url=base_url,
+                        page_fingerprints=page_fingerprints,
+                        pages_to_ingest=changed_pages,
+                        course_language=find_course_language(ingested_pages),
+                    )
+            finally:
+                doc.close()
+                del pdf_data
             self.callback.done("Lecture Chunking and interpretation Finished")
             self.callback.in_progress("Ingesting lecture chunks into database...")
             self.batch_update(chunks)
@@ -160,72 +268,243 @@ class LectureIngestionPipeline(AbstractIngestion, Pipeline):
 
     def batch_update(self, chunks):
         """
-        Batch update the chunks into the database
-        This method is thread-safe and can only be executed by one thread at a time.
-        Weaviate limitation.
+        Batch update the chunks into the database.
+        The embeddings are computed in batches and written through the shared ingestion writer, so lectures of
+        several courses can be ingested concurrently.
+        If some chunks could not be written, the chunks of their pages that were written are deleted again, so a
+        page never keeps its current fingerprint with only some of its chunks and is ingested again next time.
         """
-        global batch_update_lock
-        with batch_update_lock:
-            with self.collection.batch.rate_limit(requests_per_minute=600) as batch:
-                try:
-                    for index, chunk in enumerate(chunks):
-                        embed_chunk = self.llm_embedding.embed(
-                            chunk[LectureSchema.PAGE_TEXT_CONTENT.value]
-                        )
-                        batch.add_object(properties=chunk, vector=embed_chunk)
-                except Exception as e:
-                    logger.error(f"Error updating lecture unit: {e}")
-                    self.callback.error(
-                        f"Failed to ingest lectures into the database: {e}",
-                        exception=e,
-                        tokens=self.tokens,
-                    )
+        embeddings = self.llm_embedding.embed_batch(
+            [chunk[LectureSchema.PAGE_TEXT_CONTENT.value] for chunk in chunks]
+        )
+        uuids = [uuid.uuid4() for _ in chunks]
+        try:
+            IngestionWriter().write(self.collection, chunks, embeddings, uuids=uuids)
+        except IngestionWriteError as e:
+            failed_pages = {
+                chunks[index][LectureSchema.PAGE_NUMBER.value] for index in e.errors
+            }
+            incomplete_chunks = [
+                chunk_uuid
+                for chunk, chunk_uuid in zip(chunks, uuids)
+                if chunk[LectureSchema.PAGE_NUMBER.value] in failed_pages
+            ]
+            try:
+                self.collection.data.delete_many(
+                    where=Filter.by_id().contains_any(incomplete_chunks)
+                )
+            except Exception as delete_error:
+                logger.error(
+                    f"Could not delete the chunks of the incompletely written pages: {delete_error}"
+                )
+            raise
+
+    def get_ingested_pages(
+        self, lecture_unit: LectureUnitDTO, base_url: str
+    ) -> dict[int, list]:
+        """
+        Fetch the chunks stored for the lecture unit, grouped by their page number
+        """
+        with span("weaviate", f"{self.collection.name}.fetch_objects"):
+            response = self.collection.query.fetch_objects(
+                filters=Filter.by_property(LectureSchema.BASE_URL.value).equal(base_url)
+                & Filter.by_property(LectureSchema.COURSE_ID.value).equal(
+                    lecture_unit.course_id
+                )
+                & Filter.by_property(LectureSchema.LECTURE_ID.value).equal(
+                    lecture_unit.lecture_id
+                )
+                & Filter.by_property(LectureSchema.LECTURE_UNIT_ID.value).equal(
+                    lecture_unit.lecture_unit_id
+                ),
+                # Maximum number of results Weaviate returns for a single query
+                limit=10_000,
+                return_properties=[
+                    LectureSchema.PAGE_NUMBER.value,
+                    LectureSchema.PAGE_FINGERPRINT.value,
+                    LectureSchema.COURSE_LANGUAGE.value,
+                    *lecture_unit_metadata(lecture_unit).keys(),
+                ],
+            )
+        pages = {}
+        for chunk in response.objects:
+            pages.setdefault(
+                chunk.properties.get(LectureSchema.PAGE_NUMBER.value), []
+            ).append(chunk)
+        return pages
+
+    def remove_outdated_pages(
+        self,
+        ingested_pages: dict[int, list],
+        changed_pages: set[int],
+        page_count: int,
+        lecture_unit: LectureUnitDTO,
+    ):
+        """
+        Delete the chunks of changed and removed pages and update the metadata of the chunks that are kept
+        """
+        outdated_chunks = []
+        changed_metadata_by_chunk = {}
+        metadata = lecture_unit_metadata(lecture_unit)
+        for page_number, chunks in ingested_pages.items():
+            if (
+                page_number is None
+                or not 1 <= page_number <= page_count
+                or page_number - 1 in changed_pages
+            ):
+                outdated_chunks.extend(chunk.uuid for chunk in chunks)
+                continue
+            for chunk in chunks:
+                changed_metadata = {
+                    key: value
+                    for key, value in metadata.items()
+                    if chunk.properties.get(key) != value
+                }
+                if changed_metadata:
+                    changed_metadata_by_chunk[chunk.uuid] = changed_metadata
+        if outdated_chunks:
+            self.collection.data.delete_many(
+                where=Filter.by_id().contains_any(outdated_chunks)
+            )
+        if changed_metadata_by_chunk:
+            self.update_metadata(changed_metadata_by_chunk)
+
+    def update_metadata(self, changed_metadata_by_chunk: dict):
+        """
+        Update the properties of the chunks by their uuid. Weaviate can only update objects one at a time, so the
+        chunks are fetched with their vectors and replaced in batches instead.
+        """
+        with span("weaviate", f"{self.collection.name}.fetch_objects"):
+            response = self.collection.query.fetch_objects(
+                filters=Filter.by_id().contains_any(list(changed_metadata_by_chunk)),
+                limit=len(changed_metadata_by_chunk),
+                include_vector=True,
+            )
+        IngestionWriter().write(
+            self.collection,
+            [
+                {**chunk.properties, **changed_metadata_by_chunk[chunk.uuid]}
+                for chunk in response.objects
+            ],
+            [chunk.vector["default"] for chunk in response.objects],
+            uuids=[chunk.uuid for chunk in response.objects],
+        )
 
     def chunk_data(
         self,
-        lecture_pdf: str,
+        lecture_pdf: fitz.Document,
         lecture_unit_dto: LectureUnitDTO = None,
         base_url: str = None,
+        page_fingerprints: Optional[list[str]] = None,
+        pages_to_ingest: Optional[set[int]] = None,
+        course_language: Optional[str] = None,
     ):
         """
-        Chunk the data from the lecture into smaller pieces
+        Chunk the data from the lecture into smaller pieces.
+        Pages are rendered on the calling thread while a bounded pool of workers interprets, merges and splits
+        them, so rendering and LLM calls of different pages overlap. The result is assembled in page order.
+        The page classifier decides which pages are rendered for the vision model and at which zoom, pages that
+        look the same as an earlier page of the deck reuse its result. Only the pages in pages_to_ingest are
+        chunked if given.
         """
-        doc = fitz.open(lecture_pdf)
-        course_language = self.get_course_language(
-            doc.load_page(min(5, doc.page_count - 1)).get_text()
-        )
-        data = []
+        doc = lecture_pdf
+        if pages_to_ingest is None:
+            pages_to_ingest = set(range(doc.page_count))
+        if page_fingerprints is None:
+            page_fingerprints = [None] * doc.page_count
+        if course_language is None:
+            course_language = self.get_course_language(
+                doc.load_page(min(5, doc.page_count - 1)).get_text()
+            )
         text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=512, chunk_overlap=102
         )
-        old_page_text = ""
-        for page_num in range(doc.page_count):
-            page = doc.load_page(page_num)
-            page_text = page.get_text()
-            if page.get_images(full=False):
-                # more pixels thus more details and better quality
-                matrix = fitz.Matrix(5, 5)
-                pix = page.get_pixmap(matrix=matrix)
-                img_bytes = pix.tobytes("jpg")
-                img_base64 = base64.b64encode(img_bytes).decode("utf-8")
-                image_interpretation = self.interpret_image(
-                    img_base64,
-                    old_page_text,
-                    lecture_unit_dto.lecture_name,
-                    course_language,
-                )
-                page_text = self.merge_page_content_and_image_interpretation(
-                    page_text, image_interpretation
-                )
-            page_splits = text_splitter.create_documents([page_text])
+        page_texts = {
+            page_num: doc.load_page(page_num).get_text()
+            for page_num in sorted(pages_to_ingest)
+        }
+        classifications = self.page_classifier.classify_deck(doc, page_texts)
+        # Results of the interpreted pages by their interpretation key, shared by pages that look the same
+        interpreted_pages = {}
+        # Limits the number of rendered pages waiting for a worker, so large decks are not held in memory at once
+        pending_pages = threading.BoundedSemaphore(2 * self.max_page_workers)
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.max_page_workers) as executor:
+            for page_num, page_text in page_texts.items():
+                classification = classifications[page_num]
+                key = classification.interpretation_key
+                if key is not None and key in interpreted_pages:
+                    futures.append((page_num, interpreted_pages[key]))
+                    continue
+                if page_num == 0:
+                    previous_page_text = ""
+                elif page_num - 1 in page_texts:
+                    previous_page_text = page_texts[page_num - 1]
+                else:
+                    previous_page_text = doc.load_page(page_num - 1).get_text()
+                pending_pages.acquire()
+                img_base64 = None
+                try:
+                    if classification.needs_interpretation:
+                        img_base64 = render_page_as_base64_image(
+                            doc.load_page(page_num), classification.zoom
+                        )
+                    future = executor.submit(
+                        with_current_context(self.process_page),
+                        page_text,
+                        img_base64,
+                        previous_page_text,
+                        lecture_unit_dto.lecture_name,
+                        course_language,
+                        text_splitter,
+                    )
+                except Exception:
+                    pending_pages.release()
+                    raise
+                future.add_done_callback(lambda _: pending_pages.release())
+                futures.append((page_num, future))
+                if key is not None:
+                    interpreted_pages[key] = future
+
+        data = []
+        for page_num, future in futures:
             data.extend(
                 create_page_data(
-                    page_num, page_splits, lecture_unit_dto, course_language, base_url
+                    page_num,
+                    future.result(),
+                    lecture_unit_dto,
+                    course_language,
+                    base_url,
+                    page_fingerprints[page_num],
                 )
             )
-            old_page_text = page_text
         return data
 
+    def process_page(
+        self,
+        page_text: str,
+        img_base64: Optional[str],
+        previous_page_text: str,
+        lecture_name: str,
+        course_language: str,
+        text_splitter: RecursiveCharacterTextSplitter,
+    ):
+        """
+        Interpret the rendered page if it contains images, merge the interpretation into the page text and split
+        the result. The raw text of the previous page is used as context, so pages can be processed independently.
+        """
+        if img_base64:
+            image_interpretation = self.interpret_image(
+                img_base64,
+                previous_page_text,
+                lecture_name,
+                course_language,
+            )
+            page_text = self.merge_page_content_and_image_interpretation(
+                page_text, image_interpretation
+            )
+        return text_splitter.create_documents([page_text])
+
     def interpret_image(
         self,
         img_base64: str,
@@ -251,7 +530,9 @@ class LectureIngestionPipeline(AbstractIngestion, Pipeline):
         )
         try:
             response = self.llm_vision.chat(
-                [iris_message], CompletionArguments(temperature=0, max_tokens=512)
+                [iris_message],
+                CompletionArguments(temperature=0, max_tokens=512),
+                tools=None,
             )
             self._append_tokens(
                 response.token_usage, PipelineEnum.IRIS_LECTURE_INGESTION
@@ -265,18 +546,13 @@ class LectureIngestionPipeline(AbstractIngestion, Pipeline):
         self, page_content: str, image_interpretation: str
     ):
         """
-        Merge the text and image together
+        Merge the text and image together.
+        A separate chat model instance is used per call, as the token usage is stored on the model and pages are
+        merged concurrently.
         """
-        dirname = os.path.dirname(__file__)
-        prompt_file_path = os.path.join(
-            dirname, ".", "prompts", "content_image_interpretation_merge_prompt.txt"
-        )
-        with open(prompt_file_path, "r") as file:
-            logger.info("Loading ingestion prompt...")
-            lecture_ingestion_prompt = file.read()
         prompt = ChatPromptTemplate.from_messages(
             [
-                ("system", lecture_ingestion_prompt),
+                ("system", load_merge_prompt()),
             ]
         )
         prompt_val = prompt.format_messages(
@@ -284,10 +560,16 @@ class LectureIngestionPipeline(AbstractIngestion, Pipeline):
             image_interpretation=image_interpretation,
         )
         prompt = ChatPromptTemplate.from_messages(prompt_val)
+        llm = IrisLangchainChatModel(
+            request_handler=self.llm.request_handler,
+            completion_args=CompletionArguments(temperature=0.2, max_tokens=2000),
+        )
         clean_output = clean(
-            (prompt | self.pipeline).invoke({}), bullets=True, extra_whitespace=True
+            (prompt | llm | StrOutputParser()).invoke({}),
+            bullets=True,
+            extra_whitespace=True,
         )
-        self._append_tokens(self.llm.tokens, PipelineEnum.IRIS_LECTURE_INGESTION)
+        self._append_tokens(llm.tokens, PipelineEnum.IRIS_LECTURE_INGESTION)
         return clean_output
 
     def get_course_language(self, page_content: str) -> str:
@@ -303,7 +585,9 @@ class LectureIngestionPipeline(AbstractIngestion, Pipeline):
             contents=[TextMessageContentDTO(text_content=prompt)],
         )
         response = self.llm_chat.chat(
-            [iris_message], CompletionArguments(temperature=0, max_tokens=20)
+            [iris_message],
+            CompletionArguments(temperature=0, max_tokens=20),
+            tools=None,
         )
         self._append_tokens(response.token_usage, PipelineEnum.IRIS_LECTURE_INGESTION)
         return response.contents[0].text_content
@@ -0,0 +1,49 @@
+import threading
+from contextlib import contextmanager
+from typing import Callable, Generic, Iterator, TypeVar
+
+from app.pipeline.pipeline import Pipeline
+
+T = TypeVar("T", bound=Pipeline)
+
+
+class PipelinePool(Generic[T]):
+    """
+    Thread-safe pool of reusable pipeline instances.
+    Building a pipeline loads prompt files and initializes the database schemas, so instances are kept after a
+    request instead of being built again. An instance is only used by one request at a time, as pipelines keep
+    per-call state such as token usage on their sub pipelines.
+    """
+
+    def __init__(self, factory: Callable[[], T], max_idle: int = 16):
+        self.factory = factory
+        self.max_idle = max_idle
+        self._idle: list[T] = []
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        """Take an idle instance or build a new one if there is none"""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self.factory()
+
+    def release(self, pipeline: T):
+        """Return an instance taken with get, it is dropped if enough instances are idle"""
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(pipeline)
+
+    @contextmanager
+    def acquire(self) -> Iterator[T]:
+        """Take an instance for the duration of the with block"""
+        pipeline = self.get()
+        try:
+            yield pipeline
+        finally:
+            self.release(pipeline)
+
+    def clear(self):
+        """Drop the idle instances, e.g. after the configuration changed"""
+        with self._lock:
+            self._idle.clear()
@@ -0,0 +1,108 @@
+import threading
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import List, Optional
+
+import numpy as np
+
+from app.llm import BasicRequestHandler
+
+
+class RerankerBackend(ABC):
+    """Scores how relevant paragraphs are to a query without calling a chat model"""
+
+    @abstractmethod
+    def score(
+        self,
+        query: str,
+        paragraphs: List[str],
+        vectors: Optional[List[Optional[List[float]]]] = None,
+    ) -> List[float]:
+        """
+        Return one relevance score per paragraph, higher scores are more relevant.
+        The vectors are the stored embeddings of the paragraphs, where known.
+        """
+        raise NotImplementedError
+
+
+class EmbeddingRerankerBackend(RerankerBackend):
+    """
+    Ranks paragraphs by the cosine similarity of their embeddings to the embedding of the query.
+    The stored embeddings of the paragraphs are used where they are passed, so usually only the query is embedded.
+    The paragraphs without one are embedded in the same batch as the query.
+    The model has to be the one the paragraphs were embedded with on ingestion.
+    """
+
+    def __init__(self, model_id: str = "embedding-small"):
+        self.request_handler = BasicRequestHandler(model_id)
+
+    def score(
+        self,
+        query: str,
+        paragraphs: List[str],
+        vectors: Optional[List[Optional[List[float]]]] = None,
+    ) -> List[float]:
+        if not paragraphs:
+            return []
+        vectors = list(vectors) if vectors is not None else [None] * len(paragraphs)
+        missing = [index for index, vector in enumerate(vectors) if vector is None]
+        embeddings = self.request_handler.embed_batch(
+            [query, *(paragraphs[index] for index in missing)]
+        )
+        for index, embedding in zip(missing, embeddings[1:]):
+            vectors[index] = embedding
+
+        vectors = np.asarray([embeddings[0], *vectors], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1)
+        norms[norms == 0] = 1.0
+        vectors /= norms[:, np.newaxis]
+        return (vectors[1:] @ vectors[0]).tolist()
+
+
+class CrossEncoderRerankerBackend(RerankerBackend):
+    """
+    Scores (query, paragraph) pairs with a small cross-encoder on the CPU.
+    The model is loaded once per process on first use.
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 32):
+        self.model_name = model_name
+        self.batch_size = batch_size
+
+    def score(
+        self,
+        query: str,
+        paragraphs: List[str],
+        vectors: Optional[List[Optional[List[float]]]] = None,
+    ) -> List[float]:
+        with _cross_encoder_lock:
+            model = _load_cross_encoder(self.model_name)
+            scores = model.predict(
+                [(query, paragraph) for paragraph in paragraphs],
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+            )
+        return [float(score) for score in scores]
+
+
+_cross_encoder_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _load_cross_encoder(model_name: str):
+    try:
+        from sentence_transformers import CrossEncoder
+    except ImportError as e:
+        raise ImportError(
+            "The cross_encoder reranker requires the sentence-transformers package"
+        ) from e
+    return CrossEncoder(model_name, device="cpu")
+
+
+def rank_paragraphs(scores: List[float], limit: int) -> List[int]:
+    """
+    Return the indexes of the paragraphs with the highest scores, at most limit.
+    Equal scores keep the order of the paragraphs, so the ranking is deterministic.
+    """
+    ranking = sorted(range(len(scores)), key=lambda index: (-scores[index], index))
+    return ranking[:limit]
@@ -10,18 +10,41 @@ from langsmith import traceable
 from app.common.pyris_message import PyrisMessage
 from app.llm import CapabilityRequestHandler, RequirementList, CompletionArguments
 from app.common.PipelineEnum import PipelineEnum
+from app.config import settings
 from app.llm.langchain import IrisLangchainChatModel
 from app.pipeline import Pipeline
 from app.pipeline.chat.output_models.output_models.selected_paragraphs import (
     SelectedParagraphs,
 )
+from app.pipeline.shared.reranker_backends import (
+    CrossEncoderRerankerBackend,
+    EmbeddingRerankerBackend,
+    RerankerBackend,
+    rank_paragraphs,
+)
 from app.vector_database.lecture_schema import LectureSchema
 
 
+def create_reranker_backend() -> Optional[RerankerBackend]:
+    """Create the configured local reranker backend, or None if the LLM selects the paragraphs"""
+    match settings.retrieval.reranker:
+        case "embedding":
+            return EmbeddingRerankerBackend()
+        case "cross_encoder":
+            return CrossEncoderRerankerBackend(settings.retrieval.cross_encoder_model)
+        case _:
+            return None
+
+
 class RerankerPipeline(Pipeline):
-    """A generic reranker pipeline that can be used to rerank a list of documents based on a question"""
+    """
+    A generic reranker pipeline that can be used to rerank a list of documents based on a question.
+    With a local backend configured, the paragraphs are scored without a chat model and the top_k of the
+    retrieval settings are selected.
+    """
 
     llm: IrisLangchainChatModel
+    backend: Optional[RerankerBackend]
     pipeline: Runnable
     prompt_str: str
     prompt: ChatPromptTemplate
@@ -57,6 +80,7 @@ class RerankerPipeline(Pipeline):
         )
         logger.debug(self.output_parser.get_format_instructions())
         self.pipeline = self.llm | self.output_parser
+        self.backend = create_reranker_backend()
         self.tokens = []
 
     def __repr__(self):
@@ -72,29 +96,37 @@ class RerankerPipeline(Pipeline):
         query: str,
         prompt: Optional[PromptTemplate] = None,
         chat_history: list[PyrisMessage] = None,
+        vectors: Optional[List[Optional[List[float]]]] = None,
         **kwargs,
     ) -> List[str]:
         """
         Runs the pipeline
             :param paragraphs: List of paragraphs which can be list of dicts or list of strings
             :param query: The query
+            :param vectors: The stored embeddings of the paragraphs, used by the embedding backend
             :return: Selected file content
         """
         # Determine if paragraphs are a list of dicts or strings and prepare data accordingly
-        paras = ""
         if paragraphs and isinstance(paragraphs[0], dict):
-            for i, paragraph in enumerate(paragraphs):
-                paras += "Paragraph {}:\n{}\n".format(
-                    str(i), paragraph.get(LectureSchema.PAGE_TEXT_CONTENT.value, "")
-                )
+            texts = [
+                paragraph.get(LectureSchema.PAGE_TEXT_CONTENT.value, "") or ""
+                for paragraph in paragraphs
+            ]
         elif paragraphs and isinstance(paragraphs[0], str):
-            for i, paragraph in enumerate(paragraphs):
-                paras += "Paragraph {}:\n{}\n".format(str(i), paragraph)
+            texts = list(paragraphs)
         else:
             raise ValueError(
                 "Invalid input type for paragraphs. Must be a list of dictionaries or a list of strings."
             )
 
+        if self.backend is not None:
+            scores = self.backend.score(query, texts, vectors)
+            return [str(i) for i in rank_paragraphs(scores, settings.retrieval.top_k)]
+
+        paras = ""
+        for i, text in enumerate(texts):
+            paras += "Paragraph {}:\n{}\n".format(str(i), text)
+
         text_chat_history = [
             chat_history[-i - 1].contents[0].text_content
             for i in range(min(4, len(chat_history)))  # Ensure no out-of-bounds error
@@ -1,3 +1,4 @@
+import asyncio
 from abc import abstractmethod, ABC
 from typing import List, Optional
 from langsmith import traceable
@@ -6,9 +7,13 @@ from weaviate.classes.query import Filter
 from app.common.token_usage_dto import TokenUsageDTO
 from app.common.PipelineEnum import PipelineEnum
 from ..common.message_converters import convert_iris_message_to_langchain_message
+from ..common.event_loop import run_coroutine
 from ..common.pyris_message import PyrisMessage
 from ..llm.langchain import IrisLangchainChatModel
 from ..pipeline import Pipeline
+from ..vector_database.course_metadata_cache import CourseMetadataCache
+from ..telemetry import span
+from .rewrite_cache import RewriteCache, RewriteCacheEntry, rewrite_cache_key
 from app.llm import (
     BasicRequestHandler,
     CompletionArguments,
@@ -17,7 +22,6 @@ from app.llm import (
 )
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate, SystemMessagePromptTemplate
-import concurrent.futures
 import logging
 
 logger = logging.getLogger(__name__)
@@ -127,7 +131,7 @@ class BaseRetrieval(Pipeline, ABC):
             raise e
 
     @traceable(name="Retrieval: Rewrite Student Query")
-    def rewrite_student_query(
+    async def rewrite_student_query(
         self,
         chat_history: list[PyrisMessage],
         student_query: str,
@@ -153,14 +157,17 @@ class BaseRetrieval(Pipeline, ABC):
             student_query=student_query,
         )
         prompt = ChatPromptTemplate.from_messages(prompt_val)
-        try:
-            response = (prompt | self.pipeline).invoke({})
-            token_usage = self.llm.tokens
-            token_usage.pipeline = pipeline_enum
-            self.tokens.append(self.llm.tokens)
-            return response
-        except Exception as e:
-            raise e
+        # A separate chat model instance is used per call, as the token usage is stored on the model and the
+        # rewrite tasks run concurrently
+        llm = IrisLangchainChatModel(
+            request_handler=self.llm.request_handler,
+            completion_args=self.llm.completion_args,
+        )
+        response = await (prompt | llm | StrOutputParser()).ainvoke({})
+        token_usage = llm.tokens
+        token_usage.pipeline = pipeline_enum
+        self.tokens.append(token_usage)
+        return response
 
     @traceable(name="Retrieval: Search in DB")
     def search_in_db(
@@ -173,9 +180,11 @@ class BaseRetrieval(Pipeline, ABC):
         base_url: Optional[str] = None,
         course_id_property: str = "course_id",
         base_url_property: str = "base_url",
+        vector: Optional[list[float]] = None,
     ):
         """
         Search the database for the given query.
+        The query is embedded unless its embedding is passed as vector.
         """
         logger.info(f"Searching in the database for query: {query}")
         filter_weaviate = None
@@ -185,15 +194,17 @@ class BaseRetrieval(Pipeline, ABC):
             if base_url:
                 filter_weaviate &= Filter.by_property(base_url_property).equal(base_url)
 
-        vec = self.llm_embedding.embed(query)
-        return self.collection.query.hybrid(
-            query=query,
-            alpha=hybrid_factor,
-            vector=vec,
-            return_properties=schema_properties,
-            limit=result_limit,
-            filters=filter_weaviate,
-        )
+        if vector is None:
+            vector = self.llm_embedding.embed(query)
+        with span("weaviate", f"{self.collection.name}.hybrid"):
+            return self.collection.query.hybrid(
+                query=query,
+                alpha=hybrid_factor,
+                vector=vector,
+                return_properties=schema_properties,
+                limit=result_limit,
+                filters=filter_weaviate,
+            )
 
     @traceable(name="Retrieval: Run Parallel Rewrite Tasks")
     def run_parallel_rewrite_tasks(
@@ -215,54 +226,105 @@ class BaseRetrieval(Pipeline, ABC):
         """
         Run the rewrite tasks in parallel.
         """
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            rewritten_query_future = executor.submit(
-                self.rewrite_student_query,
-                chat_history,
-                student_query,
-                course_language,
-                course_name,
-                initial_prompt,
-                rewrite_prompt,
-                pipeline_enum,
-            )
-            hypothetical_answer_query_future = executor.submit(
-                self.rewrite_student_query,
-                chat_history,
-                student_query,
-                course_language,
-                course_name,
-                initial_prompt,
-                hypothetical_answer_prompt,
-                pipeline_enum,
+        return run_coroutine(
+            self._arun_parallel_rewrite_tasks(
+                chat_history=chat_history,
+                student_query=student_query,
+                result_limit=result_limit,
+                course_language=course_language,
+                initial_prompt=initial_prompt,
+                rewrite_prompt=rewrite_prompt,
+                hypothetical_answer_prompt=hypothetical_answer_prompt,
+                pipeline_enum=pipeline_enum,
+                course_name=course_name,
+                course_id=course_id,
+                base_url=base_url,
             )
+        )
 
-            rewritten_query = rewritten_query_future.result()
-            hypothetical_answer_query = hypothetical_answer_query_future.result()
+    async def _arun_parallel_rewrite_tasks(
+        self,
+        chat_history: list[PyrisMessage],
+        student_query: str,
+        result_limit: int,
+        course_language: str,
+        initial_prompt: str,
+        rewrite_prompt: str,
+        hypothetical_answer_prompt: str,
+        pipeline_enum: PipelineEnum,
+        course_name: Optional[str] = None,
+        course_id: Optional[int] = None,
+        base_url: Optional[str] = None,
+    ):
+        """
+        Run both rewrite tasks concurrently on one event loop, embed both texts with a single request and
+        search the database with them.
+        Rewrites of recent, nearly identical queries in the course are taken from the cache instead.
+        """
+        cache = RewriteCache()
+        cache_key = rewrite_cache_key(
+            chat_history,
+            student_query,
+            self.implementation_id,
+            course_language,
+            course_name,
+            initial_prompt,
+            rewrite_prompt,
+            hypothetical_answer_prompt,
+        )
+        rewrites = cache.get(course_id, cache_key)
+        if rewrites is None:
+            rewritten_query, hypothetical_answer_query = await asyncio.gather(
+                self.rewrite_student_query(
+                    chat_history,
+                    student_query,
+                    course_language,
+                    course_name,
+                    initial_prompt,
+                    rewrite_prompt,
+                    pipeline_enum,
+                ),
+                self.rewrite_student_query(
+                    chat_history,
+                    student_query,
+                    course_language,
+                    course_name,
+                    initial_prompt,
+                    hypothetical_answer_prompt,
+                    pipeline_enum,
+                ),
+            )
+            vector, vector_hyde = await self.llm_embedding.aembed_batch(
+                [rewritten_query, hypothetical_answer_query]
+            )
+            rewrites = RewriteCacheEntry(
+                rewritten_query, hypothetical_answer_query, vector, vector_hyde
+            )
+            cache.put(course_id, cache_key, rewrites)
 
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            response_future = executor.submit(
+        # The Weaviate client is synchronous, so the searches run in the default executor of the event loop
+        response, response_hyde = await asyncio.gather(
+            asyncio.to_thread(
                 self.search_in_db,
-                query=rewritten_query,
+                query=rewrites.rewritten_query,
                 hybrid_factor=0.9,
                 result_limit=result_limit,
                 schema_properties=self.get_schema_properties(),
                 course_id=course_id,
                 base_url=base_url,
-            )
-            response_hyde_future = executor.submit(
+                vector=rewrites.vector,
+            ),
+            asyncio.to_thread(
                 self.search_in_db,
-                query=hypothetical_answer_query,
+                query=rewrites.hypothetical_answer,
                 hybrid_factor=0.9,
                 result_limit=result_limit,
                 schema_properties=self.get_schema_properties(),
                 course_id=course_id,
                 base_url=base_url,
-            )
-
-            response = response_future.result()
-            response_hyde = response_hyde_future.result()
-
+                vector=rewrites.vector_hyde,
+            ),
+        )
         return response, response_hyde
 
     @abstractmethod
@@ -272,9 +334,7 @@ class BaseRetrieval(Pipeline, ABC):
         """
         raise NotImplementedError
 
-    def fetch_course_language(
-        self, course_id: int, course_language_property: str = "course_language"
-    ) -> str:
+    def fetch_course_language(self, course_id: int) -> str:
         """
         Fetch the language of the course based on the course ID.
         If no specific language is set, it defaults to English.
@@ -282,17 +342,10 @@ class BaseRetrieval(Pipeline, ABC):
         course_language = "english"
 
         if course_id:
-            result = self.collection.query.fetch_objects(
-                filters=Filter.by_property("course_id").equal(course_id),
-                limit=1,
-                return_properties=[course_language_property],
+            fetched_language = (
+                CourseMetadataCache().get(self.collection, course_id).course_language
             )
-
-            if result.objects:
-                fetched_language = result.objects[0].properties.get(
-                    course_language_property
-                )
-                if fetched_language:
-                    course_language = fetched_language
+            if fetched_language:
+                course_language = fetched_language
 
         return course_language
@@ -1,4 +1,4 @@
-from weaviate.collections.classes.filters import Filter
+from app.vector_database.course_metadata_cache import CourseMetadataCache
 from app.vector_database.database import VectorDatabase
 from app.vector_database.faq_schema import FaqSchema
 
@@ -12,13 +12,7 @@ def should_allow_faq_tool(db: VectorDatabase, course_id: int) -> bool:
     :return: True if there are indexed faqs for the course, False otherwise
     """
     if course_id:
-        # Fetch the first object that matches the course ID with the language property
-        result = db.faqs.query.fetch_objects(
-            filters=Filter.by_property(FaqSchema.COURSE_ID.value).equal(course_id),
-            limit=1,
-            return_properties=[FaqSchema.COURSE_NAME.value],
-        )
-        return len(result.objects) > 0
+        return CourseMetadataCache().get(db.faqs, course_id).has_objects
     return False
 
 
@@ -1,16 +1,23 @@
+import asyncio
 from asyncio.log import logger
-from typing import List
+from typing import List, Optional
 
 from langsmith import traceable
 from weaviate import WeaviateClient
-from weaviate.classes.query import Filter
+from weaviate.classes.query import Filter, MetadataQuery
 
 from app.common.token_usage_dto import TokenUsageDTO
+from app.config import settings
 from app.common.PipelineEnum import PipelineEnum
 from ..common.message_converters import convert_iris_message_to_langchain_message
+from ..common.event_loop import run_coroutine
 from ..common.pyris_message import PyrisMessage
 from ..llm.langchain import IrisLangchainChatModel
 from ..pipeline import Pipeline
+from ..vector_database.course_metadata_cache import CourseMetadataCache
+from ..telemetry import span
+from .rank_fusion import reciprocal_rank_fusion, top_k_agreement
+from .rewrite_cache import RewriteCache, RewriteCacheEntry, rewrite_cache_key
 
 from app.llm import (
     BasicRequestHandler,
@@ -36,7 +43,6 @@ from ..pipeline.prompts.lecture_retrieval_prompts import (
     rewrite_student_query_prompt_with_exercise_context,
     write_hypothetical_answer_with_exercise_context_prompt,
 )
-import concurrent.futures
 
 
 def merge_retrieved_chunks(
@@ -44,17 +50,27 @@ def merge_retrieved_chunks(
 ) -> List[dict]:
     """
     Merge the retrieved chunks from the basic and hyde retrieval methods. This function ensures that for any
-    duplicate IDs, the properties from hyde_retrieved_lecture_chunks will overwrite those from
+    duplicate IDs, the chunks from hyde_retrieved_lecture_chunks will overwrite those from
     basic_retrieved_lecture_chunks.
     """
     merged_chunks = {}
     for chunk in basic_retrieved_lecture_chunks:
-        merged_chunks[chunk["id"]] = chunk["properties"]
+        merged_chunks[chunk["id"]] = chunk
 
     for chunk in hyde_retrieved_lecture_chunks:
-        merged_chunks[chunk["id"]] = chunk["properties"]
+        merged_chunks[chunk["id"]] = chunk
 
-    return [properties for uuid, properties in merged_chunks.items()]
+    return list(merged_chunks.values())
+
+
+def _retrieved_chunk(obj) -> dict:
+    """The ID, properties, stored embedding and search score of a chunk returned by the hybrid search"""
+    return {
+        "id": obj.uuid.int,
+        "properties": obj.properties,
+        "vector": (obj.vector or {}).get("default"),
+        "score": obj.metadata.score,
+    }
 
 
 def _add_last_four_messages_to_prompt(
@@ -133,23 +149,76 @@ class LectureRetrieval(Pipeline):
             exercise_title=exercise_title,
         )
 
-        basic_retrieved_lecture_chunks: list[dict[str, dict]] = [
-            {"id": obj.uuid.int, "properties": obj.properties}
-            for obj in response.objects
+        basic_retrieved_lecture_chunks: list[dict] = [
+            _retrieved_chunk(obj) for obj in response.objects
         ]
-        hyde_retrieved_lecture_chunks: list[dict[str, dict]] = [
-            {"id": obj.uuid.int, "properties": obj.properties}
-            for obj in response_hyde.objects
+        hyde_retrieved_lecture_chunks: list[dict] = [
+            _retrieved_chunk(obj) for obj in response_hyde.objects
         ]
+        if settings.retrieval.mode == "fusion":
+            return self.fuse_retrieved_chunks(
+                basic_retrieved_lecture_chunks,
+                hyde_retrieved_lecture_chunks,
+                student_query,
+                chat_history,
+            )
+
         merged_chunks = merge_retrieved_chunks(
             basic_retrieved_lecture_chunks, hyde_retrieved_lecture_chunks
         )
-        if len(merged_chunks) != 0:
+        return self.rerank_chunks(merged_chunks, student_query, chat_history)
+
+    def fuse_retrieved_chunks(
+        self,
+        basic_retrieved_lecture_chunks: list[dict],
+        hyde_retrieved_lecture_chunks: list[dict],
+        student_query: str,
+        chat_history: list[PyrisMessage],
+    ) -> List[dict]:
+        """
+        Fuse the results of both searches with reciprocal rank fusion and return the top_k chunks.
+        The LLM reranker is only asked if the searches do not agree on their top results, as the fused
+        ranking is ambiguous then.
+        """
+        top_k = settings.retrieval.top_k
+        fused_chunks = reciprocal_rank_fusion(
+            [basic_retrieved_lecture_chunks, hyde_retrieved_lecture_chunks],
+            k=settings.retrieval.rrf_k,
+        )
+        agreement = top_k_agreement(
+            basic_retrieved_lecture_chunks, hyde_retrieved_lecture_chunks, top_k
+        )
+        if agreement >= settings.retrieval.min_agreement:
+            logger.info(
+                f"Searches agree on {agreement:.0%} of their top results, skipping the reranker"
+            )
+            return [chunk["properties"] for chunk in fused_chunks[:top_k]]
+
+        return self.rerank_chunks(fused_chunks, student_query, chat_history)
+
+    def rerank_chunks(
+        self,
+        chunks: List[dict],
+        student_query: str,
+        chat_history: list[PyrisMessage],
+    ) -> List[dict]:
+        """
+        Let the reranker select the chunks that are relevant to the query and return the properties of at most
+        top_k of them, like the fused ranking. The stored embeddings of the chunks are passed along, so the
+        embedding reranker does not embed them again.
+        """
+        if len(chunks) != 0:
             selected_chunks_index = self.reranker_pipeline(
-                paragraphs=merged_chunks, query=student_query, chat_history=chat_history
+                paragraphs=[chunk["properties"] for chunk in chunks],
+                query=student_query,
+                chat_history=chat_history,
+                vectors=[chunk.get("vector") for chunk in chunks],
             )
             if selected_chunks_index:
-                return [merged_chunks[int(i)] for i in selected_chunks_index]
+                return [
+                    chunks[int(i)]["properties"]
+                    for i in selected_chunks_index[: settings.retrieval.top_k]
+                ]
         return []
 
     @traceable(name="Basic Lecture Retrieval")
@@ -168,8 +237,10 @@ class LectureRetrieval(Pipeline):
         if not self.assess_question(chat_history, student_query):
             return []
 
-        rewritten_query = self.rewrite_student_query(
-            chat_history, student_query, "course_language", course_name
+        rewritten_query = run_coroutine(
+            self.rewrite_student_query(
+                chat_history, student_query, "course_language", course_name
+            )
         )
         response = self.search_in_db(
             query=rewritten_query,
@@ -214,7 +285,7 @@ class LectureRetrieval(Pipeline):
             raise e
 
     @traceable(name="Retrieval: Rewrite Student Query")
-    def rewrite_student_query(
+    async def rewrite_student_query(
         self,
         chat_history: list[PyrisMessage],
         student_query: str,
@@ -239,18 +310,12 @@ class LectureRetrieval(Pipeline):
             student_query=student_query,
         )
         prompt = ChatPromptTemplate.from_messages(prompt_val)
-        try:
-            response = (prompt | self.pipeline).invoke({})
-            token_usage = self.llm.tokens
-            token_usage.pipeline = PipelineEnum.IRIS_LECTURE_RETRIEVAL_PIPELINE
-            self.tokens.append(self.llm.tokens)
-            logger.info(f"Response from exercise chat pipeline: {response}")
-            return response
-        except Exception as e:
-            raise e
+        response = await self._ainvoke_rewrite_prompt(prompt)
+        logger.info(f"Response from exercise chat pipeline: {response}")
+        return response
 
     @traceable(name="Retrieval: Rewrite Student Query with Exercise Context")
-    def rewrite_student_query_with_exercise_context(
+    async def rewrite_student_query_with_exercise_context(
         self,
         chat_history: list[PyrisMessage],
         student_query: str,
@@ -279,18 +344,12 @@ class LectureRetrieval(Pipeline):
             student_query=student_query,
         )
         prompt = ChatPromptTemplate.from_messages(prompt_val)
-        try:
-            response = (prompt | self.pipeline).invoke({})
-            token_usage = self.llm.tokens
-            token_usage.pipeline = PipelineEnum.IRIS_LECTURE_RETRIEVAL_PIPELINE
-            self.tokens.append(self.llm.tokens)
-            logger.info(f"Response from exercise chat pipeline: {response}")
-            return response
-        except Exception as e:
-            raise e
+        response = await self._ainvoke_rewrite_prompt(prompt)
+        logger.info(f"Response from exercise chat pipeline: {response}")
+        return response
 
     @traceable(name="Retrieval: Rewrite Elaborated Query")
-    def rewrite_elaborated_query(
+    async def rewrite_elaborated_query(
         self,
         chat_history: list[PyrisMessage],
         student_query: str,
@@ -317,18 +376,12 @@ class LectureRetrieval(Pipeline):
             course_name=course_name,
         )
         prompt = ChatPromptTemplate.from_messages(prompt_val)
-        try:
-            response = (prompt | self.pipeline).invoke({})
-            token_usage = self.llm.tokens
-            token_usage.pipeline = PipelineEnum.IRIS_LECTURE_RETRIEVAL_PIPELINE
-            self.tokens.append(self.llm.tokens)
-            logger.info(f"Response from retirval pipeline: {response}")
-            return response
-        except Exception as e:
-            raise e
+        response = await self._ainvoke_rewrite_prompt(prompt)
+        logger.info(f"Response from retirval pipeline: {response}")
+        return response
 
     @traceable(name="Retrieval: Rewrite Elaborated Query with Exercise Context")
-    def rewrite_elaborated_query_with_exercise_context(
+    async def rewrite_elaborated_query_with_exercise_context(
         self,
         chat_history: list[PyrisMessage],
         student_query: str,
@@ -359,15 +412,25 @@ class LectureRetrieval(Pipeline):
                 ("user", student_query),
             ]
         )
-        try:
-            response = (prompt | self.pipeline).invoke({})
-            token_usage = self.llm.tokens
-            token_usage.pipeline = PipelineEnum.IRIS_LECTURE_RETRIEVAL_PIPELINE
-            self.tokens.append(self.llm.tokens)
-            logger.info(f"Response from exercise chat pipeline: {response}")
-            return response
-        except Exception as e:
-            raise e
+        response = await self._ainvoke_rewrite_prompt(prompt)
+        logger.info(f"Response from exercise chat pipeline: {response}")
+        return response
+
+    async def _ainvoke_rewrite_prompt(self, prompt: ChatPromptTemplate) -> str:
+        """
+        Invoke the prompt and record the token usage.
+        A separate chat model instance is used per call, as the token usage is stored on the model and the
+        rewrite tasks run concurrently.
+        """
+        llm = IrisLangchainChatModel(
+            request_handler=self.llm.request_handler,
+            completion_args=self.llm.completion_args,
+        )
+        response = await (prompt | llm | StrOutputParser()).ainvoke({})
+        token_usage = llm.tokens
+        token_usage.pipeline = PipelineEnum.IRIS_LECTURE_RETRIEVAL_PIPELINE
+        self.tokens.append(token_usage)
+        return response
 
     @traceable(name="Retrieval: Search in DB")
     def search_in_db(
@@ -377,9 +440,13 @@ class LectureRetrieval(Pipeline):
         result_limit: int,
         course_id: int = None,
         base_url: str = None,
+        vector: Optional[list[float]] = None,
+        include_vector: bool = False,
     ):
         """
         Search the database for the given query.
+        The query is embedded unless its embedding is passed as vector. With include_vector, the stored embeddings
+        of the chunks are returned as well, for the reranker.
         """
         logger.info(f"Searching in the database for query: {query}")
         # Initialize filter to None by default
@@ -398,21 +465,25 @@ class LectureRetrieval(Pipeline):
                     LectureSchema.BASE_URL.value
                 ).equal(base_url)
 
-        vec = self.llm_embedding.embed(query)
-        return_value = self.collection.query.hybrid(
-            query=query,
-            alpha=hybrid_factor,
-            vector=vec,
-            return_properties=[
-                LectureSchema.COURSE_ID.value,
-                LectureSchema.LECTURE_UNIT_NAME.value,
-                LectureSchema.LECTURE_UNIT_LINK.value,
-                LectureSchema.PAGE_NUMBER.value,
-                LectureSchema.PAGE_TEXT_CONTENT.value,
-            ],
-            limit=result_limit,
-            filters=filter_weaviate,
-        )
+        if vector is None:
+            vector = self.llm_embedding.embed(query)
+        with span("weaviate", f"{self.collection.name}.hybrid"):
+            return_value = self.collection.query.hybrid(
+                query=query,
+                alpha=hybrid_factor,
+                vector=vector,
+                return_properties=[
+                    LectureSchema.COURSE_ID.value,
+                    LectureSchema.LECTURE_UNIT_NAME.value,
+                    LectureSchema.LECTURE_UNIT_LINK.value,
+                    LectureSchema.PAGE_NUMBER.value,
+                    LectureSchema.PAGE_TEXT_CONTENT.value,
+                ],
+                limit=result_limit,
+                filters=filter_weaviate,
+                return_metadata=MetadataQuery(score=True),
+                include_vector=include_vector,
+            )
         return return_value
 
     @traceable(name="Retrieval: Run Parallel Rewrite Tasks")
@@ -431,79 +502,136 @@ class LectureRetrieval(Pipeline):
         """
         Run the rewrite tasks in parallel.
         """
+        return run_coroutine(
+            self._arun_parallel_rewrite_tasks(
+                chat_history=chat_history,
+                student_query=student_query,
+                result_limit=result_limit,
+                course_language=course_language,
+                course_name=course_name,
+                course_id=course_id,
+                base_url=base_url,
+                problem_statement=problem_statement,
+                exercise_title=exercise_title,
+            )
+        )
+
+    async def _arun_parallel_rewrite_tasks(
+        self,
+        chat_history: list[PyrisMessage],
+        student_query: str,
+        result_limit: int,
+        course_language: str,
+        course_name: str = None,
+        course_id: int = None,
+        base_url: str = None,
+        problem_statement: str = None,
+        exercise_title: str = None,
+    ):
+        """
+        Rewrite the query and write the hypothetical answer concurrently on one event loop, embed both texts
+        with a single request and search the database with them.
+        Rewrites of recent, nearly identical queries in the course are taken from the cache instead.
+        """
+        cache = RewriteCache()
+        cache_key = rewrite_cache_key(
+            chat_history,
+            student_query,
+            self.implementation_id,
+            course_language,
+            course_name,
+            exercise_title,
+            problem_statement,
+        )
+        rewrites = cache.get(course_id, cache_key)
+        if rewrites is None:
+            rewrites = await self._arewrite_and_embed(
+                chat_history,
+                student_query,
+                course_language,
+                course_name,
+                problem_statement,
+                exercise_title,
+            )
+            cache.put(course_id, cache_key, rewrites)
+
+        # The embedding reranker scores the chunks with their stored embeddings instead of embedding them again
+        include_vector = settings.retrieval.reranker == "embedding"
+        # The Weaviate client is synchronous, so the searches run in the default executor of the event loop
+        response, response_hyde = await asyncio.gather(
+            asyncio.to_thread(
+                self.search_in_db,
+                query=rewrites.rewritten_query,
+                hybrid_factor=0.9,
+                result_limit=result_limit,
+                course_id=course_id,
+                base_url=base_url,
+                vector=rewrites.vector,
+                include_vector=include_vector,
+            ),
+            asyncio.to_thread(
+                self.search_in_db,
+                query=rewrites.hypothetical_answer,
+                hybrid_factor=0.9,
+                result_limit=result_limit,
+                course_id=course_id,
+                base_url=base_url,
+                vector=rewrites.vector_hyde,
+                include_vector=include_vector,
+            ),
+        )
+        return response, response_hyde
+
+    async def _arewrite_and_embed(
+        self,
+        chat_history: list[PyrisMessage],
+        student_query: str,
+        course_language: str,
+        course_name: str = None,
+        problem_statement: str = None,
+        exercise_title: str = None,
+    ) -> RewriteCacheEntry:
         if problem_statement:
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                # Schedule the rewrite tasks to run in parallel
-                rewritten_query_future = executor.submit(
-                    self.rewrite_student_query_with_exercise_context,
+            rewritten_query, hypothetical_answer_query = await asyncio.gather(
+                self.rewrite_student_query_with_exercise_context(
                     chat_history,
                     student_query,
                     course_language,
                     course_name,
                     exercise_title,
                     problem_statement,
-                )
-                hypothetical_answer_query_future = executor.submit(
-                    self.rewrite_elaborated_query_with_exercise_context,
+                ),
+                self.rewrite_elaborated_query_with_exercise_context(
                     chat_history,
                     student_query,
                     course_language,
                     course_name,
                     exercise_title,
                     problem_statement,
-                )
-
-                # Get the results once both tasks are complete
-                rewritten_query: str = rewritten_query_future.result()
-                hypothetical_answer_query: str = (
-                    hypothetical_answer_query_future.result()
-                )
+                ),
+            )
         else:
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                # Schedule the rewrite tasks to run in parallel
-                rewritten_query_future = executor.submit(
-                    self.rewrite_student_query,
+            rewritten_query, hypothetical_answer_query = await asyncio.gather(
+                self.rewrite_student_query(
                     chat_history,
                     student_query,
                     course_language,
                     course_name,
-                )
-                hypothetical_answer_query_future = executor.submit(
-                    self.rewrite_elaborated_query,
+                ),
+                self.rewrite_elaborated_query(
                     chat_history,
                     student_query,
                     course_language,
                     course_name,
-                )
-
-                # Get the results once both tasks are complete
-                rewritten_query = rewritten_query_future.result()
-                hypothetical_answer_query = hypothetical_answer_query_future.result()
-
-            # Execute the database search tasks
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            response_future = executor.submit(
-                self.search_in_db,
-                query=rewritten_query,
-                hybrid_factor=0.9,
-                result_limit=result_limit,
-                course_id=course_id,
-                base_url=base_url,
-            )
-            response_hyde_future = executor.submit(
-                self.search_in_db,
-                query=hypothetical_answer_query,
-                hybrid_factor=0.9,
-                result_limit=result_limit,
-                course_id=course_id,
-                base_url=base_url,
+                ),
             )
 
-            # Get the results once both tasks are complete
-            response = response_future.result()
-            response_hyde = response_hyde_future.result()
-
-        return response, response_hyde
+        vector, vector_hyde = await self.llm_embedding.aembed_batch(
+            [rewritten_query, hypothetical_answer_query]
+        )
+        return RewriteCacheEntry(
+            rewritten_query, hypothetical_answer_query, vector, vector_hyde
+        )
 
     def fetch_course_language(self, course_id):
         """
@@ -513,21 +641,10 @@ class LectureRetrieval(Pipeline):
         course_language = "english"
 
         if course_id:
-            # Fetch the first object that matches the course ID with the language property
-            result = self.collection.query.fetch_objects(
-                filters=Filter.by_property(LectureSchema.COURSE_ID.value).equal(
-                    course_id
-                ),
-                limit=1,  # We only need one object to check and retrieve the language
-                return_properties=[LectureSchema.COURSE_LANGUAGE.value],
+            fetched_language = (
+                CourseMetadataCache().get(self.collection, course_id).course_language
             )
-
-            # Check if the result has objects and retrieve the language
-            if result.objects:
-                fetched_language = result.objects[0].properties.get(
-                    LectureSchema.COURSE_LANGUAGE.value
-                )
-                if fetched_language:
-                    course_language = fetched_language
+            if fetched_language:
+                course_language = fetched_language
 
         return course_language
@@ -0,0 +1,46 @@
+from typing import List
+
+
+def reciprocal_rank_fusion(result_lists: List[List[dict]], k: int = 60) -> List[dict]:
+    """
+    Fuse ranked result lists with reciprocal rank fusion.
+    Each result is a dict with an "id", its "properties", optionally its stored "vector" and the "score" of the
+    search that returned it, the lists must be sorted by that score. A result gets 1 / (k + rank) from every list
+    it appears in, ties are broken by the best search score of the result. The fused results are returned in
+    descending order of their "fused_score".
+    """
+    fused: dict = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, start=1):
+            entry = fused.get(result["id"])
+            if entry is None:
+                entry = fused[result["id"]] = {
+                    "id": result["id"],
+                    "properties": result["properties"],
+                    "vector": result.get("vector"),
+                    "score": result.get("score") or 0.0,
+                    "fused_score": 0.0,
+                }
+            else:
+                entry["score"] = max(entry["score"], result.get("score") or 0.0)
+            entry["fused_score"] += 1 / (k + rank)
+    return sorted(
+        fused.values(),
+        key=lambda entry: (entry["fused_score"], entry["score"]),
+        reverse=True,
+    )
+
+
+def top_k_agreement(first: List[dict], second: List[dict], top_k: int) -> float:
+    """
+    Share of the top_k results of the first list that are also among the top_k results of the second list.
+    A high agreement means both searches found the same content, so the fused ranking can be trusted.
+    """
+    if top_k <= 0:
+        return 1.0
+    first_ids = {result["id"] for result in first[:top_k]}
+    second_ids = {result["id"] for result in second[:top_k]}
+    expected = min(top_k, len(first_ids), len(second_ids))
+    if expected == 0:
+        return 0.0
+    return len(first_ids & second_ids) / expected
@@ -0,0 +1,142 @@
+import hashlib
+import re
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import List, Optional
+
+from ..common import Singleton
+from ..common.pyris_message import PyrisMessage
+
+# Number of chat history messages the rewrite prompts see, older messages do not change the rewrite
+HISTORY_MESSAGES_IN_KEY = 4
+
+
+class RewriteCacheEntry:
+    """
+    The rewritten query, the hypothetical answer and their embeddings for one student query.
+    The embeddings are stored as float32 arrays to keep the memory footprint small.
+    """
+
+    def __init__(
+        self,
+        rewritten_query: str,
+        hypothetical_answer: str,
+        vector: list[float],
+        vector_hyde: list[float],
+    ):
+        self.rewritten_query = rewritten_query
+        self.hypothetical_answer = hypothetical_answer
+        self._vector = array("f", vector)
+        self._vector_hyde = array("f", vector_hyde)
+        self.created_at = time.monotonic()
+
+    @property
+    def vector(self) -> list[float]:
+        return self._vector.tolist()
+
+    @property
+    def vector_hyde(self) -> list[float]:
+        return self._vector_hyde.tolist()
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Lower case the text, collapse whitespace and drop trailing punctuation"""
+    if not text:
+        return ""
+    return re.sub(r"\s+", " ", text).strip().lower().rstrip("?!.")
+
+
+def rewrite_cache_key(
+    chat_history: List[PyrisMessage], student_query: str, *context: Optional[str]
+) -> str:
+    """
+    Build the cache key of a student query from the normalized query, the recent chat history and any further
+    context the rewrite prompts depend on, e.g. the course language or the exercise.
+    """
+    history = [
+        normalize_text(message.contents[0].text_content)
+        for message in (chat_history or [])[-HISTORY_MESSAGES_IN_KEY:]
+        if message.contents
+    ]
+    parts = [normalize_text(student_query), *history, *(str(c) for c in context)]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class RewriteCache(metaclass=Singleton):
+    """
+    Process-wide LRU cache for query rewrites and hypothetical answers across all courses.
+    Students of a course often ask nearly the same question, so retrieval can skip the LLM and embedding calls
+    and search the database right away. Entries expire after ttl_seconds, and a single course can hold at most
+    max_entries_per_course entries, so it cannot push out the entries of all other courses.
+    The rewrites do not depend on the ingested lectures and FAQs, so ingestion does not invalidate them.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_entries_per_course: int = 256,
+        ttl_seconds: float = 3600,
+    ):
+        self.max_entries = max_entries
+        self.max_entries_per_course = max_entries_per_course
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[tuple[Optional[int], str], RewriteCacheEntry] = (
+            OrderedDict()
+        )
+        self._course_sizes: dict[Optional[int], int] = {}
+        self._lock = threading.Lock()
+
+    def _remove(self, entry_key: tuple[Optional[int], str]):
+        del self._entries[entry_key]
+        course_id = entry_key[0]
+        self._course_sizes[course_id] -= 1
+        if not self._course_sizes[course_id]:
+            del self._course_sizes[course_id]
+
+    def _is_expired(self, entry: RewriteCacheEntry, now: float) -> bool:
+        return now - entry.created_at > self.ttl_seconds
+
+    def get(self, course_id: Optional[int], key: str) -> Optional[RewriteCacheEntry]:
+        with self._lock:
+            entry = self._entries.get((course_id, key))
+            if entry is None:
+                return None
+            if self._is_expired(entry, time.monotonic()):
+                self._remove((course_id, key))
+                return None
+            self._entries.move_to_end((course_id, key))
+            return entry
+
+    def put(self, course_id: Optional[int], key: str, entry: RewriteCacheEntry):
+        with self._lock:
+            now = time.monotonic()
+            for entry_key in [
+                entry_key
+                for entry_key, cached in self._entries.items()
+                if self._is_expired(cached, now)
+            ]:
+                self._remove(entry_key)
+
+            if (course_id, key) in self._entries:
+                self._remove((course_id, key))
+            self._entries[(course_id, key)] = entry
+            self._course_sizes[course_id] = self._course_sizes.get(course_id, 0) + 1
+
+            if self._course_sizes[course_id] > self.max_entries_per_course:
+                # The least recently used entry of the course
+                self._remove(
+                    next(
+                        entry_key
+                        for entry_key in self._entries
+                        if entry_key[0] == course_id
+                    )
+                )
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._course_sizes.clear()
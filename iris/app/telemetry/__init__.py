@@ -0,0 +1,9 @@
+from app.telemetry.metrics import Histogram, MetricsRegistry
+from app.telemetry.tracing import (
+    Span,
+    span,
+    span_iterator,
+    pipeline_context,
+    observe_stage,
+    with_current_context,
+)
@@ -0,0 +1,104 @@
+import bisect
+import math
+import threading
+from app.common.singleton import Singleton
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+class Histogram:
+    """
+    A histogram with labels in the style of the Prometheus client. Every combination of label values has its own
+    cumulative buckets, sum and count, which are rendered in the Prometheus text exposition format.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: list[str],
+        buckets: list[float],
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = list(label_names)
+        self.buckets = sorted(buckets) + [math.inf]
+        self._series: dict[tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Counts per bucket, sum and count
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = {
+                key: (list(counts), total, count)
+                for key, (counts, total, count) in self._series.items()
+            }
+        for key, (counts, total, count) in sorted(series.items()):
+            labels = [
+                f'{name}="{_escape(value)}"'
+                for name, value in zip(self.label_names, key)
+            ]
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                bucket_labels = ",".join(labels + [f'le="{_format_value(bound)}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            label_text = "{" + ",".join(labels) + "}" if labels else ""
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class MetricsRegistry(metaclass=Singleton):
+    """The metrics of the process, rendered by the /metrics endpoint"""
+
+    def __init__(self):
+        self._histograms: dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        label_names: list[str],
+        buckets: list[float],
+    ) -> Histogram:
+        """Return the histogram with the given name, creating it on first use"""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(
+                    name, documentation, label_names, buckets
+                )
+            return histogram
+
+    def render(self) -> str:
+        with self._lock:
+            histograms = list(self._histograms.values())
+        lines = []
+        for histogram in histograms:
+            lines.extend(histogram.render())
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,144 @@
+import contextvars
+import functools
+import logging
+import secrets
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from app.config import settings
+from app.telemetry.metrics import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+# The span that new spans are nested in and the pipeline and variant of the run, per thread and asyncio task
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+_current_pipeline: contextvars.ContextVar[tuple[str, str]] = contextvars.ContextVar(
+    "current_pipeline", default=("", "")
+)
+
+
+def span_duration_histogram():
+    return MetricsRegistry().histogram(
+        "iris_span_duration_seconds",
+        "Duration of LLM requests, Weaviate queries, status updates and pipeline runs",
+        ["kind", "name", "pipeline", "variant", "model", "status"],
+        settings.metrics.buckets,
+    )
+
+
+def stage_duration_histogram():
+    return MetricsRegistry().histogram(
+        "iris_pipeline_stage_duration_seconds",
+        "Duration of the stages reported to Artemis, from in progress to done, error or skipped",
+        ["pipeline", "variant", "stage", "status"],
+        settings.metrics.buckets,
+    )
+
+
+class Span:
+    """
+    A timed operation in the style of an OpenTelemetry span. Spans started while another span is current belong
+    to the same trace, so the log lines of a pipeline run can be grouped by the trace id.
+    When the span ends, its duration is observed in the span histogram by kind, name, pipeline, variant and model.
+    """
+
+    def __init__(self, kind: str, name: str, model: str = "", **attributes):
+        parent = _current_span.get()
+        self.kind = kind
+        self.name = name
+        self.model = model
+        self.attributes = attributes
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.parent_id = parent.span_id if parent else None
+        self.span_id = secrets.token_hex(8)
+        self.pipeline, self.variant = _current_pipeline.get()
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+
+    def end(self, status: str = "ok"):
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self.start
+        if settings.metrics.enabled:
+            span_duration_histogram().observe(
+                self.duration,
+                kind=self.kind,
+                name=self.name,
+                pipeline=self.pipeline,
+                variant=self.variant,
+                model=self.model,
+                status=status,
+            )
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                f"{self.kind} {self.name} took {self.duration * 1000:.1f} ms ({status}), "
+                f"trace={self.trace_id} span={self.span_id} parent={self.parent_id} "
+                f"pipeline={self.pipeline} variant={self.variant} model={self.model} {self.attributes}"
+            )
+
+
+@contextmanager
+def span(kind: str, name: str, model: str = "", **attributes):
+    """
+    Time the block as the current span, spans started within it are its children.
+    The status is "error" if the block raises.
+    """
+    current = Span(kind, name, model, **attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException:
+        current.end("error")
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+def span_iterator(
+    kind: str, name: str, iterator: Iterator, model: str = "", **attributes
+) -> Iterator:
+    """
+    Time the iteration as a span, e.g. of a streamed response. The span is not made current, as the consumer may
+    resume the iteration in another context. Stopping the iteration early is not an error.
+    """
+    current = Span(kind, name, model, **attributes)
+    status = "error"
+    try:
+        yield from iterator
+        status = "ok"
+    except GeneratorExit:
+        status = "ok"
+        raise
+    finally:
+        current.end(status)
+
+
+@contextmanager
+def pipeline_context(pipeline: str, variant: str = "default"):
+    """Label the spans and stages of the block with the pipeline and variant"""
+    token = _current_pipeline.set((pipeline, variant))
+    try:
+        yield
+    finally:
+        _current_pipeline.reset(token)
+
+
+def observe_stage(stage: str, status: str, duration: float):
+    if not settings.metrics.enabled:
+        return
+    pipeline, variant = _current_pipeline.get()
+    stage_duration_histogram().observe(
+        duration, pipeline=pipeline, variant=variant, stage=stage, status=status
+    )
+
+
+def with_current_context(fn: Callable) -> Callable:
+    """
+    Bind the function to a copy of the current context, so it keeps the current span and pipeline when it is
+    submitted to a thread pool. asyncio tasks and asyncio.to_thread copy the context on their own.
+    """
+    return functools.partial(contextvars.copy_context().run, fn)
@@ -0,0 +1,80 @@
+import threading
+import time
+from typing import Optional
+
+from weaviate.classes.query import Filter
+from weaviate.collections import Collection
+
+from app.common.singleton import Singleton
+from app.telemetry import span
+
+# The lecture and FAQ schemas use the same property names for the course
+COURSE_ID_PROPERTY = "course_id"
+COURSE_LANGUAGE_PROPERTY = "course_language"
+
+
+class CourseMetadata:
+    """What a collection holds for a course"""
+
+    def __init__(self, has_objects: bool, course_language: Optional[str]):
+        self.has_objects = has_objects
+        self.course_language = course_language
+        self.fetched_at = time.monotonic()
+
+
+class CourseMetadataCache(metaclass=Singleton):
+    """
+    Process-wide cache of whether a collection holds objects of a course and which language the course has.
+    Chat pipelines check both before every run, the cache answers these checks without a request to Weaviate.
+    The ingestion and deletion webhooks invalidate the entries of a course once they changed its data, the ttl
+    limits how long changes made by other instances can go unnoticed.
+    """
+
+    def __init__(self, ttl_seconds: float = 600):
+        self.ttl_seconds = ttl_seconds
+        self._entries: dict[tuple[str, int], CourseMetadata] = {}
+        # Incremented on every invalidation, so a fetch that overlaps an invalidation is not cached
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, collection: Collection, course_id: int) -> CourseMetadata:
+        """Return the metadata of the course in the collection, fetching it if it is not cached"""
+        key = (collection.name, course_id)
+        with self._lock:
+            metadata = self._entries.get(key)
+            generation = self._generation
+        if (
+            metadata is not None
+            and time.monotonic() - metadata.fetched_at <= self.ttl_seconds
+        ):
+            return metadata
+
+        # A single object tells both whether the course has objects and its language
+        with span("weaviate", f"{collection.name}.fetch_objects"):
+            result = collection.query.fetch_objects(
+                filters=Filter.by_property(COURSE_ID_PROPERTY).equal(course_id),
+                limit=1,
+                return_properties=[COURSE_LANGUAGE_PROPERTY],
+            )
+        if result.objects:
+            metadata = CourseMetadata(
+                True, result.objects[0].properties.get(COURSE_LANGUAGE_PROPERTY)
+            )
+        else:
+            metadata = CourseMetadata(False, None)
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = metadata
+        return metadata
+
+    def invalidate(self, course_id: int):
+        """Drop the cached metadata of the course in all collections"""
+        with self._lock:
+            self._generation += 1
+            for key in [key for key in self._entries if key[1] == course_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
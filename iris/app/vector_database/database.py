@@ -3,6 +3,7 @@ import weaviate
 
 from .faq_schema import init_faq_schema
 from .lecture_schema import init_lecture_schema
+from .schema_cache import invalidate_schema_cache
 from weaviate.classes.query import Filter
 from app.config import settings
 import threading
@@ -19,6 +20,7 @@ class VectorDatabase:
     _client_instance = None
 
     def __init__(self):
+        # The schemas are only verified for the first instance, later instances reuse the cached collections
         with VectorDatabase._lock:
             if not VectorDatabase._client_instance:
                 VectorDatabase._client_instance = weaviate.connect_to_local(
@@ -38,6 +40,7 @@ class VectorDatabase:
         if self.client.collections.exists(collection_name):
             if self.client.collections.delete(collection_name):
                 logger.info(f"Collection {collection_name} deleted")
+                invalidate_schema_cache(self.client)
             else:
                 logger.error(f"Collection {collection_name} failed to delete")
 
@@ -5,6 +5,8 @@ from weaviate import WeaviateClient
 from weaviate.collections import Collection
 from weaviate.collections.classes.config import Configure, VectorDistances, DataType
 
+from .schema_cache import initialize_once
+
 
 class FaqSchema(Enum):
     """
@@ -21,6 +23,7 @@ class FaqSchema(Enum):
     QUESTION_ANSWER = "question_answer"
 
 
+@initialize_once
 def init_faq_schema(client: WeaviateClient) -> Collection:
     """
     Initialize the schema for the faqs
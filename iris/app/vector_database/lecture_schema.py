@@ -5,6 +5,8 @@ from weaviate import WeaviateClient
 from weaviate.collections import Collection
 from weaviate.collections.classes.config import Configure, VectorDistances, DataType
 
+from .schema_cache import initialize_once
+
 
 class LectureSchema(Enum):
     """
@@ -23,9 +25,11 @@ class LectureSchema(Enum):
     LECTURE_UNIT_LINK = "lecture_unit_link"
     PAGE_TEXT_CONTENT = "page_text_content"
     PAGE_NUMBER = "page_number"
+    PAGE_FINGERPRINT = "page_fingerprint"
     BASE_URL = "base_url"
 
 
+@initialize_once
 def init_lecture_schema(client: WeaviateClient) -> Collection:
     """
     Initialize the schema for the lecture slides
@@ -62,6 +66,20 @@ def init_lecture_schema(client: WeaviateClient) -> Collection:
                 )
             )
 
+        # Check and add 'page_fingerprint' property if missing
+        if not any(
+            property.name == LectureSchema.PAGE_FINGERPRINT.value
+            for property in properties
+        ):
+            collection.config.add_property(
+                Property(
+                    name=LectureSchema.PAGE_FINGERPRINT.value,
+                    description="The fingerprint of the text and image content of the slide",
+                    data_type=DataType.TEXT,
+                    index_searchable=False,
+                )
+            )
+
         return collection
 
     return client.collections.create(
@@ -135,6 +153,12 @@ def init_lecture_schema(client: WeaviateClient) -> Collection:
                 data_type=DataType.INT,
                 index_searchable=False,
             ),
+            Property(
+                name=LectureSchema.PAGE_FINGERPRINT.value,
+                description="The fingerprint of the text and image content of the slide",
+                data_type=DataType.TEXT,
+                index_searchable=False,
+            ),
             Property(
                 name=LectureSchema.BASE_URL.value,
                 description="The base url of the website where the lecture slides are hosted",
@@ -0,0 +1,49 @@
+import functools
+import logging
+import threading
+import weakref
+from typing import Callable
+
+from weaviate import WeaviateClient
+from weaviate.collections import Collection
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+# Collection handles per client and schema, the entries of a client are dropped together with the client
+_collections: "weakref.WeakKeyDictionary[WeaviateClient, dict[str, Collection]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def initialize_once(init_schema: Callable[[WeaviateClient], Collection]):
+    """
+    Run the decorated schema initialization only once per client and return the cached collection handle afterwards.
+    Checking and migrating a schema takes several requests to Weaviate, which is too costly to repeat for every
+    pipeline and retriever that is created.
+    """
+
+    @functools.wraps(init_schema)
+    def wrapper(client: WeaviateClient) -> Collection:
+        with _lock:
+            collections = _collections.setdefault(client, {})
+            collection = collections.get(init_schema.__name__)
+            if collection is None:
+                collection = init_schema(client)
+                collections[init_schema.__name__] = collection
+                logger.info(f"Schema verified by {init_schema.__name__}")
+            return collection
+
+    return wrapper
+
+
+def invalidate_schema_cache(client: WeaviateClient | None = None):
+    """
+    Forget the cached collection handles of the given client, or of all clients if none is given.
+    The schemas are verified again the next time they are initialized, e.g. after a collection was deleted.
+    """
+    with _lock:
+        if client is None:
+            _collections.clear()
+        else:
+            _collections.pop(client, None)
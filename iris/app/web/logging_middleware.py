@@ -0,0 +1,92 @@
+import logging
+import random
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+
+class _BodyPreview:
+    """Counts the bytes of a streamed body and keeps its first max_bytes"""
+
+    def __init__(self, max_bytes: int, keep: bool):
+        self.max_bytes = max_bytes if keep else 0
+        self.size = 0
+        self.head = bytearray()
+
+    def add(self, chunk: bytes):
+        self.size += len(chunk)
+        missing = self.max_bytes - len(self.head)
+        if missing > 0:
+            self.head += chunk[:missing]
+
+    def read_size_from(self, headers: list[tuple[bytes, bytes]]):
+        """Take the size from the content-length header, for bodies that are never read by the app"""
+        for name, value in headers:
+            if name == b"content-length" and value.isdigit():
+                self.size = max(self.size, int(value))
+
+    def __str__(self):
+        if not self.max_bytes:
+            return f"<{self.size} bytes>"
+        text = self.head.decode("utf-8", errors="replace")
+        if self.size > len(self.head):
+            return f"<{self.size} bytes> {text}..."
+        return f"<{self.size} bytes> {text}"
+
+
+class RequestLoggingMiddleware:
+    """
+    Logs the request and response of every HTTP call with the size and a truncated preview of the bodies.
+    The bodies are passed through as they are received and sent, only the preview is kept in memory. Bodies are
+    only previewed for a sample of the requests and never for the excluded path prefixes.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_body_bytes: int = 2048,
+        sample_rate: float = 1.0,
+        excluded_paths: list[str] = None,
+    ):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+        self.sample_rate = sample_rate
+        self.excluded_paths = tuple(excluded_paths or [])
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        log_bodies = (
+            not path.startswith(self.excluded_paths)
+            and random.random() < self.sample_rate
+        )
+        request_body = _BodyPreview(self.max_body_bytes, log_bodies)
+        response_body = _BodyPreview(self.max_body_bytes, log_bodies)
+        status_code = None
+
+        async def receive_and_count() -> Message:
+            message = await receive()
+            if message["type"] == "http.request":
+                request_body.add(message.get("body", b""))
+            return message
+
+        async def count_and_send(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_body.add(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_and_count, count_and_send)
+        finally:
+            request_body.read_size_from(scope.get("headers", []))
+            logger.info(
+                f"{scope['method']} {path} {status_code} "
+                f"request: {request_body} response: {response_body}"
+            )
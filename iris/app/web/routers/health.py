@@ -1,5 +1,6 @@
 from fastapi import APIRouter, status, Response, Depends
 
+from app.common.scheduler import PipelineScheduler
 from app.dependencies import TokenValidator
 
 router = APIRouter(prefix="/api/v1/health", tags=["health"])
@@ -13,3 +14,14 @@ def health_check():
     return Response(
         status_code=status.HTTP_200_OK, content=b"[]", media_type="application/json"
     )
+
+
+@router.get(
+    "/scheduler",
+    dependencies=[Depends(TokenValidator())],
+)
+def scheduler_stats():
+    """
+    Get the queue depth, active workers and wait times of the pipeline worker pools.
+    """
+    return PipelineScheduler().stats()
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from app.dependencies import TokenValidator
+from app.telemetry import MetricsRegistry
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get(
+    "/metrics",
+    dependencies=[Depends(TokenValidator())],
+    response_class=PlainTextResponse,
+)
+def metrics():
+    """
+    Get the span and stage duration histograms in the Prometheus text format.
+    """
+    return PlainTextResponse(
+        MetricsRegistry().render(), media_type="text/plain; version=0.0.4"
+    )
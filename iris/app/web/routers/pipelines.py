@@ -1,11 +1,12 @@
 import logging
 import traceback
-from threading import Thread
 
 from sentry_sdk import capture_exception
 
 from fastapi import APIRouter, status, Response, Depends, Body, Query
 
+from app.common.scheduler import Priority, submit_pipeline
+from app.config import settings
 from app.domain import (
     ExerciseChatPipelineExecutionDTO,
     CourseChatPipelineExecutionDTO,
@@ -18,6 +19,7 @@ from app.domain.chat.lecture_chat.lecture_chat_pipeline_execution_dto import (
     LectureChatPipelineExecutionDTO,
 )
 from app.pipeline.chat.lecture_chat_pipeline import LectureChatPipeline
+from app.pipeline.pipeline_pool import PipelinePool
 from app.pipeline.rewriting_pipeline import RewritingPipeline
 from app.web.status.status_update import (
     ExerciseChatStatusCallback,
@@ -43,19 +45,25 @@ from app.pipeline.chat_gpt_wrapper_pipeline import ChatGPTWrapperPipeline
 router = APIRouter(prefix="/api/v1/pipelines", tags=["pipelines"])
 logger = logging.getLogger(__name__)
 
+# One idle instance per chat worker is enough, as each worker runs one pipeline at a time
+exercise_chat_pipeline_pool = PipelinePool(
+    ExerciseChatAgentPipeline,
+    max_idle=(
+        settings.scheduler.pools["chat"].workers
+        if "chat" in settings.scheduler.pools
+        else 16
+    ),
+)
+
 
 def run_exercise_chat_pipeline_worker(
-    dto: ExerciseChatPipelineExecutionDTO, variant: str, event: str | None = None
+    dto: ExerciseChatPipelineExecutionDTO,
+    variant: str,
+    event: str | None,
+    callback: ExerciseChatStatusCallback,
 ):
     try:
-        callback = ExerciseChatStatusCallback(
-            run_id=dto.settings.authentication_token,
-            base_url=dto.settings.artemis_base_url,
-            initial_stages=dto.initial_stages,
-        )
-        pipeline = ExerciseChatAgentPipeline(
-            callback=callback, variant=variant, event=event
-        )
+        pipeline = exercise_chat_pipeline_pool.get()
     except Exception as e:
         logger.error(f"Error preparing exercise chat pipeline: {e}")
         logger.error(traceback.format_exc())
@@ -63,22 +71,21 @@ def run_exercise_chat_pipeline_worker(
         return
 
     try:
-        pipeline(dto=dto)
+        pipeline(dto=dto, callback=callback, variant=variant, event=event)
     except Exception as e:
         logger.error(f"Error running exercise chat pipeline: {e}")
         logger.error(traceback.format_exc())
         callback.error("Fatal error.", exception=e)
+    finally:
+        exercise_chat_pipeline_pool.release(pipeline)
 
 
 def run_chatgpt_wrapper_pipeline_worker(
-    dto: ExerciseChatPipelineExecutionDTO, _variant: str
+    dto: ExerciseChatPipelineExecutionDTO,
+    _variant: str,
+    callback: ChatGPTWrapperStatusCallback,
 ):
     try:
-        callback = ChatGPTWrapperStatusCallback(
-            run_id=dto.settings.authentication_token,
-            base_url=dto.settings.artemis_base_url,
-            initial_stages=dto.initial_stages,
-        )
         pipeline = ChatGPTWrapperPipeline(callback=callback)
     except Exception as e:
         logger.error(f"Error preparing ChatGPT wrapper pipeline: {e}")
@@ -108,21 +115,40 @@ def run_exercise_chat_pipeline(
     ),
 ):
     if variant == "chat-gpt-wrapper":
-        thread = Thread(target=run_chatgpt_wrapper_pipeline_worker, args=(dto, variant))
-    else:
-        thread = Thread(
-            target=run_exercise_chat_pipeline_worker, args=(dto, variant, event)
+        callback = ChatGPTWrapperStatusCallback(
+            run_id=dto.settings.authentication_token,
+            base_url=dto.settings.artemis_base_url,
+            initial_stages=dto.initial_stages,
         )
-    thread.start()
-
-
-def run_course_chat_pipeline_worker(dto, variant, event):
-    try:
-        callback = CourseChatStatusCallback(
+        submit_pipeline(
+            "chat",
+            run_chatgpt_wrapper_pipeline_worker,
+            callback,
+            dto,
+            variant,
+            priority=Priority.INTERACTIVE,
+            variant=variant,
+        )
+    else:
+        callback = ExerciseChatStatusCallback(
             run_id=dto.settings.authentication_token,
             base_url=dto.settings.artemis_base_url,
             initial_stages=dto.initial_stages,
         )
+        submit_pipeline(
+            "chat",
+            run_exercise_chat_pipeline_worker,
+            callback,
+            dto,
+            variant,
+            event,
+            priority=Priority.INTERACTIVE,
+            variant=variant,
+        )
+
+
+def run_course_chat_pipeline_worker(dto, variant, event, callback):
+    try:
         pipeline = CourseChatPipeline(callback=callback, variant=variant, event=event)
     except Exception as e:
         logger.error(f"Error preparing exercise chat pipeline: {e}")
@@ -150,17 +176,25 @@ def run_course_chat_pipeline(
         description="Course Chat Pipeline Execution DTO"
     ),
 ):
-    thread = Thread(target=run_course_chat_pipeline_worker, args=(dto, variant, event))
-    thread.start()
+    callback = CourseChatStatusCallback(
+        run_id=dto.settings.authentication_token,
+        base_url=dto.settings.artemis_base_url,
+        initial_stages=dto.initial_stages,
+    )
+    submit_pipeline(
+        "chat",
+        run_course_chat_pipeline_worker,
+        callback,
+        dto,
+        variant,
+        event,
+        priority=Priority.INTERACTIVE,
+        variant=variant,
+    )
 
 
-def run_text_exercise_chat_pipeline_worker(dto, variant):
+def run_text_exercise_chat_pipeline_worker(dto, variant, callback):
     try:
-        callback = TextExerciseChatCallback(
-            run_id=dto.execution.settings.authentication_token,
-            base_url=dto.execution.settings.artemis_base_url,
-            initial_stages=dto.execution.initial_stages,
-        )
         match variant:
             case "default" | "text_exercise_chat_pipeline_reference_impl":
                 pipeline = TextExerciseChatPipeline(callback=callback)
@@ -180,13 +214,8 @@ def run_text_exercise_chat_pipeline_worker(dto, variant):
         callback.error("Fatal error.", exception=e)
 
 
-def run_lecture_chat_pipeline_worker(dto, variant):
+def run_lecture_chat_pipeline_worker(dto, variant, callback):
     try:
-        callback = LectureChatCallback(
-            run_id=dto.settings.authentication_token,
-            base_url=dto.settings.artemis_base_url,
-            initial_stages=dto.initial_stages,
-        )
         match variant:
             case "default" | "lecture_chat_pipeline_reference_impl":
                 pipeline = LectureChatPipeline(
@@ -216,8 +245,20 @@ def run_lecture_chat_pipeline_worker(dto, variant):
 def run_text_exercise_chat_pipeline(
     variant: str, dto: TextExerciseChatPipelineExecutionDTO
 ):
-    thread = Thread(target=run_text_exercise_chat_pipeline_worker, args=(dto, variant))
-    thread.start()
+    callback = TextExerciseChatCallback(
+        run_id=dto.execution.settings.authentication_token,
+        base_url=dto.execution.settings.artemis_base_url,
+        initial_stages=dto.execution.initial_stages,
+    )
+    submit_pipeline(
+        "chat",
+        run_text_exercise_chat_pipeline_worker,
+        callback,
+        dto,
+        variant,
+        priority=Priority.INTERACTIVE,
+        variant=variant,
+    )
 
 
 @router.post(
@@ -226,19 +267,28 @@ def run_text_exercise_chat_pipeline(
     dependencies=[Depends(TokenValidator())],
 )
 def run_lecture_chat_pipeline(variant: str, dto: LectureChatPipelineExecutionDTO):
-    thread = Thread(target=run_lecture_chat_pipeline_worker, args=(dto, variant))
-    thread.start()
+    callback = LectureChatCallback(
+        run_id=dto.settings.authentication_token,
+        base_url=dto.settings.artemis_base_url,
+        initial_stages=dto.initial_stages,
+    )
+    submit_pipeline(
+        "chat",
+        run_lecture_chat_pipeline_worker,
+        callback,
+        dto,
+        variant,
+        priority=Priority.INTERACTIVE,
+        variant=variant,
+    )
 
 
 def run_competency_extraction_pipeline_worker(
-    dto: CompetencyExtractionPipelineExecutionDTO, _variant: str
+    dto: CompetencyExtractionPipelineExecutionDTO,
+    _variant: str,
+    callback: CompetencyExtractionCallback,
 ):
     try:
-        callback = CompetencyExtractionCallback(
-            run_id=dto.execution.settings.authentication_token,
-            base_url=dto.execution.settings.artemis_base_url,
-            initial_stages=dto.execution.initial_stages,
-        )
         pipeline = CompetencyExtractionPipeline(callback=callback)
     except Exception as e:
         logger.error(f"Error preparing competency extraction pipeline: {e}")
@@ -262,19 +312,26 @@ def run_competency_extraction_pipeline_worker(
 def run_competency_extraction_pipeline(
     variant: str, dto: CompetencyExtractionPipelineExecutionDTO
 ):
-    thread = Thread(
-        target=run_competency_extraction_pipeline_worker, args=(dto, variant)
+    callback = CompetencyExtractionCallback(
+        run_id=dto.execution.settings.authentication_token,
+        base_url=dto.execution.settings.artemis_base_url,
+        initial_stages=dto.execution.initial_stages,
+    )
+    submit_pipeline(
+        "default",
+        run_competency_extraction_pipeline_worker,
+        callback,
+        dto,
+        variant,
+        priority=Priority.DEFAULT,
+        variant=variant,
     )
-    thread.start()
 
 
-def run_rewriting_pipeline_worker(dto: RewritingPipelineExecutionDTO, variant: str):
+def run_rewriting_pipeline_worker(
+    dto: RewritingPipelineExecutionDTO, variant: str, callback: RewritingCallback
+):
     try:
-        callback = RewritingCallback(
-            run_id=dto.execution.settings.authentication_token,
-            base_url=dto.execution.settings.artemis_base_url,
-            initial_stages=dto.execution.initial_stages,
-        )
         match variant:
             case "faq" | "problem_statement":
                 pipeline = RewritingPipeline(callback=callback, variant=variant)
@@ -302,19 +359,29 @@ def run_rewriting_pipeline_worker(dto: RewritingPipelineExecutionDTO, variant: s
 def run_rewriting_pipeline(variant: str, dto: RewritingPipelineExecutionDTO):
     variant = variant.lower()
     logger.info(f"Rewriting pipeline started with variant: {variant} and dto: {dto}")
-    thread = Thread(target=run_rewriting_pipeline_worker, args=(dto, variant))
-    thread.start()
+    callback = RewritingCallback(
+        run_id=dto.execution.settings.authentication_token,
+        base_url=dto.execution.settings.artemis_base_url,
+        initial_stages=dto.execution.initial_stages,
+    )
+    # Rewriting is triggered from the editor while the user waits for the result
+    submit_pipeline(
+        "default",
+        run_rewriting_pipeline_worker,
+        callback,
+        dto,
+        variant,
+        priority=Priority.INTERACTIVE,
+        variant=variant,
+    )
 
 
 def run_inconsistency_check_pipeline_worker(
-    dto: InconsistencyCheckPipelineExecutionDTO, _variant: str
+    dto: InconsistencyCheckPipelineExecutionDTO,
+    _variant: str,
+    callback: InconsistencyCheckCallback,
 ):
     try:
-        callback = InconsistencyCheckCallback(
-            run_id=dto.execution.settings.authentication_token,
-            base_url=dto.execution.settings.artemis_base_url,
-            initial_stages=dto.execution.initial_stages,
-        )
         pipeline = InconsistencyCheckPipeline(callback=callback)
     except Exception as e:
         logger.error(f"Error preparing inconsistency check pipeline: {e}")
@@ -335,8 +402,20 @@ def run_inconsistency_check_pipeline_worker(
 def run_inconsistency_check_pipeline(
     variant: str, dto: InconsistencyCheckPipelineExecutionDTO
 ):
-    thread = Thread(target=run_inconsistency_check_pipeline_worker, args=(dto, variant))
-    thread.start()
+    callback = InconsistencyCheckCallback(
+        run_id=dto.execution.settings.authentication_token,
+        base_url=dto.execution.settings.artemis_base_url,
+        initial_stages=dto.execution.initial_stages,
+    )
+    submit_pipeline(
+        "default",
+        run_inconsistency_check_pipeline_worker,
+        callback,
+        dto,
+        variant,
+        priority=Priority.DEFAULT,
+        variant=variant,
+    )
 
 
 @router.get("/{feature}/variants")
@@ -1,10 +1,10 @@
 import traceback
 from asyncio.log import logger
-from threading import Thread, Semaphore
 
 from sentry_sdk import capture_exception
 
 from fastapi import APIRouter, status, Depends
+from app.common.scheduler import Priority, submit_pipeline
 from app.dependencies import TokenValidator
 from app.domain.ingestion.ingestion_pipeline_execution_dto import (
     IngestionPipelineExecutionDto,
@@ -19,50 +19,39 @@ from ...domain.ingestion.deletionPipelineExecutionDto import (
 )
 from ...pipeline.faq_ingestion_pipeline import FaqIngestionPipeline
 from ...pipeline.lecture_ingestion_pipeline import LectureIngestionPipeline
+from ...vector_database.course_metadata_cache import CourseMetadataCache
 from ...vector_database.database import VectorDatabase
 
 router = APIRouter(prefix="/api/v1/webhooks", tags=["webhooks"])
 
-semaphore = Semaphore(5)
 
-
-def run_lecture_update_pipeline_worker(dto: IngestionPipelineExecutionDto):
+def run_lecture_update_pipeline_worker(
+    dto: IngestionPipelineExecutionDto, callback: IngestionStatusCallback
+):
     """
     Run the exercise chat pipeline in a separate thread
     """
-    with semaphore:
-        try:
-            callback = IngestionStatusCallback(
-                run_id=dto.settings.authentication_token,
-                base_url=dto.settings.artemis_base_url,
-                initial_stages=dto.initial_stages,
-                lecture_unit_id=dto.lecture_unit.lecture_unit_id,
-            )
-            db = VectorDatabase()
-            client = db.get_client()
-            pipeline = LectureIngestionPipeline(
-                client=client, dto=dto, callback=callback
-            )
-            pipeline()
-
-        except Exception as e:
-            logger.error(f"Error Ingestion pipeline: {e}")
-            logger.error(traceback.format_exc())
-            capture_exception(e)
-        finally:
-            semaphore.release()
-
-
-def run_lecture_deletion_pipeline_worker(dto: LecturesDeletionExecutionDto):
+    try:
+        db = VectorDatabase()
+        client = db.get_client()
+        pipeline = LectureIngestionPipeline(client=client, dto=dto, callback=callback)
+        pipeline()
+
+    except Exception as e:
+        logger.error(f"Error Ingestion pipeline: {e}")
+        logger.error(traceback.format_exc())
+        capture_exception(e)
+    finally:
+        CourseMetadataCache().invalidate(dto.lecture_unit.course_id)
+
+
+def run_lecture_deletion_pipeline_worker(
+    dto: LecturesDeletionExecutionDto, callback: LecturesDeletionStatusCallback
+):
     """
     Run the exercise chat pipeline in a separate thread
     """
     try:
-        callback = LecturesDeletionStatusCallback(
-            run_id=dto.settings.authentication_token,
-            base_url=dto.settings.artemis_base_url,
-            initial_stages=dto.initial_stages,
-        )
         db = VectorDatabase()
         client = db.get_client()
         pipeline = LectureIngestionPipeline(client=client, dto=None, callback=callback)
@@ -70,57 +59,50 @@ def run_lecture_deletion_pipeline_worker(dto: LecturesDeletionExecutionDto):
     except Exception as e:
         logger.error(f"Error while deleting lectures: {e}")
         logger.error(traceback.format_exc())
+    finally:
+        for course_id in {lecture_unit.course_id for lecture_unit in dto.lecture_units}:
+            CourseMetadataCache().invalidate(course_id)
 
 
-def run_faq_update_pipeline_worker(dto: FaqIngestionPipelineExecutionDto):
+def run_faq_update_pipeline_worker(
+    dto: FaqIngestionPipelineExecutionDto, callback: FaqIngestionStatus
+):
     """
     Run the exercise chat pipeline in a separate thread
     """
-    with semaphore:
-        try:
-            callback = FaqIngestionStatus(
-                run_id=dto.settings.authentication_token,
-                base_url=dto.settings.artemis_base_url,
-                initial_stages=dto.initial_stages,
-                faq_id=dto.faq.faq_id,
-            )
-            db = VectorDatabase()
-            client = db.get_client()
-            pipeline = FaqIngestionPipeline(client=client, dto=dto, callback=callback)
-            pipeline()
-
-        except Exception as e:
-            logger.error(f"Error Faq Ingestion pipeline: {e}")
-            logger.error(traceback.format_exc())
-            capture_exception(e)
-        finally:
-            semaphore.release()
-
-
-def run_faq_delete_pipeline_worker(dto: FaqDeletionExecutionDto):
+    try:
+        db = VectorDatabase()
+        client = db.get_client()
+        pipeline = FaqIngestionPipeline(client=client, dto=dto, callback=callback)
+        pipeline()
+
+    except Exception as e:
+        logger.error(f"Error Faq Ingestion pipeline: {e}")
+        logger.error(traceback.format_exc())
+        capture_exception(e)
+    finally:
+        CourseMetadataCache().invalidate(dto.faq.course_id)
+
+
+def run_faq_delete_pipeline_worker(
+    dto: FaqDeletionExecutionDto, callback: FaqIngestionStatus
+):
     """
     Run the faq deletion in a separate thread
     """
-    with semaphore:
-        try:
-            callback = FaqIngestionStatus(
-                run_id=dto.settings.authentication_token,
-                base_url=dto.settings.artemis_base_url,
-                initial_stages=dto.initial_stages,
-                faq_id=dto.faq.faq_id,
-            )
-            db = VectorDatabase()
-            client = db.get_client()
-            # Hier würd dann die Methode zum entfernen aus der Datenbank kommen
-            pipeline = FaqIngestionPipeline(client=client, dto=None, callback=callback)
-            pipeline.delete_faq(dto.faq.faq_id, dto.faq.course_id)
-
-        except Exception as e:
-            logger.error(f"Error Ingestion pipeline: {e}")
-            logger.error(traceback.format_exc())
-            capture_exception(e)
-        finally:
-            semaphore.release()
+    try:
+        db = VectorDatabase()
+        client = db.get_client()
+        # Hier würd dann die Methode zum entfernen aus der Datenbank kommen
+        pipeline = FaqIngestionPipeline(client=client, dto=None, callback=callback)
+        pipeline.delete_faq(dto.faq.faq_id, dto.faq.course_id)
+
+    except Exception as e:
+        logger.error(f"Error Ingestion pipeline: {e}")
+        logger.error(traceback.format_exc())
+        capture_exception(e)
+    finally:
+        CourseMetadataCache().invalidate(dto.faq.course_id)
 
 
 @router.post(
@@ -132,8 +114,19 @@ def lecture_ingestion_webhook(dto: IngestionPipelineExecutionDto):
     """
     Webhook endpoint to trigger the exercise chat pipeline
     """
-    thread = Thread(target=run_lecture_update_pipeline_worker, args=(dto,))
-    thread.start()
+    callback = IngestionStatusCallback(
+        run_id=dto.settings.authentication_token,
+        base_url=dto.settings.artemis_base_url,
+        initial_stages=dto.initial_stages,
+        lecture_unit_id=dto.lecture_unit.lecture_unit_id,
+    )
+    submit_pipeline(
+        "ingestion",
+        run_lecture_update_pipeline_worker,
+        callback,
+        dto,
+        priority=Priority.BACKGROUND,
+    )
 
 
 @router.post(
@@ -145,8 +138,19 @@ def lecture_deletion_webhook(dto: LecturesDeletionExecutionDto):
     """
     Webhook endpoint to trigger the lecture deletion
     """
-    thread = Thread(target=run_lecture_deletion_pipeline_worker, args=(dto,))
-    thread.start()
+    callback = LecturesDeletionStatusCallback(
+        run_id=dto.settings.authentication_token,
+        base_url=dto.settings.artemis_base_url,
+        initial_stages=dto.initial_stages,
+    )
+    # Deletions are cheap, so they are not queued behind slide interpretations
+    submit_pipeline(
+        "ingestion",
+        run_lecture_deletion_pipeline_worker,
+        callback,
+        dto,
+        priority=Priority.DEFAULT,
+    )
 
 
 @router.post(
@@ -158,8 +162,19 @@ def faq_ingestion_webhook(dto: FaqIngestionPipelineExecutionDto):
     """
     Webhook endpoint to trigger the faq ingestion pipeline
     """
-    thread = Thread(target=run_faq_update_pipeline_worker, args=(dto,))
-    thread.start()
+    callback = FaqIngestionStatus(
+        run_id=dto.settings.authentication_token,
+        base_url=dto.settings.artemis_base_url,
+        initial_stages=dto.initial_stages,
+        faq_id=dto.faq.faq_id,
+    )
+    submit_pipeline(
+        "ingestion",
+        run_faq_update_pipeline_worker,
+        callback,
+        dto,
+        priority=Priority.BACKGROUND,
+    )
     return
 
 
@@ -172,6 +187,17 @@ def faq_deletion_webhook(dto: FaqDeletionExecutionDto):
     """
     Webhook endpoint to trigger the faq deletion pipeline
     """
-    thread = Thread(target=run_faq_delete_pipeline_worker, args=(dto,))
-    thread.start()
+    callback = FaqIngestionStatus(
+        run_id=dto.settings.authentication_token,
+        base_url=dto.settings.artemis_base_url,
+        initial_stages=dto.initial_stages,
+        faq_id=dto.faq.faq_id,
+    )
+    submit_pipeline(
+        "ingestion",
+        run_faq_delete_pipeline_worker,
+        callback,
+        dto,
+        priority=Priority.DEFAULT,
+    )
     return
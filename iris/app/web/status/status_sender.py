@@ -0,0 +1,105 @@
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from sentry_sdk import capture_exception
+
+from app.common.singleton import Singleton
+
+logger = logging.getLogger(__name__)
+
+
+class _StatusUpdate:
+    def __init__(self, run_id: str, payload: dict, final: bool):
+        self.run_id = run_id
+        self.payload = payload
+        self.final = final
+
+
+class _RunUpdates:
+    """The updates of one status url that are not sent yet"""
+
+    def __init__(self):
+        self.pending: deque[_StatusUpdate] = deque()
+        self.sending = False
+
+
+class StatusUpdateSender(metaclass=Singleton):
+    """
+    Sends status updates to Artemis in the background, so pipelines do not wait for the requests.
+    The updates of a run are sent one after another in the order they were queued. A queued intermediate update is
+    replaced by a newer update of the same run, as every update contains the complete status. Final updates, i.e.
+    stage transitions and errors, are always sent.
+    Connections are pooled per Artemis instance.
+    """
+
+    def __init__(self, workers: int = 8, timeout: float = 30):
+        self.workers = workers
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="status-sender"
+        )
+        self._sessions: dict[str, requests.Session] = {}
+        self._runs: dict[str, _RunUpdates] = {}
+        self._lock = threading.Lock()
+
+    def send(self, url: str, run_id: str, payload: dict, final: bool = True):
+        """Queue the status update for the given url"""
+        update = _StatusUpdate(run_id, payload, final)
+        with self._lock:
+            run = self._runs.get(url)
+            if run is None:
+                run = self._runs[url] = _RunUpdates()
+            if run.pending and not run.pending[-1].final:
+                # Superseded by the newer update
+                run.pending.pop()
+            run.pending.append(update)
+            if run.sending:
+                return
+            run.sending = True
+        self._executor.submit(self._send_pending, url, run)
+
+    def _send_pending(self, url: str, run: _RunUpdates):
+        while True:
+            with self._lock:
+                if not run.pending:
+                    run.sending = False
+                    del self._runs[url]
+                    return
+                update = run.pending.popleft()
+            self._post(url, update)
+
+    def _post(self, url: str, update: _StatusUpdate):
+        try:
+            self._get_session(url).post(
+                url,
+                headers={
+                    "Content-Type": "application/json",
+                    "Authorization": f"Bearer {update.run_id}",
+                },
+                json=update.payload,
+                timeout=self.timeout,
+            ).raise_for_status()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error sending status update: {e}")
+            capture_exception(e)
+        except Exception as e:
+            # The worker thread must keep sending the remaining updates of the run
+            logger.exception(f"Unexpected error sending status update: {e}")
+            capture_exception(e)
+
+    def _get_session(self, url: str) -> requests.Session:
+        parts = urlsplit(url)
+        base_url = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            session = self._sessions.get(base_url)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_maxsize=self.workers)
+                session.mount(f"{parts.scheme}://", adapter)
+                self._sessions[base_url] = session
+            return session
@@ -1,9 +1,9 @@
-from typing import Optional, List
+import time
+from typing import Iterable, Optional, List
 
 
 from sentry_sdk import capture_exception, capture_message
 
-import requests
 from abc import ABC
 
 from app.common.token_usage_dto import TokenUsageDTO
@@ -29,6 +29,8 @@ from app.domain.chat.exercise_chat.exercise_chat_status_update_dto import (
     ExerciseChatStatusUpdateDTO,
 )
 from app.domain.status.status_update_dto import StatusUpdateDTO
+from app.telemetry import observe_stage, span
+from app.web.status.status_sender import StatusUpdateSender
 import logging
 
 logger = logging.getLogger(__name__)
@@ -44,6 +46,8 @@ class StatusCallback(ABC):
     status: StatusUpdateDTO
     stage: StageDTO
     current_stage_index: Optional[int]
+    # Minimum time in seconds between two updates with a partial result
+    partial_result_interval: float = 0.5
 
     def __init__(
         self,
@@ -58,22 +62,80 @@ class StatusCallback(ABC):
         self.status = status
         self.stage = stage
         self.current_stage_index = current_stage_index
+        # Start times of the stages in progress by index, for the stage duration histogram
+        self._stage_start_times: dict[int, float] = {}
+        # Time of the last update with a partial result of the response that is generated
+        self._last_partial_update: Optional[float] = None
+
+    def _update(self, final: bool = True):
+        """Record the durations of the stages that ended since the last update and send the status"""
+        now = time.perf_counter()
+        for index, stage in enumerate(self.status.stages):
+            if stage.state == StageStateEnum.IN_PROGRESS:
+                self._stage_start_times.setdefault(index, now)
+            elif (
+                index in self._stage_start_times
+                and stage.state != StageStateEnum.NOT_STARTED
+            ):
+                observe_stage(
+                    stage.name,
+                    stage.state.value.lower(),
+                    now - self._stage_start_times.pop(index),
+                )
+        with span("status_update", type(self).__name__):
+            self.on_status_update(final=final)
+
+    def on_status_update(self, final: bool = True):
+        """
+        Send a status update to the Artemis API in the background.
+        Intermediate updates, i.e. final=False, may be replaced by a later update before they are sent.
+        """
+        payload = self.status.model_dump(by_alias=True)
+        logger.debug(f"Status update for {self.url}: {payload}")
+        StatusUpdateSender().send(self.url, self.run_id, payload, final=final)
+
+    def stream_result(self, chunks: Iterable[str]) -> str:
+        """
+        Send the response generated so far while the chunks arrive and return the complete response.
+        The complete response is not sent, it is expected to be passed to done afterwards.
+        Statuses without a partial result only receive the complete response.
+        """
+        if not hasattr(self.status, "partial_result"):
+            return "".join(chunks)
 
-    def on_status_update(self):
-        """Send a status update to the Artemis API."""
+        response = ""
         try:
-            print(self.status.dict(by_alias=True))
-            requests.post(
-                self.url,
-                headers={
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {self.run_id}",
-                },
-                json=self.status.model_dump(by_alias=True),
-            ).raise_for_status()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error sending status update: {e}")
-            capture_exception(e)
+            for chunk in chunks:
+                response += chunk
+                self.send_partial_result(response)
+        finally:
+            self.clear_partial_result()
+        return response
+
+    def send_partial_result(self, response: str):
+        """
+        Send the response generated so far, e.g. from a callback of a model that is streamed by an agent.
+        Responses arriving within partial_result_interval of the last update are combined into the next update,
+        the first one is sent right away.
+        """
+        if not hasattr(self.status, "partial_result"):
+            return
+        if self.stage.state == StageStateEnum.NOT_STARTED:
+            self.stage.state = StageStateEnum.IN_PROGRESS
+        now = time.monotonic()
+        if (
+            self._last_partial_update is None
+            or now - self._last_partial_update >= self.partial_result_interval
+        ):
+            self.status.partial_result = response
+            self._update(final=False)
+            self._last_partial_update = now
+
+    def clear_partial_result(self):
+        """Stop sending the partial result, so the next response starts with an update right away"""
+        if hasattr(self.status, "partial_result"):
+            self.status.partial_result = None
+        self._last_partial_update = None
 
     def get_next_stage(self):
         """Return the next stage in the status, or None if there are no more stages."""
@@ -92,10 +154,10 @@ class StatusCallback(ABC):
         if self.stage.state == StageStateEnum.NOT_STARTED:
             self.stage.state = StageStateEnum.IN_PROGRESS
             self.stage.message = message
-            self.on_status_update()
+            self._update(final=False)
         elif self.stage.state == StageStateEnum.IN_PROGRESS:
             self.stage.message = message
-            self.on_status_update()
+            self._update(final=False)
         else:
             raise ValueError(
                 "Invalid state transition to in_progress. current state is ",
@@ -129,7 +191,7 @@ class StatusCallback(ABC):
                 self.stage.message = next_stage_message
             if start_next_stage:
                 self.stage.state = StageStateEnum.IN_PROGRESS
-        self.on_status_update()
+        self._update()
         self.status.result = None
         if hasattr(self.status, "suggestions"):
             self.status.suggestions = None
@@ -157,7 +219,7 @@ class StatusCallback(ABC):
 
         # Update the status after setting the stages to SKIPPED
         self.stage = self.status.stages[-1]
-        self.on_status_update()
+        self._update()
         logger.error(
             f"Error occurred in job {self.run_id} in stage {self.stage.name}: {message}"
         )
@@ -183,7 +245,7 @@ class StatusCallback(ABC):
             self.stage = next_stage
             if start_next_stage:
                 self.stage.state = StageStateEnum.IN_PROGRESS
-        self.on_status_update()
+        self._update()
 
 
 class CourseChatStatusCallback(StatusCallback):
@@ -0,0 +1,161 @@
+"""
+Benchmark of the Iris retrieval, chat and ingestion pipelines against fake models and a local Weaviate.
+
+Run from the iris directory:
+    python -m benchmarks --iterations 10 --output results.json
+    python -m benchmarks --baseline results.json
+
+The process exits with status 1 if a scenario makes more LLM calls per run than in the baseline, or is slower
+by more than --latency-tolerance if given.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).parent
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        help="scenario to run, may be repeated, all scenarios by default",
+    )
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument(
+        "--concurrency", type=int, default=1, help="runs of a scenario in parallel"
+    )
+    parser.add_argument(
+        "--pages", type=int, default=24, help="pages of the ingested lecture deck"
+    )
+    parser.add_argument(
+        "--warm-caches",
+        action="store_true",
+        help="keep the embedding, rewrite and course metadata caches between runs",
+    )
+    parser.add_argument(
+        "--external-weaviate",
+        action="store_true",
+        help="use the Weaviate of the application config instead of an embedded one",
+    )
+    parser.add_argument("--output", type=Path, help="write the results as JSON")
+    parser.add_argument("--baseline", type=Path, help="results to compare with")
+    parser.add_argument(
+        "--latency-tolerance",
+        type=float,
+        help="allowed relative increase of the mean latency over the baseline, e.g. 0.2",
+    )
+    return parser.parse_args(argv)
+
+
+def start_embedded_weaviate():
+    """Start an embedded Weaviate with the host and ports of the benchmark application config"""
+    import weaviate
+
+    from app.config import settings
+
+    return weaviate.connect_to_embedded(
+        hostname=settings.weaviate.host,
+        port=settings.weaviate.port,
+        grpc_port=settings.weaviate.grpc_port,
+        version="1.25.3",
+        persistence_data_path=tempfile.mkdtemp(prefix="iris-benchmark-weaviate-"),
+        environment_variables={"DISABLE_TELEMETRY": "true", "LOG_LEVEL": "error"},
+    )
+
+
+def print_summary(name: str, summary: dict):
+    latency = summary["latency"]
+    print(f"\n{name}: {summary['runs']} runs", end="")
+    if latency:
+        print(
+            f", mean {latency['mean'] * 1000:.1f} ms, p50 {latency['p50'] * 1000:.1f} ms, "
+            f"p95 {latency['p95'] * 1000:.1f} ms",
+            end="",
+        )
+    print(
+        f", peak rss {summary['peak_rss_mb']} MB, peak threads {summary['peak_threads']}"
+    )
+    for stage, stats in summary["stages"].items():
+        print(
+            f"  {stage:<60} {stats['count']:>5}x  mean {stats['mean'] * 1000:9.1f} ms  "
+            f"p95 {stats['p95'] * 1000:9.1f} ms"
+        )
+    for call, count in summary["llm_calls"].items():
+        print(f"  calls {call:<54} {count:>8.2f} per run")
+    for error in summary["errors"]:
+        print(f"  error: {error}")
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    os.environ.setdefault(
+        "APPLICATION_YML_PATH", str(BENCHMARK_DIR / "application.benchmark.yml")
+    )
+    os.environ.setdefault(
+        "LLM_CONFIG_PATH", str(BENCHMARK_DIR / "llm_config.benchmark.yml")
+    )
+    # The application reads its configuration on import
+    from app.vector_database.database import VectorDatabase
+    from benchmarks.harness import StageRecorder, find_regressions, run_scenario
+    from benchmarks.scenarios import (
+        SCENARIOS,
+        build_lecture_deck,
+        ingest_faqs,
+        ingest_lecture_unit,
+        remove_course_data,
+    )
+
+    # The pipelines log every request at info level
+    logging.getLogger().setLevel(logging.WARNING)
+
+    names = args.scenario or list(SCENARIOS)
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+
+    embedded = None if args.external_weaviate else start_embedded_weaviate()
+    client = VectorDatabase().get_client()
+    results = {}
+    try:
+        remove_course_data(client)
+        # The retrieval and chat scenarios search the lecture unit and the faqs of the benchmark course
+        ingest_lecture_unit(client, build_lecture_deck(args.pages), 1, StageRecorder())
+        ingest_faqs(client, StageRecorder())
+        for name in names:
+            result = run_scenario(
+                name,
+                SCENARIOS[name](client, args),
+                iterations=args.iterations,
+                warmup=args.warmup,
+                concurrency=max(1, args.concurrency),
+            )
+            results[name] = result.summary()
+            print_summary(name, results[name])
+    finally:
+        remove_course_data(client)
+        if embedded is not None:
+            embedded.close()
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        regressions = find_regressions(results, baseline, args.latency_tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
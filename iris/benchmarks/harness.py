@@ -0,0 +1,230 @@
+import functools
+import inspect
+import statistics
+import threading
+import time
+from collections import defaultdict
+
+import psutil
+
+from app.domain.status.stage_state_dto import StageStateEnum
+from app.llm.external.fake import (
+    fake_model_call_counts,
+    reset_fake_model_call_counts,
+)
+from app.web.status.status_update import StatusCallback
+
+
+class ResourceSampler:
+    """Samples the resident memory and the thread count of the process in the background and keeps the peaks"""
+
+    def __init__(self, interval_seconds: float = 0.01):
+        self.interval_seconds = interval_seconds
+        self.process = psutil.Process()
+        self.peak_rss = 0
+        self.peak_threads = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+        self.peak_threads = max(self.peak_threads, self.process.num_threads())
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+class StageRecorder:
+    """Collects the durations of the stages of a pipeline run, a stage can be entered several times"""
+
+    def __init__(self):
+        self.durations: dict[str, list[float]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, duration: float):
+        with self._lock:
+            self.durations[stage].append(duration)
+
+    def instrument(self, obj, *method_names: str):
+        """Time the given methods of the object, sync and async methods are supported"""
+        for name in method_names:
+            method = getattr(obj, name)
+            if inspect.iscoroutinefunction(method):
+                wrapper = self._wrap_async(name, method)
+            else:
+                wrapper = self._wrap(name, method)
+            setattr(obj, name, wrapper)
+
+    def _wrap(self, name, method):
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.record(name, time.perf_counter() - start)
+
+        return timed
+
+    def _wrap_async(self, name, method):
+        @functools.wraps(method)
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                self.record(name, time.perf_counter() - start)
+
+        return timed
+
+    def observe_callback(self, callback: StatusCallback):
+        """
+        Record the stages of the status callback and the steps within them, i.e. the time between two status
+        messages. The status updates are not sent, the callback does not need a reachable Artemis instance.
+        """
+        started: dict[int, float] = {}
+        current_step = [None, None]
+
+        def on_status_update(final: bool = True):
+            now = time.perf_counter()
+            for index, stage in enumerate(callback.status.stages):
+                if stage.state == StageStateEnum.IN_PROGRESS:
+                    started.setdefault(index, now)
+                elif index in started and stage.state in (
+                    StageStateEnum.DONE,
+                    StageStateEnum.ERROR,
+                ):
+                    self.record(f"stage: {stage.name}", now - started.pop(index))
+            message = callback.stage.message if callback.stage else None
+            step, step_start = current_step
+            if message != step:
+                if step is not None:
+                    self.record(f"step: {step}", now - step_start)
+                current_step[:] = [message, now]
+
+        callback.on_status_update = on_status_update
+        return callback
+
+
+class ScenarioResult:
+    """Latencies, LLM calls and resource peaks of the runs of one scenario"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: list[float] = []
+        self.stages = StageRecorder()
+        self.llm_calls: dict[str, int] = {}
+        self.peak_rss = 0
+        self.peak_threads = 0
+        self.errors: list[str] = []
+
+    def summary(self) -> dict:
+        runs = max(len(self.latencies), 1)
+        return {
+            "runs": len(self.latencies),
+            "latency": describe(self.latencies),
+            "stages": {
+                stage: describe(durations)
+                for stage, durations in sorted(self.stages.durations.items())
+            },
+            # Calls per run, so results with a different number of iterations can be compared
+            "llm_calls": {
+                key: count / runs for key, count in sorted(self.llm_calls.items())
+            },
+            "peak_rss_mb": round(self.peak_rss / 2**20, 1),
+            "peak_threads": self.peak_threads,
+            "errors": self.errors,
+        }
+
+
+def describe(values: list[float]) -> dict:
+    if not values:
+        return {}
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+    }
+
+
+def run_scenario(
+    name: str, run, iterations: int, warmup: int, concurrency: int
+) -> ScenarioResult:
+    """
+    Call run(iteration, recorder) warmup times without measuring, then iterations times with concurrency runs
+    in parallel. The fake models count the LLM calls of the measured runs.
+    """
+    result = ScenarioResult(name)
+    for iteration in range(warmup):
+        run(-1 - iteration, StageRecorder())
+
+    def measured_run(iteration: int):
+        start = time.perf_counter()
+        try:
+            run(iteration, result.stages)
+        except Exception as e:
+            result.errors.append(f"{type(e).__name__}: {e}")
+        result.latencies.append(time.perf_counter() - start)
+
+    reset_fake_model_call_counts()
+    with ResourceSampler() as sampler:
+        for batch_start in range(0, iterations, concurrency):
+            batch_end = min(batch_start + concurrency, iterations)
+            threads = [
+                threading.Thread(target=measured_run, args=(iteration,))
+                for iteration in range(batch_start, batch_end)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+    result.llm_calls = {
+        f"{model_id}.{method}": count
+        for (model_id, method), count in fake_model_call_counts().items()
+    }
+    result.peak_rss = sampler.peak_rss
+    result.peak_threads = sampler.peak_threads
+    return result
+
+
+def find_regressions(
+    results: dict, baseline: dict, latency_tolerance: float | None
+) -> list[str]:
+    """
+    Compare the summaries with a baseline. More LLM calls per run than in the baseline are always a regression,
+    a higher mean latency only if a tolerance is given.
+    """
+    regressions = []
+    for name, summary in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        for key, calls in summary["llm_calls"].items():
+            expected_calls = expected["llm_calls"].get(key, 0)
+            if calls > expected_calls:
+                regressions.append(
+                    f"{name}: {key} made {calls:g} calls per run, baseline {expected_calls:g}"
+                )
+        if latency_tolerance is not None and summary["latency"]:
+            mean = summary["latency"]["mean"]
+            expected_mean = expected["latency"].get("mean")
+            if expected_mean and mean > expected_mean * (1 + latency_tolerance):
+                regressions.append(
+                    f"{name}: mean latency {mean:.3f}s, baseline {expected_mean:.3f}s"
+                )
+    return regressions
@@ -0,0 +1,273 @@
+import argparse
+import base64
+
+import fitz
+from weaviate import WeaviateClient
+from weaviate.classes.query import Filter
+
+from app.common.pyris_message import PyrisMessage, IrisMessageRole
+from app.domain.chat.exercise_chat.exercise_chat_pipeline_execution_dto import (
+    ExerciseChatPipelineExecutionDTO,
+)
+from app.domain.data.text_message_content_dto import TextMessageContentDTO
+from app.domain.ingestion.ingestion_pipeline_execution_dto import (
+    FaqIngestionPipelineExecutionDto,
+    IngestionPipelineExecutionDto,
+)
+from app.llm.embedding_cache import EmbeddingCache
+from app.pipeline.chat.exercise_chat_agent_pipeline import ExerciseChatAgentPipeline
+from app.pipeline.faq_ingestion_pipeline import FaqIngestionPipeline
+from app.pipeline.lecture_ingestion_pipeline import LectureIngestionPipeline
+from app.pipeline.pipeline_pool import PipelinePool
+from app.retrieval.faq_retrieval import FaqRetrieval
+from app.retrieval.lecture_retrieval import LectureRetrieval
+from app.retrieval.rewrite_cache import RewriteCache
+from app.vector_database.course_metadata_cache import CourseMetadataCache
+from app.vector_database.faq_schema import init_faq_schema, FaqSchema
+from app.vector_database.lecture_schema import init_lecture_schema, LectureSchema
+from app.web.status.faq_ingestion_status_callback import FaqIngestionStatus
+from app.web.status.ingestion_status_callback import IngestionStatusCallback
+from app.web.status.status_update import ExerciseChatStatusCallback
+from benchmarks.harness import StageRecorder
+
+# The benchmark course, its objects are removed before and after the benchmark
+COURSE_ID = 990001
+COURSE_NAME = "Benchmark Course"
+LECTURE_ID = 1
+BASE_URL = "http://artemis.benchmark.invalid"
+SETTINGS = {"authenticationToken": "benchmark", "artemisBaseUrl": BASE_URL}
+
+STUDENT_QUERIES = [
+    "How does a binary search tree keep its elements sorted?",
+    "Why is the average lookup time of a hash map constant?",
+    "When should I prefer a linked list over an array list?",
+    "What is the difference between a stack and a queue?",
+]
+
+FAQS = [
+    ("When is the exam?", "The exam takes place in the last week of the semester."),
+    ("How do I register for the exam?", "Register in the course management system."),
+    ("Are the slides available?", "The slides are uploaded after every lecture."),
+    ("Can I submit exercises late?", "Late submissions are not graded."),
+]
+
+
+def build_lecture_deck(pages: int) -> str:
+    """
+    Create a lecture deck as base64 encoded PDF, shaped like typical slides: every page has text and a logo,
+    every fourth page a large figure and every eighth page repeats the agenda slide.
+    """
+    doc = fitz.open()
+    logo = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 64, 32), False)
+    logo.clear_with(40)
+    for page_num in range(pages):
+        page = doc.new_page()
+        page.insert_image(fitz.Rect(500, 790, 580, 830), pixmap=logo)
+        if page_num % 8 == 7:
+            page.insert_text((50, 80), "Agenda", fontsize=24)
+            page.insert_text((50, 120), "Trees, hash maps, lists, stacks and queues")
+            continue
+        page.insert_text((50, 80), f"Data structures, part {page_num}", fontsize=24)
+        page.insert_textbox(
+            fitz.Rect(50, 110, 545, 400),
+            " ".join(
+                STUDENT_QUERIES[page_num % len(STUDENT_QUERIES)] for _ in range(6)
+            ),
+        )
+        if page_num % 4 == 1:
+            figure = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 400, 300), False)
+            figure.clear_with(page_num * 7 % 256)
+            page.insert_image(fitz.Rect(50, 420, 545, 780), pixmap=figure)
+    pdf = doc.tobytes()
+    doc.close()
+    return base64.b64encode(pdf).decode("utf-8")
+
+
+def clear_caches():
+    """Clear the process-wide caches, so every run takes the cold path with the same number of model calls"""
+    EmbeddingCache().clear()
+    RewriteCache().clear()
+    CourseMetadataCache().clear()
+
+
+def remove_course_data(client: WeaviateClient):
+    init_lecture_schema(client).data.delete_many(
+        where=Filter.by_property(LectureSchema.COURSE_ID.value).equal(COURSE_ID)
+    )
+    init_faq_schema(client).data.delete_many(
+        where=Filter.by_property(FaqSchema.COURSE_ID.value).equal(COURSE_ID)
+    )
+    CourseMetadataCache().invalidate(COURSE_ID)
+
+
+def ingest_lecture_unit(
+    client: WeaviateClient, pdf: str, lecture_unit_id: int, recorder: StageRecorder
+):
+    dto = IngestionPipelineExecutionDto.model_validate(
+        {
+            "pyrisLectureUnit": {
+                "pdfFile": pdf,
+                "lectureUnitId": lecture_unit_id,
+                "lectureUnitName": f"Unit {lecture_unit_id}",
+                "lectureId": LECTURE_ID,
+                "lectureName": "Data Structures",
+                "courseId": COURSE_ID,
+                "courseName": COURSE_NAME,
+            },
+            "settings": SETTINGS,
+        }
+    )
+    callback = recorder.observe_callback(
+        IngestionStatusCallback(
+            run_id="benchmark", base_url=BASE_URL, lecture_unit_id=lecture_unit_id
+        )
+    )
+    pipeline = LectureIngestionPipeline(client=client, dto=dto, callback=callback)
+    recorder.instrument(
+        pipeline,
+        "chunk_data",
+        "interpret_image",
+        "merge_page_content_and_image_interpretation",
+        "batch_update",
+    )
+    if not pipeline():
+        raise RuntimeError(f"Ingestion of lecture unit {lecture_unit_id} failed")
+    CourseMetadataCache().invalidate(COURSE_ID)
+
+
+def ingest_faqs(client: WeaviateClient, recorder: StageRecorder):
+    for faq_id, (title, answer) in enumerate(FAQS, start=1):
+        dto = FaqIngestionPipelineExecutionDto.model_validate(
+            {
+                "pyrisFaqWebhookDTO": {
+                    "faqId": faq_id,
+                    "courseId": COURSE_ID,
+                    "questionTitle": title,
+                    "questionAnswer": answer,
+                    "courseName": COURSE_NAME,
+                },
+                "settings": SETTINGS,
+            }
+        )
+        callback = recorder.observe_callback(
+            FaqIngestionStatus(run_id="benchmark", base_url=BASE_URL, faq_id=faq_id)
+        )
+        if not FaqIngestionPipeline(client=client, dto=dto, callback=callback)():
+            raise RuntimeError(f"Ingestion of faq {faq_id} failed")
+    CourseMetadataCache().invalidate(COURSE_ID)
+
+
+def student_message(text: str) -> PyrisMessage:
+    return PyrisMessage(
+        sender=IrisMessageRole.USER,
+        contents=[TextMessageContentDTO(textContent=text)],
+    )
+
+
+def lecture_ingestion(client: WeaviateClient, args: argparse.Namespace):
+    pdf = build_lecture_deck(args.pages)
+
+    def run(iteration: int, recorder: StageRecorder):
+        if not args.warm_caches:
+            clear_caches()
+        # Every run ingests a new lecture unit, an unchanged unit would be skipped
+        ingest_lecture_unit(client, pdf, 1000 + iteration, recorder)
+
+    return run
+
+
+def lecture_retrieval(client: WeaviateClient, args: argparse.Namespace):
+    def run(iteration: int, recorder: StageRecorder):
+        if not args.warm_caches:
+            clear_caches()
+        retriever = LectureRetrieval(client)
+        recorder.instrument(
+            retriever,
+            "fetch_course_language",
+            "run_parallel_rewrite_tasks",
+            "search_in_db",
+            "fuse_retrieved_chunks",
+            "rerank_chunks",
+        )
+        retriever(
+            chat_history=[],
+            student_query=STUDENT_QUERIES[iteration % len(STUDENT_QUERIES)],
+            result_limit=10,
+            course_name=COURSE_NAME,
+            course_id=COURSE_ID,
+            base_url=BASE_URL,
+        )
+
+    return run
+
+
+def faq_retrieval(client: WeaviateClient, args: argparse.Namespace):
+    def run(iteration: int, recorder: StageRecorder):
+        if not args.warm_caches:
+            clear_caches()
+        retriever = FaqRetrieval(client)
+        recorder.instrument(
+            retriever,
+            "fetch_course_language",
+            "run_parallel_rewrite_tasks",
+            "search_in_db",
+        )
+        retriever(
+            chat_history=[],
+            student_query=FAQS[iteration % len(FAQS)][0],
+            result_limit=10,
+            course_name=COURSE_NAME,
+            course_id=COURSE_ID,
+            base_url=BASE_URL,
+        )
+
+    return run
+
+
+def exercise_chat(client: WeaviateClient, args: argparse.Namespace):
+    # Pipelines are reused between requests like in production
+    pool = PipelinePool(ExerciseChatAgentPipeline, max_idle=4)
+
+    def run(iteration: int, recorder: StageRecorder):
+        if not args.warm_caches:
+            clear_caches()
+        dto = ExerciseChatPipelineExecutionDTO.model_validate(
+            {
+                "chatHistory": [
+                    student_message(STUDENT_QUERIES[iteration % len(STUDENT_QUERIES)])
+                ],
+                "exercise": {
+                    "id": 1,
+                    "name": "Binary Search Trees",
+                    "programmingLanguage": "JAVA",
+                    "problemStatement": "Implement insert and lookup of a binary search tree.",
+                },
+                "course": {"id": COURSE_ID, "name": COURSE_NAME},
+                "submission": {
+                    "id": 1,
+                    "isPractice": False,
+                    "buildFailed": False,
+                    "repository": {
+                        "src/Tree.java": "class Tree { Node root; }",
+                        "src/Node.java": "class Node { int value; Node left, right; }",
+                    },
+                },
+                "user": {"id": 1},
+                "settings": SETTINGS,
+            }
+        )
+        callback = recorder.observe_callback(
+            ExerciseChatStatusCallback(run_id="benchmark", base_url=BASE_URL)
+        )
+        with pool.acquire() as pipeline:
+            pipeline(dto=dto, callback=callback, variant="default")
+
+    return run
+
+
+SCENARIOS = {
+    "lecture_ingestion": lecture_ingestion,
+    "lecture_retrieval": lecture_retrieval,
+    "faq_retrieval": faq_retrieval,
+    "exercise_chat": exercise_chat,
+}